@@ -7,20 +7,34 @@ import plotly.express as px
 API_URL = "http://localhost:8000"
 
 # Fetch data from API
-def fetch_data(category=None, min_rating=None, max_price=None, page=1, size=10):
-    params = {"page": page, "size": size}
-    if category:
-        params["category"] = category
+def fetch_data(category_id=None, min_rating=None, max_price=None, page=1, size=10):
+    params = {"page": page, "page_size": size}
+    if category_id:
+        params["category_id"] = category_id
     if min_rating:
-        params["min_rating"] = min_rating
+        params["rating"] = min_rating
     if max_price:
-        params["max_price"] = max_price
-    response = requests.get(f"{API_URL}/apps", params=params)
+        params["price"] = max_price
+    response = requests.get(f"{API_URL}/apps/", params=params)
     return response.json()
 
+# Aggregates over every app, computed server-side from the rollup tables
+def fetch_stats(kind, **params):
+    params = {key: value for key, value in params.items() if value}
+    response = requests.get(f"{API_URL}/stats/{kind}", params=params)
+    return response.json()
+
+def fetch_categories():
+    response = requests.get(f"{API_URL}/categores/", params={"page_size": 100})
+    return {c["CategoryName"]: c["CategoryID"] for c in response.json().get("categores", [])}
+
 # Sidebar filters
 st.sidebar.header("Filters")
-category = st.sidebar.text_input("Category")
+categories = fetch_categories()
+category = st.sidebar.selectbox("Category", ["All"] + sorted(categories))
+category_id = categories.get(category)
+content_rating = st.sidebar.selectbox("Content Rating", ["All", "Everyone", "Everyone 10+", "Teen", "Mature 17+", "Adults only 18+", "Unrated"])
+content_rating = None if content_rating == "All" else content_rating
 min_rating = st.sidebar.slider("Minimum Rating", 0.0, 5.0, 0.0, 0.1)
 max_price = st.sidebar.number_input("Max Price", min_value=0.0, value=10.0)
 
@@ -29,7 +43,7 @@ page = st.sidebar.number_input("Page", min_value=1, value=1)
 size = st.sidebar.number_input("Page Size", min_value=1, max_value=100, value=10)
 
 # Fetch Data
-data = fetch_data(category, min_rating, max_price, page, size)
+data = fetch_data(category_id, min_rating, max_price, page, size)
 df = pd.DataFrame(data.get("apps", []))
 
 # Display Table
@@ -37,12 +51,18 @@ st.write("### App List")
 st.dataframe(df)
 
 # Plot Rating Distribution
-if not df.empty:
-    fig = px.histogram(df, x="Rating", nbins=20, title="Rating Distribution")
+ratings = pd.DataFrame(fetch_stats("ratings", category_id=category_id, content_rating=content_rating).get("buckets", []))
+if not ratings.empty:
+    fig = px.bar(ratings, x="rating", y="apps", title="Rating Distribution")
     st.plotly_chart(fig)
-    
-    # Scatter Plot: Installs vs Price
-    fig2 = px.scatter(df, x="Price", y="Installs", color="Category", title="Installs vs Price")
+
+    installs = pd.DataFrame(fetch_stats("installs", category_id=category_id, content_rating=content_rating).get("buckets", []))
+    fig2 = px.bar(installs, x="installs", y="apps", title="Installs Distribution")
     st.plotly_chart(fig2)
+
+    # Free / paid / ad-supported apps per category
+    pricing = pd.DataFrame(fetch_stats("pricing", group_by="category", content_rating=content_rating).get("groups", []))
+    fig3 = px.bar(pricing, x="category", y=["free", "paid"], title="Free vs Paid by Category")
+    st.plotly_chart(fig3)
 else:
     st.warning("No data found with the given filters!")
@@ -1,17 +1,246 @@
+import asyncio
+import base64
+import contextvars
+import csv
+import datetime
+import decimal
+import hashlib
+import io
 import json
-from typing import List
-from fastapi import FastAPI, Query, HTTPException, Depends
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, Date, ForeignKey, DECIMAL, BigInteger
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
-from pydantic import BaseModel, EmailStr, condecimal
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
+from fastapi import FastAPI, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, event, Column, Integer, SmallInteger, String, Float, Boolean, Date, DateTime, ForeignKey, DECIMAL, BigInteger, Table, and_, false, func, insert, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+from sqlalchemy.orm import aliased, sessionmaker, declarative_base, object_session, relationship
+from sqlalchemy.sql import operators
+from pydantic import BaseModel, EmailStr, ValidationError, condecimal
+import numpy as np
+
+import columnar
+import lookups
+import metrics
+import rollups
+import search
+from cache import TTLCache, make_response_cache
 
 # Database Connection
-SQLALCHEMY_DATABASE_URL = "mssql+pyodbc://localhost/GooglePlayStore?driver=SQL+Server&Trusted_Connection=yes"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# DATABASE_URL points the API at another database, e.g. sqlite:///playstore.db for local runs
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "mssql+pyodbc://localhost/GooglePlayStore?driver=SQL+Server&Trusted_Connection=yes")
+# Pool sizing per worker process; run more uvicorn workers to scale out
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+# exports hold two connections for as long as their client reads; at most this many run at once
+EXPORT_CONCURRENCY = max(1, int(os.environ.get("EXPORT_CONCURRENCY", 2)))
+# compiled-statement cache shared by all sessions, so hot queries skip SQL compilation
+DB_QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", 1200))
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    # pyodbc binds a whole executemany parameter array in one round trip
+    **({"fast_executemany": True} if SQLALCHEMY_DATABASE_URL.startswith("mssql+pyodbc") else {}),
+)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Instrumentation: every statement is timed through engine events and charged to the request
+# that ran it; statements slower than SLOW_QUERY_MS are logged with their bound parameters
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 250))
+sql_log = logging.getLogger("api.sql")
+http_requests = metrics.registry.counter("http_requests_total", "Requests served", ["method", "route", "status"])
+http_duration = metrics.registry.histogram("http_request_duration_seconds", "Time from request to last response byte", ["method", "route"])
+request_queries = metrics.registry.histogram("db_queries_per_request", "SQL statements run per request", ["route"], metrics.COUNT_BUCKETS)
+query_duration = metrics.registry.histogram("db_query_duration_seconds", "Duration of single SQL statements", ["route"], metrics.QUERY_BUCKETS)
+slow_queries = metrics.registry.counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ["route"])
+phase_duration = metrics.registry.histogram("http_request_phase_seconds", "Time per request spent in each phase", ["route", "phase"])
+
+class RequestStats(metrics.Stages):
+    """Phase timings of one request; "db" sums every SQL statement it ran."""
+
+    def __init__(self, scope):
+        super().__init__()
+        self.scope = scope
+
+    @property
+    def route(self):
+        # the path template, e.g. /apps/{app_id}; set by the router before the endpoint runs
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+    def server_timing(self, elapsed):
+        # shown per request in the browser's network panel
+        entries = [f'db;dur={self.seconds.get("db", 0) * 1000:.1f};desc="{self.calls.get("db", 0)} queries"']
+        entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.seconds.items() if name != "db"]
+        return ", ".join(entries + [f"total;dur={elapsed * 1000:.1f}"])
+
+@event.listens_for(engine, "before_cursor_execute")
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = metrics.current.get()
+    route = stats.route if stats is not None else "none"
+    if stats is not None:
+        stats.add("db", elapsed)
+    query_duration.observe(elapsed, route=route)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc(route=route)
+        sql_log.warning("slow query on %s (%.0f ms): %.1000s; parameters %.500r", route, elapsed * 1000, " ".join(statement.split()), parameters)
+
+# Exact /apps/ totals per filter combination, dropped whenever an app is created or deleted
+COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", 300))
+count_cache = TTLCache(maxsize=4096, ttl=COUNT_CACHE_TTL)
+# Row counts, per-category counts and a row sample used for estimated totals; writes do not
+# drop them, so estimates can lag behind writes by up to STATS_TTL
+STATS_TTL = int(os.environ.get("STATS_TTL", 3600))
+STATS_SAMPLE_SIZE = 10_000
+stats_cache = TTLCache(maxsize=1, ttl=STATS_TTL)
+# Serialized responses of the hot read endpoints: RESPONSE_CACHE is "memory" (default), "off",
+# "redis://..." for a cache shared by all workers, or "sqlite:///path" as its local stand-in
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 30))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 2048))
+# only the first pages of /apps/ are hot enough to be worth caching
+RESPONSE_CACHE_MAX_PAGE = int(os.environ.get("RESPONSE_CACHE_MAX_PAGE", 3))
+response_cache = make_response_cache(os.environ.get("RESPONSE_CACHE", "memory"), RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+# COLUMNAR_ENGINE=on loads the listing columns into memory at startup (columnar.py) and answers
+# /apps/ from there, with exact totals and without SQL; writes through this process are applied to it
+COLUMNAR_ENGINE = os.environ.get("COLUMNAR_ENGINE", "off").lower() in ("on", "1", "true")
+# Changes this process cannot apply itself, writes through other workers and imports, are picked up
+# by reloading the store in the background: as soon as the "apps" version of a shared response cache
+# moves by more than this process's own writes (checked at most once per COLUMNAR_CHECK_INTERVAL
+# seconds), and in any case once the store is COLUMNAR_MAX_AGE seconds old (0 turns that off)
+COLUMNAR_MAX_AGE = float(os.environ.get("COLUMNAR_MAX_AGE", 300))
+COLUMNAR_CHECK_INTERVAL = 1.0
+columnar_apps = None
+# Lookup keys and texts (lookups.py) per column; an entry never changes once written
+LOOKUP_CACHE_SIZE = int(os.environ.get("LOOKUP_CACHE_SIZE", 100_000))
+
+class LookupCache:
+    """Both directions of every lookup table, filled on demand from committed rows, so decoding
+    an app or resolving a filter value only costs a query the first time this process sees it.
+
+    Misses are read through ``db``, the caller's Session, on the connection it already holds:
+    a second checkout per request could wait forever on a pool the executor keeps saturated."""
+
+    def __init__(self, maxsize):
+        self.keys = {name: TTLCache(maxsize, ttl=STATS_TTL) for name in lookups.LOOKUPS}
+        self.texts_by_key = {name: TTLCache(maxsize, ttl=STATS_TTL) for name in lookups.LOOKUPS}
+
+    def texts(self, db, name, keys, remember=True):
+        """{key: text} for the given keys of column ``name``. With ``remember=False`` the texts read
+        are not cached, for sessions that may hold keys an uncommitted write added."""
+        lookup_table, key_column = lookups.LOOKUPS[name][:2]
+        cache = self.texts_by_key[name]
+        found, missing = {}, []
+        for key in keys:
+            if key is None:
+                continue
+            value = cache.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            connection = db.connection()
+            for start in range(0, len(missing), 1000):
+                batch = missing[start:start + 1000]
+                rows = connection.exec_driver_sql(
+                    f"SELECT {key_column}, {name} FROM {lookup_table} WHERE {key_column} IN ({', '.join('?' for _ in batch)})",
+                    tuple(batch)).all()
+                for key, value in rows:
+                    if remember:
+                        cache.set(key, value)
+                    found[key] = value
+        return found
+
+    def text(self, db, name, key, remember=True):
+        return self.texts(db, name, [key], remember).get(key)
+
+    def key(self, db, name, value):
+        """The key ``value`` is stored under, or None when no app has it."""
+        if not value:
+            return None
+        key = self.keys[name].get(value)
+        if key is None:
+            lookup_table, key_column = lookups.LOOKUPS[name][:2]
+            key = db.connection().exec_driver_sql(f"SELECT {key_column} FROM {lookup_table} WHERE {name} = ?", (value,)).scalar()
+            if key is not None:
+                self.keys[name].set(value, key)
+        return key
+
+    def add(self, connection, name, value):
+        """The key of ``value``, inserted on ``connection`` when it is new. Keys found there may be
+        uncommitted, so they are only cached once a later lookup reads them back committed."""
+        if not value:
+            return None
+        key = self.keys[name].get(value)
+        if key is not None:
+            return key
+        lookup_table, key_column, _, _, number = lookups.LOOKUPS[name]
+        select_key = f"SELECT {key_column} FROM {lookup_table} WHERE {name} = ?"
+        key = connection.exec_driver_sql(select_key, (value,)).scalar()
+        if key is None:
+            columns, params = ([name, number], (value, lookups.parse(name, value))) if number else ([name], (value,))
+            connection.exec_driver_sql(f"INSERT INTO {lookup_table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", params)
+            key = connection.exec_driver_sql(select_key, (value,)).scalar()
+        return key
+
+lookup_cache = LookupCache(LOOKUP_CACHE_SIZE)
+
+class LookupComparator(Comparator):
+    # selects the text through a subquery on the lookup table, but equality compares keys: one this
+    # process has cached makes App.ContentRating == "Teen" a plain ContentRatingID = 3 filter, any
+    # other is resolved by the lookup table inside the query, as building it has no session to read on
+    def __init__(self, name, key):
+        lookup = LOOKUP_TABLES[name]
+        super().__init__(select(lookup.c[name]).where(lookup.c[lookups.LOOKUPS[name][1]] == key).scalar_subquery())
+        self.name, self.key = name, key
+
+    def operate(self, op, *other, **kwargs):
+        if op is operators.eq:
+            if not other[0]:
+                return false()
+            key = lookup_cache.keys[self.name].get(other[0])
+            if key is None:
+                lookup = LOOKUP_TABLES[self.name]
+                key = select(lookup.c[lookups.LOOKUPS[self.name][1]]).where(lookup.c[self.name] == other[0]).scalar_subquery()
+            return self.key == key
+        return op(self.expression, *other, **kwargs)
+
+def lookup_text(name):
+    """The text column ``name`` of Apps, read through its lookup key on the app's own session, which
+    may hold keys its uncommitted write added, so texts read there are not cached."""
+    key_column = lookups.LOOKUPS[name][1]
+    prop = hybrid_property(lambda self: lookup_cache.text(object_session(self), name, getattr(self, key_column), remember=False))
+    return prop.comparator(lambda cls: LookupComparator(name, getattr(cls, key_column)))
+
 # Database Models
+# lookup tables of the dictionary-encoded App columns (lookups.py)
+LOOKUP_TABLES = {
+    name: Table(lookup_table, Base.metadata,
+                Column(key, Integer, primary_key=True),
+                Column(name, String(width), nullable=False, unique=True),
+                *([Column(number, BigInteger)] if number else []))
+    for name, (lookup_table, key, _, width, number) in lookups.LOOKUPS.items()
+}
+
 class Developer(Base):
     __tablename__ = "Developers"
     DeveloperID = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -36,27 +265,71 @@ class App(Base):
     MinInstalls = Column(BigInteger)
     MaxInstalls = Column(BigInteger)
     Price = Column(DECIMAL(10,2))
-    Currency = Column(String(10))
-    Size = Column(String(50))
-    MinAndroid = Column(String(50))
+    CurrencyID = Column(SmallInteger, ForeignKey("Currencies.CurrencyID"))
+    SizeID = Column(Integer, ForeignKey("Sizes.SizeID"))
+    SizeBytes = Column(BigInteger)
+    MinAndroidID = Column(SmallInteger, ForeignKey("AndroidVersions.MinAndroidID"))
+    MinApiLevel = Column(SmallInteger)
     DeveloperID = Column(Integer, ForeignKey("Developers.DeveloperID"))
-    ContentRating = Column(String(50))
-    PrivacyPolicy = Column(String(500))
+    ContentRatingID = Column(SmallInteger, ForeignKey("ContentRatings.ContentRatingID"))
+    PrivacyPolicyID = Column(Integer, ForeignKey("PrivacyPolicies.PrivacyPolicyID"))
     Released = Column(Date)
     LastUpdated = Column(Date)
-    ScrapedTime = Column(Date)
+    ScrapedTime = Column(DateTime)
     Free = Column(Boolean)
     AdSupported = Column(Boolean)
     InAppPurchases = Column(Boolean)
     EditorsChoice = Column(Boolean)
     developer = relationship("Developer", back_populates="apps")
     categories = relationship("Category", secondary="AppCategories", back_populates="apps")
+    # dictionary-encoded columns (lookups.py), read and filtered as the text they stand for
+    Currency = lookup_text("Currency")
+    Size = lookup_text("Size")
+    MinAndroid = lookup_text("MinAndroid")
+    ContentRating = lookup_text("ContentRating")
+    PrivacyPolicy = lookup_text("PrivacyPolicy")
+
+# What clients see of an app: the text of each lookup key, in the order of the original columns
+APP_FIELDS = ["AppID", "AppName", "Rating", "RatingCount", "Installs", "MinInstalls", "MaxInstalls", "Price",
+              "Currency", "Size", "SizeBytes", "MinAndroid", "MinApiLevel", "DeveloperID", "ContentRating",
+              "PrivacyPolicy", "Released", "LastUpdated", "ScrapedTime", "Free", "AdSupported", "InAppPurchases",
+              "EditorsChoice"]
+
+def app_rows(db, rows):
+    """APP_FIELDS values of Apps rows or App objects, with each lookup decoded once per batch."""
+    texts = {name: lookup_cache.texts(db, name, {getattr(row, key) for row in rows})
+             for name, (_, key, _, _, _) in lookups.LOOKUPS.items()}
+    return [[texts[field].get(getattr(row, lookups.LOOKUPS[field][1])) if field in texts else getattr(row, field)
+             for field in APP_FIELDS] for row in rows]
+
+def app_record(db, app):
+    return dict(zip(APP_FIELDS, app_rows(db, [app])[0]))
 
 class AppCategory(Base):
     __tablename__ = "AppCategories"
     AppID = Column(String(255), ForeignKey("Apps.AppID"), primary_key=True)
     CategoryID = Column(Integer, ForeignKey("Categories.CategoryID"), primary_key=True)
 
+class SearchGram(Base):
+    __tablename__ = "SearchGrams"
+    Kind = Column(String(1), primary_key=True)
+    Gram = Column(String(3), primary_key=True)
+    EntityID = Column(String(255), primary_key=True)
+    Weight = Column(BigInteger, nullable=False)
+
+class SearchGramCount(Base):
+    __tablename__ = "SearchGramCounts"
+    Kind = Column(String(1), primary_key=True)
+    Gram = Column(String(3), primary_key=True)
+    Entries = Column(BigInteger, nullable=False)
+
+class SearchPrefix(Base):
+    __tablename__ = "SearchPrefixes"
+    Kind = Column(String(1), primary_key=True)
+    Prefix = Column(String(260), primary_key=True)
+    EntityID = Column(String(255), primary_key=True)
+    Weight = Column(BigInteger, nullable=False)
+
 # Pydantic Models
 class DeveloperCreate(BaseModel):
     DeveloperName: str
@@ -74,6 +347,19 @@ class AppCreate(BaseModel):
     Free: bool
     DeveloperID: int
 
+class AppUpdate(BaseModel):
+    AppName: Optional[str] = None
+    Rating: Optional[float] = None
+    RatingCount: Optional[int] = None
+    Installs: Optional[int] = None
+    Price: Optional[condecimal(max_digits=10, decimal_places=2)] = None
+    Currency: Optional[str] = None
+    Free: Optional[bool] = None
+    DeveloperID: Optional[int] = None
+
+class AppPatch(AppUpdate):
+    AppID: str
+
 class CategoryBase(BaseModel):
     CategoryID: int
     CategoryName: str
@@ -91,93 +377,884 @@ class AppBase(BaseModel):
         orm_mode = True
         from_attributes = True
 
-# Dependency
-def get_db():
+# Keyset pagination cursors: an opaque token holding the (LastUpdated, AppID) of the last row served
+def encode_cursor(app):
+    last_updated = app.LastUpdated.isoformat() if app.LastUpdated else None
+    payload = json.dumps([last_updated, app.AppID], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_updated, app_id = json.loads(payload)
+        return (datetime.date.fromisoformat(last_updated) if last_updated else None), str(app_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def seek_after(query, cursor):
+    # rows after the cursor in ORDER BY LastUpdated DESC, AppID DESC; NULL dates sort last
+    last_updated, app_id = decode_cursor(cursor)
+    if last_updated is None:
+        return query.filter(App.LastUpdated.is_(None), App.AppID < app_id)
+    return query.filter(or_(
+        App.LastUpdated < last_updated,
+        and_(App.LastUpdated == last_updated, App.AppID < app_id),
+        App.LastUpdated.is_(None)))
+
+def categories_by_app(db, app_ids):
+    # one query for the whole page instead of a lazy App.categories load per row
+    rows = (db.query(AppCategory.AppID, Category.CategoryID, Category.CategoryName)
+            .join(Category, Category.CategoryID == AppCategory.CategoryID)
+            .filter(AppCategory.AppID.in_(app_ids))
+            .all()) if app_ids else []
+    categories = defaultdict(list)
+    for app_id, category_id, category_name in rows:
+        categories[app_id].append(CategoryBase(CategoryID=category_id, CategoryName=category_name))
+    return categories
+
+# query parameter of each boolean App column that /apps/, /apps/export and /apps/facets filter on
+FLAG_PARAMETERS = dict(zip(("free", "ad_supported", "in_app_purchases", "editors_choice"), columnar.FLAGS))
+
+def flag_filters(*values):
+    """The flag filters that were given, as (column, value) pairs in FLAG_PARAMETERS order."""
+    return tuple((flag, value) for flag, value in zip(FLAG_PARAMETERS.values(), values) if value is not None)
+
+def count_key(category_id, rating, price, content_rating, flags=()):
+    # same truthiness as the filters in get_apps, so equivalent requests share one entry
+    return (category_id or None, float(rating) if rating else None,
+            float(price) if price else None, content_rating or None, flags)
+
+def invalidate_counts():
+    count_cache.clear()
+
+SAMPLE_COLUMNS = ", ".join(("Rating", "Price", "ContentRatingID") + columnar.FLAGS)
+
+def table_stats(db):
+    stats = stats_cache.get("apps")
+    if stats is not None:
+        return stats
+
+    if db.bind.dialect.name == "mssql":
+        rows = db.execute(text("""
+            SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+            WHERE object_id = OBJECT_ID('Apps') AND index_id IN (0, 1)""")).scalar()
+        sample = db.execute(text(f"SELECT TOP {STATS_SAMPLE_SIZE} {SAMPLE_COLUMNS} FROM Apps TABLESAMPLE (1 PERCENT)")).all()
+    else:
+        rows = db.query(func.count()).select_from(App).scalar()
+        # keeps about one row in every rows / STATS_SAMPLE_SIZE in a single scan, where
+        # ORDER BY RANDOM() would sort the whole table
+        every = -(-(rows or 0) // STATS_SAMPLE_SIZE) or 1
+        sample = db.execute(text(f"SELECT {SAMPLE_COLUMNS} FROM Apps WHERE abs(random()) % :every = 0 LIMIT {STATS_SAMPLE_SIZE}"),
+                            {"every": every}).all()
+    per_category = dict(db.query(AppCategory.CategoryID, func.count()).group_by(AppCategory.CategoryID).all())
+
+    stats = (rows or 0, per_category, sample_columns(sample))
+    stats_cache.set("apps", stats)
+    return stats
+
+def sample_columns(sample):
+    # one array per column, so every estimate is a handful of vectorized comparisons;
+    # missing ratings and prices count as 0 and missing keys and flags match nothing
+    columns = list(zip(*sample)) or [()] * (3 + len(columnar.FLAGS))
+    rating, price, content_rating, *flags = columns
+    return {
+        "rows": len(sample),
+        "Rating": np.array([value or 0 for value in rating], dtype=np.float64),
+        "Price": np.array([float(value or 0) for value in price], dtype=np.float64),
+        "ContentRatingID": np.array([-1 if value is None else value for value in content_rating], dtype=np.int64),
+        **{flag: np.array([-1 if value is None else int(value) for value in values], dtype=np.int8)
+           for flag, values in zip(columnar.FLAGS, flags)},
+    }
+
+def estimate_total(db, category_id, rating, price, content_rating, flags=()):
+    # category share from the stored per-category counts, the other filters from a row sample,
+    # assuming the two are independent
+    rows, per_category, sample = table_stats(db)
+    estimate = float(rows)
+    if category_id:
+        estimate *= per_category.get(category_id, 0) / max(rows, 1)
+    if sample["rows"] and (rating or price or content_rating or flags):
+        mask = np.ones(sample["rows"], dtype=bool)
+        if rating:
+            mask &= sample["Rating"] >= rating
+        if price:
+            mask &= sample["Price"] <= price
+        if content_rating:
+            content_rating_id = lookup_cache.key(db, "ContentRating", content_rating)
+            mask &= sample["ContentRatingID"] == (-2 if content_rating_id is None else content_rating_id)
+        for flag, value in flags:
+            mask &= sample[flag] == int(value)
+        estimate *= np.count_nonzero(mask) / sample["rows"]
+    return round(estimate)
+
+# Bounded DB executor: async endpoints hand their blocking SQL work to at most as many
+# threads as the pool has connections left after the exports' share, so requests wait here
+# instead of on the pool
+db_executor = ThreadPoolExecutor(max_workers=max(1, DB_POOL_SIZE + DB_MAX_OVERFLOW - 2 * EXPORT_CONCURRENCY), thread_name_prefix="db")
+
+def call_with_session(fn, *args):
     db = SessionLocal()
     try:
-        yield db
+        return fn(db, *args)
     finally:
         db.close()
 
+def in_executor(fn, *args):
+    # run in the request's context, so the statements of the worker thread are charged to it
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(db_executor, partial(contextvars.copy_context().run, fn, *args))
+
+async def run_db(fn, *args):
+    return await in_executor(call_with_session, fn, *args)
+
+def invalidate_responses(*tags):
+    if response_cache is not None:
+        with columnar_lock:
+            response_cache.invalidate(*tags)
+            # bumps of "apps" made here are already applied to this process's column store
+            if "apps" in tags:
+                columnar_state["own"] += 1
+
+def etag_response(request, etag, body):
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    # clients may keep the body but have to revalidate it with If-None-Match
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def serialize(result):
+    with metrics.phase("serialize"):
+        return json.dumps(jsonable_encoder(result), separators=(",", ":")).encode()
+
+async def cached(request, tags, fn, *args):
+    """Serve ``fn(db, *args)`` from the response cache, computing and storing it on a miss."""
+    key = None
+    if response_cache is not None:
+        key = response_cache.key(request.url.path + "?" + str(sorted(request.query_params.multi_items())), tags)
+        entry = response_cache.get(key)
+        if entry is not None:
+            return etag_response(request, *entry)
+
+    body = serialize(await run_db(fn, *args))
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    if key is not None:
+        response_cache.set(key, etag, body)
+    return etag_response(request, etag, body)
+
+class MetricsMiddleware:
+    """Times every request per route and charges its SQL statements and phases to it.
+
+    A plain ASGI middleware rather than @app.middleware("http"), so streamed responses are
+    timed to their last byte; the Server-Timing header carries the totals up to the first one."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = metrics.current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = stats.server_timing(time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            metrics.current.reset(token)
+            route, method = stats.route, scope["method"]
+            http_requests.inc(method=method, route=route, status=status)
+            http_duration.observe(time.perf_counter() - started, method=method, route=route)
+            request_queries.observe(stats.calls.get("db", 0), route=route)
+            for name, seconds in stats.seconds.items():
+                phase_duration.observe(seconds, route=route, phase=name)
+
 # FastAPI App
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
-@app.post("/developers/")
-def create_developer(dev: DeveloperCreate, db: Session = Depends(get_db)):
+# the columns columnar.ColumnarApps keeps, in the order of columnar.App
+COLUMNAR_COLUMNS = (App.AppID, App.AppName, App.LastUpdated, App.Rating, App.Price, App.ContentRatingID,
+                    *(getattr(App, flag) for flag in columnar.FLAGS))
+
+def load_columnar(db):
+    apps = [columnar.App(*row) for row in db.execute(select(*COLUMNAR_COLUMNS)).yield_per(50_000)]
+    memberships = db.execute(select(AppCategory.AppID, AppCategory.CategoryID)).all()
+    category_names = db.execute(select(Category.CategoryID, Category.CategoryName)).all()
+    return columnar.ColumnarApps(apps, memberships, category_names)
+
+# the "apps" version the store was loaded at, this process's own bumps of it since, and the apps
+# written here while a reload is under way, to be applied to the new store before it is swapped in
+columnar_state = {"version": 0, "own": 0, "loaded": 0.0, "checked": 0.0, "reloading": False, "pending": set()}
+columnar_lock = threading.Lock()
+
+def apps_version():
+    # shared by every worker with the redis and sqlite backends; the memory backend only counts the
+    # bumps of this process, so there other workers' writes wait for the age reload
+    return response_cache.backend.versions(["apps"])[0] if response_cache is not None else 0
+
+def refresh_store(db, store, app_ids):
+    apps = [columnar.App(*row) for row in db.execute(select(*COLUMNAR_COLUMNS).where(App.AppID.in_(app_ids)))]
+    memberships = db.execute(select(AppCategory.AppID, AppCategory.CategoryID).where(AppCategory.AppID.in_(app_ids))).all()
+    store.upsert(apps, memberships)
+    store.remove(set(app_ids) - {app.AppID for app in apps})
+
+def columnar_refresh(db, app_ids):
+    """Re-read committed apps into the column store; apps that are gone are dropped from it."""
+    if columnar_apps is None or not app_ids:
+        return
+    app_ids = list(set(app_ids))
+    with columnar_lock:
+        if columnar_state["reloading"]:
+            columnar_state["pending"].update(app_ids)
+    refresh_store(db, columnar_apps, app_ids)
+
+def reload_columnar(db):
+    global columnar_apps
+    try:
+        # read before loading, so any write the load may have missed moves the version past it
+        with columnar_lock:
+            version, own = apps_version(), columnar_state["own"]
+        store = load_columnar(db)
+        while True:
+            with columnar_lock:
+                pending, columnar_state["pending"] = columnar_state["pending"], set()
+                if not pending:
+                    columnar_apps = store
+                    columnar_state.update(version=version, own=columnar_state["own"] - own, loaded=time.monotonic())
+                    return
+            db.rollback()
+            refresh_store(db, store, list(pending))
+    except Exception:
+        logging.getLogger("api").exception("Reloading the columnar engine failed")
+    finally:
+        with columnar_lock:
+            columnar_state["reloading"] = False
+            columnar_state["pending"].clear()
+
+def current_columnar():
+    """The column store to answer from; schedules a background reload when it may be stale."""
+    store, now = columnar_apps, time.monotonic()
+    # only a store loaded at startup is ever reloaded; with the engine off, listings stay on SQL
+    if not COLUMNAR_ENGINE or store is None:
+        return store
+    with columnar_lock:
+        if columnar_state["reloading"] or now - columnar_state["checked"] < COLUMNAR_CHECK_INTERVAL:
+            return store
+        columnar_state["checked"] = now
+        version = apps_version()
+        stale = (version != columnar_state["version"] + columnar_state["own"]
+                 or COLUMNAR_MAX_AGE and now - columnar_state["loaded"] > COLUMNAR_MAX_AGE)
+        if stale:
+            columnar_state["reloading"] = True
+            db_executor.submit(call_with_session, reload_columnar)
+    return store
+
+@app.on_event("startup")
+async def load_columnar_engine():
+    global columnar_apps
+    if COLUMNAR_ENGINE:
+        version = apps_version()
+        columnar_apps = await run_db(load_columnar)
+        columnar_state.update(version=version, loaded=time.monotonic())
+
+@app.on_event("shutdown")
+def shutdown_db():
+    db_executor.shutdown(wait=True)
+    engine.dispose()
+
+def insert_developer(db, dev):
     developer = Developer(**dev.dict())
     db.add(developer)
+    db.flush()
+    search.index(driver_executemany(db), "developers", [(developer.DeveloperID, developer.DeveloperName, 0)])
     db.commit()
     db.refresh(developer)
+    invalidate_responses("developers")
     return developer
 
-@app.post("/apps/")
-def create_app(app_data: AppCreate, db: Session = Depends(get_db)):
-    app = App(**app_data.dict())
+@app.post("/developers/")
+async def create_developer(dev: DeveloperCreate):
+    return await run_db(insert_developer, dev)
+
+def driver_execute(db):
+    # qmark statements on the session's connection, as rollups.apply_app expects
+    connection = db.connection()
+    return lambda sql, params: connection.exec_driver_sql(sql, tuple(params)).rowcount
+
+def driver_executemany(db):
+    # the executemany counterpart, as search.index expects
+    connection = db.connection()
+    return lambda sql, rows: connection.exec_driver_sql(sql, [tuple(row) for row in rows])
+
+def reweight_search(db, changes):
+    """Carry ``(DeveloperID, category_ids, sign)`` apps added or removed into the search weights of
+    their developer and categories, which rank by app count (search.weight_deltas)."""
+    for kind, deltas in search.weight_deltas(changes).items():
+        if deltas:
+            _, key, name = SEARCH_MODELS[kind]
+            names = dict(db.query(key, name).filter(key.in_(list(deltas))).all())
+            search.reweight(driver_executemany(db), kind,
+                            [(entity_id, names[entity_id], delta) for entity_id, delta in deltas.items() if entity_id in names])
+
+def encode_app(db, values):
+    """``values`` with each lookup text (lookups.py) replaced by its key, adding keys for new texts."""
+    values = dict(values)
+    for name, (_, key, _, _, number) in lookups.LOOKUPS.items():
+        if name in values:
+            value = values.pop(name)
+            values[key] = lookup_cache.add(db.connection(), name, value)
+            if number:
+                values[number] = lookups.parse(name, value)
+    return values
+
+def insert_app(db, app_data):
+    app = App(**encode_app(db, app_data.dict()))
     db.add(app)
+    db.flush()
+    rollups.apply_app(driver_execute(db), app, [], 1)
+    search.index(driver_executemany(db), "apps", [(app.AppID, app.AppName, app.Installs)])
+    reweight_search(db, [(app.DeveloperID, [], 1)])
     db.commit()
     db.refresh(app)
-    return app
+    columnar_refresh(db, [app.AppID])
+    invalidate_counts()
+    invalidate_responses("apps", f"app:{app.AppID}", "rollups")
+    return app_record(db, app)
 
-@app.get("/apps/{app_id}")
-def get_app(app_id: str, db: Session = Depends(get_db)):
-    app = db.query(App).filter(App.AppID == app_id).first()
-    if not app:
+@app.post("/apps/")
+async def create_app(app_data: AppCreate):
+    return await run_db(insert_app, app_data)
+
+# Bulk writes: NDJSON request bodies are validated as they stream in and written BULK_BATCH_SIZE
+# rows per transaction, with set-based inserts and rollup/search deltas summed per batch
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 1000))
+
+def insert_apps(db, rows):
+    rows = [encode_app(db, values) for _, values in rows]
+    db.execute(insert(App), rows)
+    apps = [App(**values) for values in rows]
+    for app in apps:
+        # not added to the session, but their lookup texts are read on it (lookup_text)
+        db.enable_relationship_loading(app)
+    rollups.apply_apps(driver_execute(db), [(app, [], 1) for app in apps])
+    search.index(driver_executemany(db), "apps", [(app.AppID, app.AppName, app.Installs) for app in apps])
+    reweight_search(db, [(app.DeveloperID, [], 1) for app in apps])
+
+def update_apps(db, rows):
+    apps = {app.AppID: app for app in db.query(App).filter(App.AppID.in_([app_id for app_id, _ in rows]))}
+    categories = categories_by_app(db, list(apps))
+    changes, renamed, moved = [], [], []
+    for app_id, values in rows:
+        app = apps[app_id]
+        old, old_name, old_installs, old_developer = rollups.snapshot(app), app.AppName, app.Installs, app.DeveloperID
+        for field, value in encode_app(db, values).items():
+            setattr(app, field, value)
+        category_ids = [category.CategoryID for category in categories[app_id]]
+        changes += [(old, category_ids, -1), (app, category_ids, 1)]
+        if (app.AppName, app.Installs) != (old_name, old_installs):
+            renamed.append((app, old_name))
+        if app.DeveloperID != old_developer:
+            moved += [(old_developer, [], -1), (app.DeveloperID, [], 1)]
+    db.flush()
+    rollups.apply_apps(driver_execute(db), changes)
+    reweight_search(db, moved)
+    if renamed:
+        search.unindex(driver_executemany(db), "apps", [(app.AppID, old_name) for app, old_name in renamed])
+        search.index(driver_executemany(db), "apps", [(app.AppID, app.AppName, app.Installs) for app, _ in renamed])
+
+def write_batch(db, rows, write):
+    """Write ``(AppID, values)`` rows in one transaction, or row by row if that fails, so a bad
+    row only fails itself. Returns {AppID: error} for the rows that were not written."""
+    errors = {}
+    try:
+        write(db, rows)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        for row in rows:
+            try:
+                write(db, [row])
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                errors[row[0]] = str(getattr(e, "orig", e))
+    written = [app_id for app_id, _ in rows if app_id not in errors]
+    if written:
+        columnar_refresh(db, written)
+        invalidate_counts()
+        invalidate_responses("apps", "rollups", *(f"app:{app_id}" for app_id in written))
+    return errors
+
+def known_developers(db, developer_ids):
+    developer_ids = {developer_id for developer_id in developer_ids if developer_id is not None}
+    if not developer_ids:
+        return set()
+    return {developer_id for (developer_id,) in db.query(Developer.DeveloperID).filter(Developer.DeveloperID.in_(developer_ids))}
+
+def existing_apps(db, app_ids):
+    return {app_id for (app_id,) in db.query(App.AppID).filter(App.AppID.in_(set(app_ids)))}
+
+def bulk_result(line, app_id, status, error=None):
+    return {"line": line, "AppID": app_id, "status": "failed" if error else status, "error": error}
+
+def create_batch(db, batch):
+    existing = existing_apps(db, [app.AppID for _, app in batch])
+    developers = known_developers(db, [app.DeveloperID for _, app in batch])
+    errors, rows = {}, []
+    for line, app in batch:
+        if app.AppID in existing:
+            errors[line] = "App already exists"
+        elif app.DeveloperID not in developers:
+            errors[line] = "Developer not found"
+        else:
+            existing.add(app.AppID)
+            rows.append((line, app.AppID, app.dict()))
+    failed = write_batch(db, [(app_id, values) for _, app_id, values in rows], insert_apps)
+    errors.update({line: failed[app_id] for line, app_id, _ in rows if app_id in failed})
+    return [bulk_result(line, app.AppID, "created", errors.get(line)) for line, app in batch]
+
+def patch_batch(db, batch):
+    # later lines for the same app are merged over earlier ones
+    merged = {}
+    for _, patch in batch:
+        merged.setdefault(patch.AppID, {}).update(patch.dict(exclude_unset=True, exclude={"AppID"}))
+    existing = existing_apps(db, merged)
+    developers = known_developers(db, [values.get("DeveloperID") for values in merged.values()])
+    errors = {}
+    for app_id, values in merged.items():
+        if app_id not in existing:
+            errors[app_id] = "App not found"
+        elif values.get("DeveloperID") is not None and values["DeveloperID"] not in developers:
+            errors[app_id] = "Developer not found"
+    errors.update(write_batch(db, [(app_id, values) for app_id, values in merged.items() if app_id not in errors], update_apps))
+    return [bulk_result(line, patch.AppID, "updated", errors.get(patch.AppID)) for line, patch in batch]
+
+async def ndjson_lines(request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+def validation_error(e):
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+    return str(e)
+
+async def bulk_write(request, model, write):
+    results, batch, number = [], [], 0
+    async for line in ndjson_lines(request):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append((number, model(**json.loads(line))))
+        except (ValidationError, ValueError, TypeError) as e:
+            results.append(bulk_result(number, None, "failed", validation_error(e)))
+        if len(batch) >= BULK_BATCH_SIZE:
+            results.extend(await run_db(write, batch))
+            batch = []
+    if batch:
+        results.extend(await run_db(write, batch))
+    results.sort(key=lambda result: result["line"])
+    failed = sum(1 for result in results if result["error"])
+    return {"rows": len(results), "succeeded": len(results) - failed, "failed": failed, "results": results}
+
+@app.post("/apps/bulk")
+async def create_apps_bulk(request: Request):
+    """Create apps from an NDJSON body, one AppCreate object per line."""
+    return await bulk_write(request, AppCreate, create_batch)
+
+@app.patch("/apps/bulk")
+async def patch_apps_bulk(request: Request):
+    """Partially update apps from an NDJSON body; each line has an AppID and the fields to change."""
+    return await bulk_write(request, AppPatch, patch_batch)
+
+def put_app(db, app_id, values):
+    if app_id not in existing_apps(db, [app_id]):
         raise HTTPException(status_code=404, detail="App not found")
-    return app
+    if values.get("DeveloperID") is not None and not known_developers(db, [values["DeveloperID"]]):
+        raise HTTPException(status_code=400, detail="Developer not found")
+    update_apps(db, [(app_id, values)])
+    db.commit()
+    columnar_refresh(db, [app_id])
+    invalidate_counts()
+    invalidate_responses("apps", f"app:{app_id}", "rollups")
+    return read_app(db, app_id)
 
-@app.get("/apps/")
-def get_apps(
-    page: int = Query(1, alias="page", ge=1),
-    page_size: int = Query(10, alias="page_size", le=100),
+@app.put("/apps/{app_id}")
+async def update_app(app_id: str, app_data: AppUpdate):
+    # only the fields sent are changed
+    return await run_db(put_app, app_id, app_data.dict(exclude_unset=True))
+
+SEARCH_MODELS = {"apps": (App, App.AppID, App.AppName), "categories": (Category, Category.CategoryID, Category.CategoryName),
+                 "developers": (Developer, Developer.DeveloperID, Developer.DeveloperName)}
+# postings read per batch while looking for the matches of one rank
+SEARCH_BATCH = 100
+# postings read per rank at most; a query whose trigrams mostly co-occur outside the query
+# can then miss lower-weight matches of that rank, but never takes more than a few batches
+SEARCH_MAX_CANDIDATES = 2000
+
+def weight_order(model, column, value, code, after):
+    # postings of one trigram or prefix by weight, then EntityID, resumed after the last one read
+    query = select(model.EntityID, model.Weight).where(model.Kind == code, column == value)
+    if after is not None:
+        entity_id, weight = after
+        query = query.where(or_(model.Weight < weight, and_(model.Weight == weight, model.EntityID > entity_id)))
+    return query.order_by(model.Weight.desc(), model.EntityID)
+
+def search_candidates(db, code, grams=None, prefix=None, limit=SEARCH_MAX_CANDIDATES):
+    """Yield batches of ``(EntityID, Weight)`` in weight order: the entries under ``prefix``, or
+    the ones holding every trigram of ``grams``."""
+    if prefix is not None:
+        model, column, seed, others = SearchPrefix, SearchPrefix.Prefix, prefix, []
+    else:
+        entries = dict(db.execute(select(SearchGramCount.Gram, SearchGramCount.Entries)
+                                  .where(SearchGramCount.Kind == code, SearchGramCount.Gram.in_(grams))).all())
+        if len(entries) < len(grams):
+            return
+        # walk the rarest trigram's postings and primary-key probe the others, rarest first,
+        # so most postings are rejected by one probe
+        seed, *others = sorted(grams, key=lambda gram: (entries[gram], gram))
+        model, column = SearchGram, SearchGram.Gram
+    after, read = None, 0
+    while read < limit:
+        query = weight_order(model, column, seed, code, after)
+        for gram in others:
+            other = aliased(SearchGram)
+            query = query.join(other, and_(other.Kind == code, other.Gram == gram, other.EntityID == SearchGram.EntityID))
+        batch = db.execute(query.limit(min(SEARCH_BATCH, limit - read))).all()
+        if not batch:
+            return
+        yield batch
+        read += len(batch)
+        after = batch[-1]
+
+def search_names(db, kind, q, limit):
+    """Matches ranked exact, prefix, word prefix, then substring (search.score), each rank by weight.
+
+    Every rank is read from its own index in weight order until it has filled the results, so a
+    low-weight exact match is never crowded out by heavier substring matches."""
+    query = search.normalize(q)
+    code = search.KINDS[kind][0]
+    model, key, name = SEARCH_MODELS[kind]
+    if not query:
+        return {"query": q, "kind": kind, "results": []}
+    sources = [
+        (3, dict(prefix=query + search.END)),
+        # prefixes are indexed up to PREFIX_LENGTH characters; a longer query is checked by score
+        (2, dict(prefix=query[:search.PREFIX_LENGTH])),
+        (1, dict(grams=search.query_grams(q, anchored=True))),
+        (0, dict(grams=search.query_grams(q))),
+    ]
+    found, names = [], {}
+    for rank, source in sources:
+        # a one- or two-letter query has no open trigrams, so its last rank reads nothing new
+        if len(found) >= limit or source.get("grams") == set() or (rank == 0 and source["grams"] == sources[2][1]["grams"]):
+            continue
+        taken = {entity_id for _, _, entity_id in found}
+        matches = []
+        for batch in search_candidates(db, code, **source):
+            batch = [(entity_id, weight) for entity_id, weight in batch if entity_id not in taken]
+            ids = [int(entity_id) if kind != "apps" else entity_id for entity_id, _ in batch]
+            names.update((str(id), value) for id, value in db.execute(select(key, name).where(key.in_(ids))).all())
+            matches += [(weight, entity_id) for entity_id, weight in batch if search.score(q, names.get(entity_id)) == rank]
+            if len(found) + len(matches) >= limit:
+                break
+        found += [(rank, weight, entity_id) for weight, entity_id in matches]
+    # postings of one rank arrive in weight order, then EntityID; the sort only interleaves batches
+    found.sort(key=lambda match: (-match[0], -match[1], match[2]))
+    return {
+        "query": q,
+        "kind": kind,
+        "results": [{key.key: int(entity_id) if kind != "apps" else entity_id, name.key: names[entity_id]}
+                    for _, _, entity_id in found[:limit]],
+    }
+
+# declared before /apps/{app_id} so "search" and "export" are not taken for app ids
+@app.get("/apps/search")
+async def search_apps(
+    q: str = Query(..., min_length=1),
+    kind: str = Query("apps", pattern="^(apps|categories|developers)$"),
+    limit: int = Query(10, ge=1, le=50),
+    request: Request = None):
+    return await cached(request, [kind], search_names, kind, q, limit)
+
+# Exports stream every matching app in AppID order through a server-side cursor, EXPORT_CHUNK_SIZE
+# rows at a time, so memory stays flat; ?after=<last AppID received> resumes an interrupted export
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+EXPORT_COLUMNS = APP_FIELDS + ["Categories"]
+
+def export_chunks(db, lookup, category_id, rating, price, content_rating, flags, after):
+    query = filter_apps(select(*App.__table__.columns), category_id, rating, price, content_rating, flags)
+    if after:
+        query = query.where(App.AppID > after)
+    result = db.execute(query.order_by(App.AppID).execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    for rows in result.partitions():
+        # categories come from a second connection, since some drivers allow one open result per connection
+        categories = categories_by_app(lookup, [row.AppID for row in rows])
+        yield [[*values, " & ".join(category.CategoryName for category in categories[row.AppID])]
+               for row, values in zip(rows, app_rows(lookup, rows))]
+
+def export_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+def encode_csv(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([export_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def encode_ndjson(rows, header=False):
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, map(export_value, row))), separators=(",", ":")) + "\n" for row in rows).encode()
+
+export_slots = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+async def export_stream(encode, header, *filters):
+    # further exports queue here instead of taking the connections the executor counts on
+    async with export_slots:
+        async for body in export_body(encode, header, *filters):
+            yield body
+
+async def export_body(encode, header, *filters):
+    db, lookup = SessionLocal(), SessionLocal()
+    try:
+        chunks = export_chunks(db, lookup, *filters)
+        while True:
+            # each chunk is fetched on the bounded DB executor, like every other query
+            rows = await in_executor(next, chunks, None)
+            if rows is None:
+                break
+            with metrics.phase("encode"):
+                body = encode(rows, header=header)
+            yield body
+            header = False
+        if header:
+            yield encode([], header=True)
+    finally:
+        await in_executor(db.close)
+        await in_executor(lookup.close)
+
+EXPORT_FORMATS = {"csv": (encode_csv, "text/csv"), "ndjson": (encode_ndjson, "application/x-ndjson")}
+
+@app.get("/apps/export")
+async def export_apps(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    category_id: int = None,
+    rating: float = None,
+    price: float = None,
+    content_rating: str = None,
+    free: bool = None,
+    ad_supported: bool = None,
+    in_app_purchases: bool = None,
+    editors_choice: bool = None,
+    after: str = Query(None, description="AppID of the last row already received; the export resumes after it")):
+    encode, media_type = EXPORT_FORMATS[format]
+    flags = flag_filters(free, ad_supported, in_app_purchases, editors_choice)
+    # a resumed export continues a file that already has its header
+    stream = export_stream(encode, not after, category_id, rating, price, content_rating, flags, after)
+    return StreamingResponse(stream, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="apps.{format}"'})
+
+# Facet counts: how many apps of each category, content rating and flag value match the filters.
+# Each facet is counted under every filter but its own, so the values not picked keep their counts.
+def sql_facets(db, category_id, rating, price, content_rating, flags):
+    filters = dict(category_id=category_id, rating=rating, price=price, content_rating=content_rating, flags=flags)
+
+    def counts(query, column, **without):
+        return {value: count for value, count in filter_apps(query, **{**filters, **without}).group_by(column) if value is not None}
+
+    with metrics.phase("count"):
+        total = filter_apps(db.query(func.count(App.AppID)), **filters).scalar()
+    with metrics.phase("facets"):
+        return {
+            "total": total,
+            "categories": counts(db.query(AppCategory.CategoryID, func.count()).join(App, App.AppID == AppCategory.AppID),
+                                 AppCategory.CategoryID, category_id=None),
+            "content_ratings": counts(db.query(App.ContentRatingID, func.count()), App.ContentRatingID, content_rating=None),
+            "flags": {flag: counts(db.query(getattr(App, flag), func.count()), getattr(App, flag),
+                                   flags=tuple(pair for pair in flags if pair[0] != flag))
+                      for flag in columnar.FLAGS},
+        }
+
+def facet_counts(db, category_id, rating, price, content_rating, flags):
+    store = current_columnar()
+    if store is not None:
+        # bitmap intersections in memory (columnar.py, bitmaps.py)
+        with metrics.phase("columnar"):
+            facets = store.facets(category_id, rating, price, columnar_content_rating(db, content_rating), flags)
+        names = store.category_names
+    else:
+        facets = sql_facets(db, category_id, rating, price, content_rating, flags)
+        names = dict(db.query(Category.CategoryID, Category.CategoryName).filter(Category.CategoryID.in_(list(facets["categories"]))))
+    texts = lookup_cache.texts(db, "ContentRating", facets["content_ratings"])
+
+    def by_count(counts):
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    return {
+        "total": facets["total"],
+        "categories": [{"CategoryID": key, "CategoryName": names.get(key), "count": count}
+                       for key, count in by_count(facets["categories"])],
+        "content_ratings": [{"ContentRating": texts.get(key), "count": count} for key, count in by_count(facets["content_ratings"])],
+        "flags": {flag: {"true": counts.get(True, 0), "false": counts.get(False, 0)} for flag, counts in facets["flags"].items()},
+    }
+
+@app.get("/apps/facets")
+async def get_facets(
     category_id: int = None,
     rating: float = None,
     price: float = None,
     content_rating: str = None,
-    db: Session = Depends(get_db)):
-    query = db.query(App).join(AppCategory).join(Category).join(Developer)
+    free: bool = None,
+    ad_supported: bool = None,
+    in_app_purchases: bool = None,
+    editors_choice: bool = None,
+    request: Request = None):
+    flags = flag_filters(free, ad_supported, in_app_purchases, editors_choice)
+    return await cached(request, ["apps"], facet_counts, category_id, rating, price, content_rating, flags)
+
+def read_app(db, app_id):
+    app = db.query(App).filter(App.AppID == app_id).first()
+    if not app:
+        raise HTTPException(status_code=404, detail="App not found")
+    return app_record(db, app)
 
+@app.get("/apps/{app_id}")
+async def get_app(app_id: str, request: Request):
+    return await cached(request, [f"app:{app_id}"], read_app, app_id)
+
+def filter_apps(query, category_id, rating, price, content_rating, flags=()):
     if category_id:
-        query = query.filter(Category.CategoryID == category_id)
+        # IN over the category's members reads idx_app_categories_category (migrate.py) instead of
+        # probing AppCategories once per app, so a category filter costs the size of the category
+        query = query.filter(App.AppID.in_(select(AppCategory.AppID).where(AppCategory.CategoryID == category_id)))
     if rating:
         query = query.filter(App.Rating >= rating)
     if price:
         query = query.filter(App.Price <= price)
     if content_rating:
         query = query.filter(App.ContentRating == content_rating)
+    for flag, value in flags:
+        query = query.filter(getattr(App, flag) == value)
+    return query
 
-    query = query.order_by(App.LastUpdated.desc())  
+def columnar_content_rating(db, content_rating):
+    if not content_rating:
+        return None
+    content_rating_id = lookup_cache.key(db, "ContentRating", content_rating)
+    return content_rating_id if content_rating_id is not None else columnar.NO_KEY
 
-    data = query.offset((page - 1) * page_size).limit(page_size).all()
-    data = [AppBase.from_orm(app) for app in data]
+def list_columnar(db, store, page, page_size, category_id, rating, price, content_rating, cursor, flags):
+    with metrics.phase("columnar"):
+        total, data = store.query(category_id, rating, price, columnar_content_rating(db, content_rating), flags,
+                                          decode_cursor(cursor) if cursor else None, (page - 1) * page_size, page_size)
+    names = store.category_names
     return {
         "page": page,
         "page_size": page_size,
-        "total": query.count(),
+        "total": total,
+        "total_is_estimate": False,
+        "next_cursor": encode_cursor(data[-1]) if len(data) == page_size else None,
+        "apps": [AppBase(AppID=app.AppID, AppName=app.AppName,
+                         Categories=[CategoryBase(CategoryID=category_id, CategoryName=names[category_id])
+                                     for category_id in app.CategoryIDs if category_id in names])
+                 for app in data]
+    }
+
+def list_apps(db, page, page_size, category_id, rating, price, content_rating, cursor, estimate, flags=()):
+    store = current_columnar()
+    if store is not None:
+        return list_columnar(db, store, page, page_size, category_id, rating, price, content_rating, cursor, flags)
+    # only the columns the listing returns (plus the sort key), never full App rows
+    query = filter_apps(db.query(App.AppID, App.AppName, App.LastUpdated), category_id, rating, price, content_rating, flags)
+
+    with metrics.phase("count"):
+        if estimate:
+            total = estimate_total(db, category_id, rating, price, content_rating, flags)
+        else:
+            key = count_key(category_id, rating, price, content_rating, flags)
+            total = count_cache.get(key)
+            if total is None:
+                total = query.count()
+                count_cache.set(key, total)
+    query = query.order_by(App.LastUpdated.desc(), App.AppID.desc())
+
+    with metrics.phase("page"):
+        if cursor:
+            data = seek_after(query, cursor).limit(page_size).all()
+        else:
+            data = query.offset((page - 1) * page_size).limit(page_size).all()
+    next_cursor = encode_cursor(data[-1]) if len(data) == page_size else None
+    with metrics.phase("categories"):
+        categories = categories_by_app(db, [app.AppID for app in data])
+    data = [AppBase(AppID=app.AppID, AppName=app.AppName, Categories=categories[app.AppID]) for app in data]
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_is_estimate": estimate,
+        "next_cursor": next_cursor,
         "apps": data
     }
 
-@app.get("/apps/{app_id}")
-def get_app(app_id: str, db: Session = Depends(get_db)):
-    app = db.query(App).filter(App.AppID == app_id).first()
-    if not app:
-        raise HTTPException(status_code=404, detail="App not found")
-    return app
+@app.get("/apps/")
+async def get_apps(
+    page: int = Query(1, alias="page", ge=1),
+    page_size: int = Query(10, alias="page_size", le=100),
+    category_id: int = None,
+    rating: float = None,
+    price: float = None,
+    content_rating: str = None,
+    free: bool = None,
+    ad_supported: bool = None,
+    in_app_purchases: bool = None,
+    editors_choice: bool = None,
+    cursor: str = Query(None, description="next_cursor from the previous response; replaces page"),
+    estimate: bool = Query(False, description="return an approximate total from table statistics"),
+    request: Request = None):
+    flags = flag_filters(free, ad_supported, in_app_purchases, editors_choice)
+    args = (page, page_size, category_id, rating, price, content_rating, cursor, estimate, flags)
+    if cursor or page > RESPONSE_CACHE_MAX_PAGE:
+        return Response(serialize(await run_db(list_apps, *args)), media_type="application/json")
+    return await cached(request, ["apps"], list_apps, *args)
 
-@app.delete("/apps/{app_id}")
-def delete_app(app_id: str, db: Session = Depends(get_db)):
+def remove_app(db, app_id):
     app = db.query(App).filter(App.AppID == app_id).first()
     if not app:
         raise HTTPException(status_code=404, detail="App not found")
+    rollups.apply_app(driver_execute(db), app, [category.CategoryID for category in app.categories], -1)
+    search.unindex(driver_executemany(db), "apps", [(app_id, app.AppName)])
+    reweight_search(db, [(app.DeveloperID, [category.CategoryID for category in app.categories], -1)])
     db.delete(app)
     db.commit()
+    columnar_refresh(db, [app_id])
+    invalidate_counts()
+    invalidate_responses("apps", f"app:{app_id}", "rollups")
     return {"message": f"App {app_id} deleted successfully"}
 
-@app.get("/categores/")
-def get_categores(
-    page: int = Query(1, alias="page", ge=1),
-    page_size: int = Query(10, alias="page_size", le=100),
-    name: str = Query(None, alias="name"),
-    db: Session = Depends(get_db)):
+@app.delete("/apps/{app_id}")
+async def delete_app(app_id: str):
+    return await run_db(remove_app, app_id)
+
+def list_categores(db, page, page_size, name):
     query = db.query(Category)
 
     if name:
@@ -192,3 +1269,92 @@ def get_categores(
         "categores": query.offset((page - 1) * page_size).limit(page_size).all()
     }
 
+@app.get("/categores/")
+async def get_categores(
+    page: int = Query(1, alias="page", ge=1),
+    page_size: int = Query(10, alias="page_size", le=100),
+    name: str = Query(None, alias="name"),
+    request: Request = None):
+    return await cached(request, ["categories"], list_categores, page, page_size, name)
+
+# Aggregates over the whole store, answered from the rollup tables built by importData.py
+def rollup_filter(category_id, content_rating, released_year, all_categories=False):
+    clauses, params = [], {}
+    if not all_categories:
+        clauses.append("CategoryID = :category_id")
+        params["category_id"] = category_id or 0
+    if content_rating:
+        clauses.append("ContentRating = :content_rating")
+        params["content_rating"] = content_rating
+    if released_year:
+        clauses.append("ReleasedYear = :released_year")
+        params["released_year"] = released_year
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def rating_histogram(db, category_id, content_rating, released_year):
+    where, params = rollup_filter(category_id, content_rating, released_year)
+    rows = db.execute(text(f"SELECT RatingBucket, SUM(AppCount) FROM RatingRollup{where} GROUP BY RatingBucket ORDER BY RatingBucket"), params).all()
+    return {"buckets": [{"rating": bucket / 2, "apps": int(apps)} for bucket, apps in rows if apps]}
+
+def installs_distribution(db, category_id, content_rating, released_year):
+    where, params = rollup_filter(category_id, content_rating, released_year)
+    rows = db.execute(text(f"SELECT InstallsBucket, SUM(AppCount) FROM InstallsRollup{where} GROUP BY InstallsBucket ORDER BY InstallsBucket"), params).all()
+    return {"buckets": [{"installs": rollups.installs_label(bucket), "apps": int(apps)} for bucket, apps in rows if apps]}
+
+PRICING_GROUPS = {"category": "CategoryID", "content_rating": "ContentRating", "released_year": "ReleasedYear"}
+
+def pricing_breakdown(db, group_by, category_id, content_rating, released_year):
+    column = PRICING_GROUPS[group_by]
+    by_category = group_by == "category"
+    where, params = rollup_filter(category_id, content_rating, released_year, all_categories=by_category)
+    if by_category:
+        where += (" AND " if where else " WHERE ") + "CategoryID <> 0"
+    rows = db.execute(text(f"""
+        SELECT {column}, SUM(AppCount), SUM(CASE WHEN Free = 1 THEN AppCount ELSE 0 END),
+               SUM(CASE WHEN AdSupported = 1 THEN AppCount ELSE 0 END), SUM(PriceSum)
+        FROM PricingRollup{where}
+        GROUP BY {column} ORDER BY {column}"""), params).all()
+    names = dict(db.query(Category.CategoryID, Category.CategoryName).all()) if by_category else {}
+    groups = []
+    for group, apps, free, ad_supported, price_sum in rows:
+        paid = int(apps) - int(free)
+        groups.append({
+            group_by: names.get(group, group) if by_category else group,
+            "apps": int(apps),
+            "free": int(free),
+            "paid": paid,
+            "ad_supported": int(ad_supported),
+            "average_paid_price": round(float(price_sum) / paid, 2) if paid else None,
+        })
+    return {"group_by": group_by, "groups": groups}
+
+@app.get("/stats/ratings")
+async def get_rating_histogram(category_id: int = None, content_rating: str = None, released_year: int = None, request: Request = None):
+    return await cached(request, ["rollups"], rating_histogram, category_id, content_rating, released_year)
+
+@app.get("/stats/installs")
+async def get_installs_distribution(category_id: int = None, content_rating: str = None, released_year: int = None, request: Request = None):
+    return await cached(request, ["rollups"], installs_distribution, category_id, content_rating, released_year)
+
+@app.get("/stats/pricing")
+async def get_pricing_breakdown(
+    group_by: str = Query("category", pattern="^(category|content_rating|released_year)$"),
+    category_id: int = None,
+    content_rating: str = None,
+    released_year: int = None,
+    request: Request = None):
+    return await cached(request, ["rollups"], pricing_breakdown, group_by, category_id, content_rating, released_year)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, SQL and phase metrics of this worker process in the Prometheus text format."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "responses": response_cache.stats() if response_cache is not None else None,
+        "counts": {"entries": len(count_cache)},
+        "columnar": {"apps": len(columnar_apps), "bytes": columnar_apps.nbytes(), "age": time.monotonic() - columnar_state["loaded"],
+                     "reloading": columnar_state["reloading"]} if columnar_apps is not None else None,
+    }
@@ -0,0 +1,78 @@
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+from cleanData import DTYPES, TRANSFORMS, USECOLS
+
+file_path = 'Google-Playstore.csv'
+sample_rows = 200_000
+target_rows = 2_000_000
+
+
+def time_transforms(raw, repeat):
+    """Best-of-``repeat`` seconds per transform, each run on the output of the previous one."""
+    timings = {transform.__name__: float('inf') for transform in TRANSFORMS}
+    for _ in range(repeat):
+        df = raw.copy()
+        for transform in TRANSFORMS:
+            started = time.perf_counter()
+            df = transform(df)
+            timings[transform.__name__] = min(timings[transform.__name__], time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every cleaning transform in cleanData.py.")
+    parser.add_argument('--file', default=file_path, help="CSV to sample rows from")
+    parser.add_argument('--rows', type=int, default=sample_rows, help="rows read from the top of the CSV")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per transform; the fastest one is kept")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown per transform before failing")
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.file, usecols=USECOLS, dtype=DTYPES, nrows=args.rows)
+    rows = len(raw)
+    timings = time_transforms(raw, args.repeat)
+
+    results = {
+        'rows': rows,
+        'transforms': {
+            name: {'seconds': seconds, 'rows_per_sec': rows / seconds if seconds else None,
+                   'projected_seconds': seconds * target_rows / rows}
+            for name, seconds in timings.items()
+        },
+    }
+    results['total_projected_seconds'] = sum(t['projected_seconds'] for t in results['transforms'].values())
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['transforms']
+
+    print(f"{'transform':<20}{'seconds':>10}{'rows/sec':>14}{f'@{target_rows:,} rows':>16}{'vs baseline':>14}")
+    regressions = []
+    for name, result in results['transforms'].items():
+        change = ""
+        if baseline and name in baseline:
+            ratio = result['projected_seconds'] / baseline[name]['projected_seconds']
+            change = f"{ratio - 1:+.0%}"
+            if ratio > 1 + args.tolerance:
+                regressions.append(name)
+        print(f"{name:<20}{result['seconds']:>10.4f}{result['rows_per_sec']:>14,.0f}{result['projected_seconds']:>15.2f}s{change:>14}")
+    print(f"{'total':<20}{'':>10}{'':>14}{results['total_projected_seconds']:>15.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"✗ Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import quote
+
+import pandas as pd
+
+import generateData
+import loadTest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# End-to-end benchmarks on a synthetic (or real) Google-Playstore.csv against the local SQLite
+# stand-in: cleaning, dimension and fact loading, and every API endpoint under concurrent load.
+# Each scenario runs in a fresh process so its peak memory is its own; results are written as
+# JSON and a later run can be compared against them with --baseline.
+work_dir = '.bench'
+SCENARIOS = ['clean', 'load', 'api']
+
+# metrics where a bigger number is better; every other timing or memory figure should shrink
+HIGHER_IS_BETTER = ('rows_per_sec', 'requests_per_sec')
+LOWER_IS_BETTER = ('seconds', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'peak_memory_mb', 'server_peak_memory_mb')
+# the metrics that fail a run when they get worse than --tolerance
+GATED = ('rows_per_sec', 'requests_per_sec', 'p95_ms', 'peak_memory_mb', 'server_peak_memory_mb')
+
+
+def dataset_path(directory, rows, seed):
+    return os.path.join(directory, f"playstore-{rows}-{seed}.csv")
+
+
+def ensure_dataset(directory, rows, seed):
+    """The synthetic CSV for ``rows`` and ``seed``, generated once and reused by later runs."""
+    path = dataset_path(directory, rows, seed)
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        temp = path + '.tmp'
+        generateData.generate(temp, rows, seed)
+        os.replace(temp, path)
+        print(f"   ✓ Generated {path} in {time.perf_counter() - started:,.1f}s")
+    return path
+
+
+def children_peak_memory_mb():
+    """Peak resident memory of the largest child process that has already exited."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def throughput(rows, seconds):
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds else None}
+
+
+def bench_clean(path, chunk_size):
+    """Parse and clean the whole CSV chunk by chunk, as importData.py does without a snapshot."""
+    from cleanData import clean_frame, read_chunks
+
+    rows = 0
+    started = time.perf_counter()
+    for chunk in read_chunks(path, chunk_size):
+        clean_frame(chunk)
+        rows += len(chunk)
+    return throughput(rows, time.perf_counter() - started)
+
+
+def bench_load(path, db_path, chunk_size, batch_size):
+    """Load the cleaned CSV into a new SQLite database, timing each stage apart from cleaning."""
+    import metrics
+    import rollups
+    import search
+    from bulkLoader import BulkLoader
+    from cleanData import clean_frame, read_chunks
+    from database import connect
+    from dedup import LatestScrape
+    from importData import load_chunk
+    from initDatabase import create_sqlite
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_sqlite(db_path)
+    conn, dialect = connect(db_path)
+    loader = BulkLoader(conn, dialect, batch_size)
+
+    rows = 0
+    stages = metrics.Stages()
+    latest = LatestScrape().scan(path, chunk_size, stages)
+    for number, chunk in enumerate(read_chunks(path, chunk_size)):
+        with stages.timed('dedup'):
+            chunk = latest.keep(chunk, number * chunk_size)
+        df = clean_frame(chunk)
+        rows += len(df)
+        load_chunk(conn, loader, df, stages=stages)
+    with stages.timed('rollups'):
+        rollups.rebuild(conn.cursor(), dialect)
+        conn.commit()
+    with stages.timed('search'):
+        search.rebuild(conn, dialect, batch_size)
+        conn.commit()
+    conn.close()
+
+    result = throughput(rows, sum(stages.seconds.values()))
+    result['stages'] = {stage: throughput(rows, seconds) for stage, seconds in stages.seconds.items()}
+    return result
+
+
+def api_fixtures(db_path, seed, samples=1000):
+    """Keys the endpoints are called with, drawn deterministically from the loaded database."""
+    conn = sqlite3.connect(db_path)
+    rng = random.Random(seed)
+    total = conn.execute("SELECT COUNT(*) FROM Apps").fetchone()[0]
+    # one pass over the primary key, keeping a fixed random set of positions
+    wanted = set(rng.sample(range(total), min(samples, total)))
+    apps = [row for position, row in enumerate(conn.execute("SELECT AppID, AppName FROM Apps ORDER BY AppID")) if position in wanted]
+    rng.shuffle(apps)
+    categories = [row[0] for row in conn.execute(
+        "SELECT CategoryID FROM AppCategories GROUP BY CategoryID ORDER BY COUNT(*) DESC, CategoryID")]
+    words = [word for _, name in apps for word in name.split() if len(word) >= 3]
+    fixtures = {
+        'app_ids': [app_id for app_id, _ in apps],
+        'categories': categories,
+        # the smallest categories keep a full export to a few hundred rows
+        'small_categories': categories[-5:],
+        'content_ratings': [row[0] for row in conn.execute("SELECT ContentRating FROM ContentRatings ORDER BY ContentRatingID")],
+        'queries': [word[:rng.randint(2, min(len(word), 6))].lower() for word in words[:samples]],
+        'developer_id': conn.execute("SELECT MIN(DeveloperID) FROM Developers").fetchone()[0],
+    }
+    conn.close()
+    return fixtures
+
+
+def walk_cursors(base_url, pages):
+    """next_cursor values of the first ``pages`` pages of the default listing."""
+    cursors, cursor = [], None
+    for _ in range(pages):
+        params = {'page_size': 10, 'cursor': cursor} if cursor else {'page_size': 10}
+        cursor = loadTest.session().get(base_url + "/apps/", params=params, timeout=60).json().get('next_cursor')
+        if not cursor:
+            break
+        cursors.append(cursor)
+    return cursors
+
+
+def api_calls(fixtures):
+    """Endpoint name -> (share of --requests, call number -> (method, path, JSON body)).
+
+    Parameters rotate with the call number, so the response cache is exercised the way a crowd
+    of dashboard users would, not answered from one entry; writes run last, after the reads."""
+    f = fixtures
+
+    def rotate(values, number):
+        return values[number % len(values)]
+
+    def app_body(number):
+        return {"AppID": f"bench.app{number}", "AppName": f"Benchmark App {number}", "Rating": 4.0, "RatingCount": 10,
+                "Installs": 100, "Price": 0, "Currency": "USD", "Free": True, "DeveloperID": f['developer_id']}
+
+    return {
+        'list': (1, lambda n: ('GET', f"/apps/?page={n % 3 + 1}&page_size=10", None)),
+        'list_deep': (1, lambda n: ('GET', f"/apps/?page={10 + n % 200}&page_size=10", None)),
+        'list_cursor': (1, lambda n: ('GET', f"/apps/?page_size=10&cursor={rotate(f['cursors'], n)}", None)),
+        'list_filtered': (1, lambda n: ('GET', f"/apps/?page={n % 3 + 1}&page_size=20&rating={3 + n % 20 / 10}&price=5", None)),
+        'list_category': (1, lambda n: ('GET', f"/apps/?page_size=10&category_id={rotate(f['categories'], n)}", None)),
+        'list_content_rating': (1, lambda n: ('GET', f"/apps/?page_size=10&content_rating={quote(rotate(f['content_ratings'], n))}", None)),
+        'list_estimate': (1, lambda n: ('GET', f"/apps/?page_size=10&estimate=true&category_id={rotate(f['categories'], n)}&rating=4", None)),
+        'app': (1, lambda n: ('GET', f"/apps/{rotate(f['app_ids'], n)}", None)),
+        'categories': (1, lambda n: ('GET', f"/categores/?page={n % 3 + 1}", None)),
+        'search': (1, lambda n: ('GET', f"/apps/search?q={quote(rotate(f['queries'], n))}", None)),
+        'stats_ratings': (1, lambda n: ('GET', f"/stats/ratings?category_id={rotate(f['categories'], n)}", None)),
+        'stats_installs': (1, lambda n: ('GET', f"/stats/installs?category_id={rotate(f['categories'], n)}", None)),
+        'stats_pricing': (1, lambda n: ('GET', f"/stats/pricing?group_by={rotate(['category', 'content_rating', 'released_year'], n)}", None)),
+        'export': (0.05, lambda n: ('GET', f"/apps/export?category_id={rotate(f['small_categories'], n)}", None)),
+        'create': (1, lambda n: ('POST', "/apps/", app_body(n))),
+        'update': (1, lambda n: ('PUT', f"/apps/{rotate(f['app_ids'], n)}", {"Rating": round(1 + n % 40 / 10, 1)})),
+        'delete': (1, lambda n: ('DELETE', f"/apps/bench.app{n}", None)),
+    }
+
+
+def bench_api(db_path, seed, concurrency, requests, server_workers, port):
+    """Serve a copy of the loaded database and call every endpoint ``requests`` times."""
+    # writes go to a copy, so every run starts from the same loaded database
+    served = db_path + '.api'
+    shutil.copyfile(db_path, served)
+    fixtures = api_fixtures(served, seed)
+    base_url = f"http://127.0.0.1:{port}"
+    server = loadTest.serve(served, server_workers, port)
+    try:
+        loadTest.wait_until_up(base_url)
+        fixtures['cursors'] = walk_cursors(base_url, 50)
+        endpoints = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name, (share, call) in api_calls(fixtures).items():
+                calls = [call(number) for number in range(max(concurrency, int(requests * share)))]
+                started = time.perf_counter()
+                outcomes = list(pool.map(lambda c: loadTest.timed_request(c[0], base_url + c[1], c[2]), calls))
+                elapsed = time.perf_counter() - started
+                latencies = [latency for latency, ok in outcomes if ok]
+                endpoints[name] = loadTest.summarize(latencies, sum(1 for _, ok in outcomes if not ok), elapsed)
+                endpoints[name]['example'] = calls[0][0] + " " + calls[0][1]
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(served)
+    return {'concurrency': concurrency, 'server_workers': server_workers,
+            'server_peak_memory_mb': children_peak_memory_mb(), 'endpoints': endpoints}
+
+
+BENCHMARKS = {'clean': bench_clean, 'load': bench_load, 'api': bench_api}
+
+
+def run_isolated(scenario, *args):
+    from importData import peak_memory_mb
+
+    result = BENCHMARKS[scenario](*args)
+    result['peak_memory_mb'] = peak_memory_mb()
+    return result
+
+
+def in_fresh_process(scenario, *args):
+    # spawned rather than forked, so nothing this process has allocated counts towards the peak
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+        return pool.submit(run_isolated, scenario, *args).result()
+
+
+def metrics(results, prefix=''):
+    """Every numeric leaf of ``results`` as a dotted path, e.g. ``api.endpoints.list.p95_ms``."""
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from metrics(value, path + '.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(results, baseline, tolerance):
+    """``(path, baseline, current, change)`` per comparable metric, where a positive change is
+    worse; and the gated paths that got worse by more than ``tolerance``."""
+    old = dict(metrics(baseline['scenarios']))
+    changes, regressions = [], []
+    for path, value in metrics(results['scenarios']):
+        name = path.rsplit('.', 1)[-1]
+        if path not in old or not old[path] or not value or name not in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            continue
+        change = old[path] / value - 1 if name in HIGHER_IS_BETTER else value / old[path] - 1
+        changes.append((path, old[path], value, change))
+        if name in GATED and change > tolerance:
+            regressions.append(path)
+    return changes, regressions
+
+
+def print_results(results, changes):
+    change_of = {path: f"{change:+.0%}" for path, _, _, change in changes}
+    scenarios = results['scenarios']
+    rows = []
+    for scenario in ('clean', 'load'):
+        if scenario in scenarios:
+            rows.append((scenario, scenario))
+            rows.extend((f"  {stage}", f"{scenario}.stages.{stage}") for stage in scenarios[scenario].get('stages', {}))
+    if rows:
+        print(f"\n{'scenario':<22}{'rows':>12}{'seconds':>10}{'rows/sec':>14}{'peak MB':>10}{'vs baseline':>14}")
+        for label, path in rows:
+            result = scenarios
+            for key in path.split('.'):
+                result = result[key]
+            memory = result.get('peak_memory_mb')
+            memory = f"{memory:,.0f}" if memory is not None else ""
+            print(f"{label:<22}{result['rows']:>12,}{result['seconds']:>10.2f}{result['rows_per_sec'] or 0:>14,.0f}"
+                  f"{memory:>10}{change_of.get(path + '.rows_per_sec', ''):>14}")
+
+    if 'api' in scenarios:
+        api = scenarios['api']
+        print(f"\n{'endpoint':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'p95 vs baseline':>17}")
+        for name, result in api['endpoints'].items():
+            print(f"{name:<22}{result['requests_per_sec'] or 0:>10,.0f}{result['p50_ms'] or 0:>10.1f}{result['p95_ms'] or 0:>10.1f}"
+                  f"{result['p99_ms'] or 0:>10.1f}{result['errors']:>8}{change_of.get(f'api.endpoints.{name}.p95_ms', ''):>17}")
+        server = api['server_peak_memory_mb']
+        print(f"server peak memory {server:,.0f} MB" if server is not None else "server peak memory n/a")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cleaning, loading and the API on synthetic data.")
+    parser.add_argument('--rows', type=int, default=100_000,
+                        help=f"synthetic apps to generate ({generateData.min_rows:,} to {generateData.max_rows:,})")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data and of the API call mix")
+    parser.add_argument('--file', help="benchmark this CSV instead of synthetic data")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="scenario to run (repeatable); all by default")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="rows read and cleaned per chunk")
+    parser.add_argument('--batch-size', type=int, default=10_000, help="rows sent per executemany round trip")
+    parser.add_argument('--concurrency', type=int, default=16, help="client threads calling the API")
+    parser.add_argument('--requests', type=int, default=500, help="calls per API endpoint")
+    parser.add_argument('--server-workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--port', type=int, default=8766, help="port the API is served on")
+    parser.add_argument('--work-dir', default=work_dir, help="where generated CSVs and databases are kept")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed regression per gated metric before failing")
+    args = parser.parse_args()
+    if not args.file and not generateData.min_rows <= args.rows <= generateData.max_rows:
+        parser.error(f"--rows must be between {generateData.min_rows:,} and {generateData.max_rows:,}")
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    path = args.file or ensure_dataset(args.work_dir, args.rows, args.seed)
+    db_path = os.path.join(args.work_dir, os.path.splitext(os.path.basename(path))[0] + '.db')
+    selected = [scenario for scenario in SCENARIOS if scenario in (args.scenario or SCENARIOS)]
+    if 'api' in selected and 'load' not in selected and not os.path.exists(db_path):
+        print(f"   ! {db_path} has not been loaded yet; running the load scenario first")
+        selected.insert(selected.index('api'), 'load')
+
+    results = {
+        'dataset': {'file': path, 'rows': None if args.file else args.rows, 'seed': args.seed, 'bytes': os.path.getsize(path)},
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'scenarios': {},
+    }
+    arguments = {
+        'clean': (path, args.chunk_size),
+        'load': (path, db_path, args.chunk_size, args.batch_size),
+        'api': (db_path, args.seed, args.concurrency, args.requests, args.server_workers, args.port),
+    }
+    for scenario in selected:
+        started = time.perf_counter()
+        results['scenarios'][scenario] = in_fresh_process(scenario, *arguments[scenario])
+        print(f"   ✓ {scenario} finished in {time.perf_counter() - started:,.1f}s")
+
+    changes, regressions = [], []
+    if args.baseline:
+        with open(args.baseline) as f:
+            changes, regressions = compare(results, json.load(f), args.tolerance)
+    print_results(results, changes)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    errors = [name for name, result in results['scenarios'].get('api', {}).get('endpoints', {}).items() if result['errors']]
+    if errors:
+        print(f"✗ Requests failed on: {', '.join(errors)}")
+    if regressions:
+        print(f"✗ Worse than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+    if errors or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import numpy as np
+
+# Roaring-style compressed bitmaps of row numbers (Chambi, Lemire et al., "Better bitmap performance
+# with Roaring bitmaps"). Rows are split by their high 16 bits into chunks of 65536; a chunk holding
+# at most ARRAY_MAX rows keeps them as a sorted uint16 array, a denser one as a 65536-bit bitset of
+# 1024 uint64 words. Either way a chunk never takes more than 8 KB, and sparse sets stay small.
+CHUNK_BITS = 16
+CHUNK = 1 << CHUNK_BITS
+LOW = CHUNK - 1
+ARRAY_MAX = 4096
+
+
+def _is_bits(container):
+    return container.dtype == np.uint64
+
+
+def _pack(values):
+    """A bitset of the low row numbers in ``values``."""
+    bits = np.zeros(CHUNK, dtype=bool)
+    bits[values] = True
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def _unpack(words):
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return int(np.bitwise_count(words).sum())
+else:
+    # numpy < 2.0 has no popcount ufunc; counting the unpacked bits is slower but exact
+    def _popcount(words):
+        return int(np.count_nonzero(np.unpackbits(words.view(np.uint8))))
+
+
+def _count(container):
+    return _popcount(container) if _is_bits(container) else len(container)
+
+
+def _test(words, values):
+    """Which of the low row numbers in ``values`` are set in the bitset ``words``."""
+    values = values.astype(np.uint64)
+    return (words[values >> np.uint64(6)] >> (values & np.uint64(63))) & np.uint64(1) == 1
+
+
+def _compact(container):
+    """``container`` in the smaller of the two forms, or None when it is empty."""
+    count = _count(container)
+    if not count:
+        return None
+    if _is_bits(container):
+        return _unpack(container) if count <= ARRAY_MAX else container
+    return _pack(container) if count > ARRAY_MAX else container
+
+
+def _and(a, b):
+    if _is_bits(a) and _is_bits(b):
+        return _compact(a & b)
+    if _is_bits(a):
+        a, b = b, a
+    if _is_bits(b):
+        return _compact(a[_test(b, a)])
+    return _compact(np.intersect1d(a, b, assume_unique=True))
+
+
+def _and_count(a, b):
+    if _is_bits(a) and _is_bits(b):
+        return _popcount(a & b)
+    if _is_bits(a):
+        a, b = b, a
+    if _is_bits(b):
+        return int(np.count_nonzero(_test(b, a)))
+    return len(np.intersect1d(a, b, assume_unique=True))
+
+
+class Bitmap:
+    """A set of row numbers, as {high 16 bits: container} with containers as described above."""
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """The bitmap of ``rows``, a list or array of non-negative row numbers."""
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        containers = {}
+        for part in np.split(rows, np.flatnonzero(np.diff(rows >> CHUNK_BITS)) + 1):
+            if len(part):
+                containers[int(part[0]) >> CHUNK_BITS] = _compact((part & LOW).astype(np.uint16))
+        return cls(containers)
+
+    @classmethod
+    def from_mask(cls, mask):
+        """The bitmap of the rows where the boolean array ``mask`` is set."""
+        containers = {}
+        for key, start in enumerate(range(0, len(mask), CHUNK)):
+            part = mask[start:start + CHUNK]
+            count = int(np.count_nonzero(part))
+            if count > ARRAY_MAX:
+                containers[key] = np.packbits(np.pad(part, (0, CHUNK - len(part))), bitorder="little").view(np.uint64)
+            elif count:
+                containers[key] = np.flatnonzero(part).astype(np.uint16)
+        return cls(containers)
+
+    def __len__(self):
+        return sum(_count(container) for container in self.containers.values())
+
+    def __and__(self, other):
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            container = _and(self.containers[key], other.containers[key])
+            if container is not None:
+                containers[key] = container
+        return Bitmap(containers)
+
+    def and_count(self, other):
+        """``len(self & other)``, without building the intersection."""
+        return sum(_and_count(self.containers[key], other.containers[key])
+                   for key in self.containers.keys() & other.containers.keys())
+
+    @staticmethod
+    def intersection(bitmaps):
+        """The rows in every one of ``bitmaps``, intersected smallest first."""
+        bitmaps = sorted(bitmaps, key=len)
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            if not result.containers:
+                break
+            result = result & bitmap
+        return result
+
+    def __contains__(self, row):
+        container = self.containers.get(row >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = row & LOW
+        if _is_bits(container):
+            return bool(_test(container, np.array([low]))[0])
+        index = np.searchsorted(container, low)
+        return index < len(container) and container[index] == low
+
+    def contains(self, rows):
+        """Which of the row numbers in the int array ``rows`` are in the bitmap."""
+        found = np.zeros(len(rows), dtype=bool)
+        keys = rows >> CHUNK_BITS
+        for key in np.unique(keys):
+            container = self.containers.get(int(key))
+            if container is None:
+                continue
+            at = keys == key
+            low = (rows[at] & LOW).astype(np.uint16)
+            if _is_bits(container):
+                found[at] = _test(container, low)
+            else:
+                index = np.minimum(np.searchsorted(container, low), len(container) - 1)
+                found[at] = container[index] == low
+        return found
+
+    def add(self, row):
+        key, low = row >> CHUNK_BITS, row & LOW
+        container = self.containers.get(key)
+        if container is None:
+            self.containers[key] = np.array([low], dtype=np.uint16)
+        elif _is_bits(container):
+            container[low >> 6] |= np.uint64(1) << np.uint64(low & 63)
+        else:
+            index = np.searchsorted(container, low)
+            if index == len(container) or container[index] != low:
+                self.containers[key] = _compact(np.insert(container, index, np.uint16(low)))
+
+    def remove(self, row):
+        key, low = row >> CHUNK_BITS, row & LOW
+        container = self.containers.get(key)
+        if container is None:
+            return
+        if _is_bits(container):
+            container[low >> 6] &= ~(np.uint64(1) << np.uint64(low & 63))
+            container = _compact(container)
+        else:
+            index = np.searchsorted(container, low)
+            if index < len(container) and container[index] == low:
+                container = _compact(np.delete(container, index))
+        if container is None:
+            del self.containers[key]
+        else:
+            self.containers[key] = container
+
+    def to_mask(self, size):
+        """A boolean array of ``size`` rows with the bitmap's rows set."""
+        mask = np.zeros(size, dtype=bool)
+        for key, container in self.containers.items():
+            start = key << CHUNK_BITS
+            if _is_bits(container):
+                bits = np.unpackbits(container.view(np.uint8), bitorder="little").view(bool)
+                mask[start:start + CHUNK] = bits[:max(0, min(CHUNK, size - start))]
+            else:
+                mask[start + container.astype(np.int64)] = True
+        return mask
+
+    def nbytes(self):
+        return sum(container.nbytes for container in self.containers.values())
@@ -0,0 +1,341 @@
+import re
+from types import SimpleNamespace
+
+import pandas as pd
+
+import lookups
+
+APP_COLUMNS = [
+    ('AppID', 'App Id', 'NVARCHAR(255)'),
+    ('AppName', 'App Name', 'NVARCHAR(255)'),
+    ('Rating', 'Rating', 'FLOAT'),
+    ('RatingCount', 'Rating Count', 'BIGINT'),
+    ('Installs', 'Installs', 'BIGINT'),
+    ('MinInstalls', 'Minimum Installs', 'BIGINT'),
+    ('MaxInstalls', 'Maximum Installs', 'BIGINT'),
+    ('Free', 'Free', 'BIT'),
+    ('Price', 'Price', 'DECIMAL(10,2)'),
+    ('CurrencyID', 'CurrencyID', 'SMALLINT'),
+    ('SizeID', 'SizeID', 'INT'),
+    ('SizeBytes', 'SizeBytes', 'BIGINT'),
+    ('MinAndroidID', 'MinAndroidID', 'SMALLINT'),
+    ('MinApiLevel', 'MinApiLevel', 'SMALLINT'),
+    ('DeveloperID', 'DeveloperID', 'INT'),
+    ('Released', 'Released', 'DATE'),
+    ('LastUpdated', 'Last Updated', 'DATE'),
+    ('ContentRatingID', 'ContentRatingID', 'SMALLINT'),
+    ('PrivacyPolicyID', 'PrivacyPolicyID', 'INT'),
+    ('AdSupported', 'Ad Supported', 'BIT'),
+    ('InAppPurchases', 'In App Purchases', 'BIT'),
+    ('EditorsChoice', 'Editors Choice', 'BIT'),
+    ('ScrapedTime', 'Scraped Time', 'DATETIME'),
+]
+
+# text columns stored as keys into the lookup tables of lookups.py
+LOOKUP_COLUMNS = [
+    (column, source, f"NVARCHAR({lookups.LOOKUPS[column][3]})")
+    for column, source in [('Currency', 'Currency'), ('Size', 'Size'), ('MinAndroid', 'Minimum Android'),
+                           ('ContentRating', 'Content Rating'), ('PrivacyPolicy', 'Privacy Policy')]
+]
+
+DEVELOPER_COLUMNS = [
+    ('DeveloperName', 'Developer Id', 'NVARCHAR(255)'),
+    ('DeveloperWebsite', 'Developer Website', 'NVARCHAR(500)'),
+    ('DeveloperEmail', 'Developer Email', 'NVARCHAR(255)'),
+]
+
+
+def declared_width(sql_type):
+    match = re.fullmatch(r'NVARCHAR\((\d+)\)', sql_type)
+    return int(match.group(1)) if match else None
+
+
+def oversized_columns(widths):
+    """(column, longest value, declared width) for every text column a details.py profile says will not fit."""
+    return [(source, widths[source], declared_width(sql_type))
+            for _, source, sql_type in APP_COLUMNS + DEVELOPER_COLUMNS + LOOKUP_COLUMNS
+            if declared_width(sql_type) and widths.get(source, 0) > declared_width(sql_type)]
+
+
+def records(df, columns):
+    """Plain Python rows for ``executemany``: numpy scalars become Python objects and NaN/NaT become None."""
+    frame = df[columns].astype(object)
+    return frame.where(frame.notna(), None).values.tolist()
+
+
+class BulkLoader:
+    """Set-based loader: rows are sent to a staging table in large ``executemany`` batches,
+    then moved into the real tables with one ``INSERT ... SELECT`` per table.
+
+    Developer, category and lookup surrogate keys are kept in in-process name -> ID maps, so
+    fact and link rows are staged with resolved integer keys instead of joining on names per row."""
+
+    def __init__(self, conn, dialect, batch_size=10_000, widths=None):
+        self.conn = conn
+        self.dialect = dialect
+        self.batch_size = batch_size
+        # longest value per source column, from a details.py profile of the file being loaded
+        self.widths = widths or {}
+        self.cursor = conn.cursor()
+        self.developer_ids = {}
+        self.category_ids = {}
+        # Apps text column -> {value: lookup key}
+        self.lookup_ids = {}
+        # developer name -> apps loaded with a NULL DeveloperID because the developer was not stored yet
+        self.unkeyed = {}
+        # AppID -> (DeveloperID, DeveloperName) keyed by the current chunk's back-fill
+        self.backfilled = {}
+        if dialect == 'mssql':
+            # pyodbc binds the whole parameter array in one round trip instead of one per row
+            self.cursor.fast_executemany = True
+        self._create_staging()
+
+    def begin(self):
+        """Start the transaction of a chunk. SQLite takes its write lock up front: a loader that only
+        asks for it mid-transaction gets "database is locked" at once instead of waiting its turn."""
+        self.backfilled = {}
+        if self.dialect == 'sqlite' and not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+
+    def forget(self):
+        """Drop the state of a rolled-back chunk: keys resolved inside it may no longer exist."""
+        self.developer_ids.clear()
+        self.category_ids.clear()
+        self.lookup_ids.clear()
+        for app_id, (_, name) in self.backfilled.items():
+            self.unkeyed.setdefault(name, set()).add(app_id)
+        self.backfilled = {}
+
+    def _table(self, name):
+        return f"#{name}" if self.dialect == 'mssql' else f"temp.{name}"
+
+    def _staging_type(self, source, sql_type):
+        # fast_executemany allocates every parameter buffer at the declared column width, so
+        # staging text columns are only as wide as the longest profiled value
+        declared, width = declared_width(sql_type), self.widths.get(source)
+        return f"NVARCHAR({min(declared, max(width, 1))})" if declared and width is not None else sql_type
+
+    def _create_staging(self):
+        tables = {
+            'DevelopersStaging': DEVELOPER_COLUMNS,
+            'AppsStaging': APP_COLUMNS,
+        }
+        for name, columns in tables.items():
+            ddl = ", ".join(f"{column} {self._staging_type(source, sql_type)}" for column, source, sql_type in columns)
+            self.cursor.execute(f"CREATE TABLE {self._table(name)} ({ddl})")
+        # every developer name of a chunk, including the ones without an email that are never inserted
+        self.cursor.execute(f"CREATE TABLE {self._table('DeveloperNamesStaging')} (DeveloperName {self._staging_type('Developer Id', 'NVARCHAR(255)')})")
+        self.cursor.execute(f"CREATE TABLE {self._table('CategoriesStaging')} (CategoryName NVARCHAR(100))")
+        for column, source, sql_type in LOOKUP_COLUMNS:
+            table, _, _, _, number = lookups.LOOKUPS[column]
+            extra = f", {number} {lookups.NUMBER_TYPES[number]}" if number else ""
+            self.cursor.execute(f"CREATE TABLE {self._table(table + 'Staging')} ({column} {self._staging_type(source, sql_type)}{extra})")
+        self.cursor.execute(f"CREATE TABLE {self._table('AppCategoriesStaging')} (AppID NVARCHAR(255), CategoryID INT)")
+        self.cursor.execute(f"CREATE TABLE {self._table('AppKeysStaging')} (AppID NVARCHAR(255))")
+
+    def _stage(self, name, columns, rows):
+        table = self._table(name)
+        self.cursor.execute(f"DELETE FROM {table}")
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        for start in range(0, len(rows), self.batch_size):
+            self.cursor.executemany(sql, rows[start:start + self.batch_size])
+
+    def _resolve(self, ids, table, key, name, staging):
+        self.cursor.execute(f"""
+            SELECT t.{name}, t.{key}
+            FROM {table} t
+            JOIN {self._table(staging)} s ON s.{name} = t.{name}""")
+        ids.update(self.cursor.fetchall())
+
+    def _missing(self, table, name, staging):
+        # staged names the INSERT ... SELECT that follows is about to add
+        self.cursor.execute(f"""
+            SELECT s.{name}
+            FROM {self._table(staging)} s
+            WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{name} = s.{name})""")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def load_developers(self, df):
+        """Insert the chunk's developers that are not stored yet; returns them as {DeveloperID: DeveloperName}."""
+        developers = df[['Developer Id', 'Developer Website', 'Developer Email']].dropna(subset=['Developer Id'])
+        developers = developers[~developers['Developer Id'].isin(self.developer_ids.keys())]
+        # only developers with an email are inserted, but apps are keyed to any stored developer of that name
+        names = developers['Developer Id'].drop_duplicates()
+        self._stage('DeveloperNamesStaging', ['DeveloperName'], [[name] for name in names])
+        developers = developers.dropna(subset=['Developer Email']).drop_duplicates(subset=['Developer Id'])
+        self._stage('DevelopersStaging', [c for c, _, _ in DEVELOPER_COLUMNS], records(developers, [s for _, s, _ in DEVELOPER_COLUMNS]))
+        added = self._missing('Developers', 'DeveloperName', 'DevelopersStaging')
+        self.cursor.execute(f"""
+            INSERT INTO Developers (DeveloperName, DeveloperWebsite, DeveloperEmail)
+            SELECT s.DeveloperName, s.DeveloperWebsite, s.DeveloperEmail
+            FROM {self._table('DevelopersStaging')} s
+            WHERE NOT EXISTS (SELECT 1 FROM Developers d WHERE d.DeveloperName = s.DeveloperName)""")
+        self._resolve(self.developer_ids, 'Developers', 'DeveloperID', 'DeveloperName', 'DeveloperNamesStaging')
+        self._backfill()
+        return {self.developer_ids[name]: name for name in added}
+
+    def _backfill(self):
+        # a developer first stored with a later chunk also keys the apps loaded before it
+        ready = [name for name in self.unkeyed if name in self.developer_ids]
+        apps = {app_id: (self.developer_ids[name], name) for name in ready for app_id in self.unkeyed.pop(name)}
+        rows = [(developer_id, app_id) for app_id, (developer_id, _) in apps.items()]
+        for start in range(0, len(rows), self.batch_size):
+            self.cursor.executemany("UPDATE Apps SET DeveloperID = ? WHERE AppID = ? AND DeveloperID IS NULL",
+                                    rows[start:start + self.batch_size])
+        self.backfilled.update(apps)
+
+    def backfill_stored(self):
+        """Key the apps still waiting for their developer to the ones stored by now, e.g. by other loaders."""
+        self._stage('DeveloperNamesStaging', ['DeveloperName'], [[name] for name in self.unkeyed])
+        self._resolve(self.developer_ids, 'Developers', 'DeveloperID', 'DeveloperName', 'DeveloperNamesStaging')
+        self._backfill()
+        return len(self.backfilled)
+
+    def load_categories(self, df):
+        """Insert the chunk's categories that are not stored yet; returns them as {CategoryID: CategoryName}."""
+        categories = set(cat for sublist in df["Category"].dropna() for cat in sublist)
+        categories = sorted(categories - self.category_ids.keys())
+        self._stage('CategoriesStaging', ['CategoryName'], [[category] for category in categories])
+        added = self._missing('Categories', 'CategoryName', 'CategoriesStaging')
+        self.cursor.execute(f"""
+            INSERT INTO Categories (CategoryName)
+            SELECT s.CategoryName
+            FROM {self._table('CategoriesStaging')} s
+            WHERE NOT EXISTS (SELECT 1 FROM Categories c WHERE c.CategoryName = s.CategoryName)""")
+        self._resolve(self.category_ids, 'Categories', 'CategoryID', 'CategoryName', 'CategoriesStaging')
+        return {self.category_ids[name]: name for name in added}
+
+    def load_lookups(self, df):
+        added = 0
+        for column, source, _ in LOOKUP_COLUMNS:
+            table, key, _, _, number = lookups.LOOKUPS[column]
+            ids = self.lookup_ids.setdefault(column, {})
+            # blanks are stored as NULL keys, not as a lookup entry
+            values = sorted(value for value in df[source].dropna().unique() if value != '' and value not in ids)
+            columns = [column] + ([number] if number else [])
+            rows = [[value, lookups.parse(column, value)] if number else [value] for value in values]
+            self._stage(table + 'Staging', columns, rows)
+            self.cursor.execute(f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                SELECT {', '.join('s.' + c for c in columns)}
+                FROM {self._table(table + 'Staging')} s
+                WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{column} = s.{column})""")
+            self._resolve(ids, table, key, column, table + 'Staging')
+            added += len(rows)
+        return added
+
+    def _lookup_columns(self, df):
+        encoded = {}
+        for column, source, _ in LOOKUP_COLUMNS:
+            _, key, _, _, number = lookups.LOOKUPS[column]
+            # categorical columns are mapped once per category, not once per row
+            encoded[key] = df[source].map(self.lookup_ids.get(column, {})).astype('Int64')
+            if number:
+                encoded[number] = df[source].map(lambda value, column=column: lookups.parse(column, value)).astype('Int64')
+        return encoded
+
+    def delta(self, df):
+        """Split a cleaned chunk into apps that are not stored yet and apps whose stored copy is stale.
+
+        A stored app is stale when this scrape is more recent than the stored one, or as recent and
+        reporting a different ``LastUpdated``; repeated loads of the same scrape are skipped."""
+        self._stage('AppKeysStaging', ['AppID'], records(df, ['App Id']))
+        self.cursor.execute(f"""
+            SELECT a.AppID, a.ScrapedTime, a.LastUpdated
+            FROM Apps a
+            JOIN {self._table('AppKeysStaging')} s ON s.AppID = a.AppID""")
+        stored = pd.DataFrame.from_records(self.cursor.fetchall(), columns=['AppID', 'ScrapedTime', 'LastUpdated'], index='AppID')
+
+        known = df['App Id'].isin(stored.index)
+        stored_scraped = pd.to_datetime(df['App Id'].map(stored['ScrapedTime']), errors='coerce')
+        stored_updated = pd.to_datetime(df['App Id'].map(stored['LastUpdated']), errors='coerce')
+        scraped = pd.to_datetime(df['Scraped Time'], errors='coerce')
+        updated = pd.to_datetime(df['Last Updated'], errors='coerce')
+
+        # a later scrape can change ratings and installs without a new LastUpdated
+        later = scraped > stored_scraped
+        newer = stored_scraped.isna() | (scraped >= stored_scraped)
+        different = (updated != stored_updated) & ~(updated.isna() & stored_updated.isna())
+        return df[~known], df[known & (later | (newer & different))]
+
+    def stored(self, app_ids):
+        """The stored copy of ``app_ids`` as {AppID: (app, {CategoryID: CategoryName})}, with the
+        fields the rollups and the search index are derived from; read before load_apps overwrites it."""
+        self._stage('AppKeysStaging', ['AppID'], [[app_id] for app_id in app_ids])
+        self.cursor.execute(f"""
+            SELECT a.AppID, {', '.join(f'a.{field}' for field in ('AppName', 'DeveloperID', 'Released', 'Rating', 'Installs', 'Free', 'AdSupported', 'Price'))},
+                d.DeveloperName, r.ContentRating
+            FROM Apps a
+            JOIN {self._table('AppKeysStaging')} s ON s.AppID = a.AppID
+            LEFT JOIN Developers d ON d.DeveloperID = a.DeveloperID
+            LEFT JOIN ContentRatings r ON r.ContentRatingID = a.ContentRatingID""")
+        apps = {}
+        for app_id, name, developer_id, released, rating, installs, free, ad_supported, price, developer, content_rating in self.cursor.fetchall():
+            # SQLite hands DATE columns back as text
+            released = pd.Timestamp(released) if released is not None else None
+            apps[app_id] = (SimpleNamespace(AppName=name, DeveloperID=developer_id, DeveloperName=developer, ContentRating=content_rating,
+                                            Released=released, Rating=rating, Installs=installs, Free=free, AdSupported=ad_supported, Price=price), {})
+        self.cursor.execute(f"""
+            SELECT ac.AppID, c.CategoryID, c.CategoryName
+            FROM AppCategories ac
+            JOIN {self._table('AppKeysStaging')} s ON s.AppID = ac.AppID
+            JOIN Categories c ON c.CategoryID = ac.CategoryID""")
+        for app_id, category_id, category in self.cursor.fetchall():
+            apps[app_id][1][category_id] = category
+        return apps
+
+    def loaded(self, df):
+        """The apps of a chunk as load_apps and load_app_categories store them, in the shape of ``stored``."""
+        apps = {}
+        columns = ['App Id', 'App Name', 'Developer Id', 'Content Rating', 'Released', 'Rating', 'Installs', 'Free', 'Ad Supported', 'Price', 'Category']
+        for app_id, name, developer, content_rating, released, rating, installs, free, ad_supported, price, categories in records(df, columns):
+            developer_id = self.developer_ids.get(developer)
+            app = SimpleNamespace(AppName=name, DeveloperID=developer_id, DeveloperName=developer if developer_id is not None else None,
+                                  ContentRating=content_rating, Released=released, Rating=rating, Installs=installs,
+                                  Free=free, AdSupported=ad_supported, Price=price)
+            apps[app_id] = (app, {self.category_ids[category]: category for category in categories or [] if category in self.category_ids})
+        return apps
+
+    def load_apps(self, df, update=False):
+        developer_ids = df['Developer Id'].map(self.developer_ids).astype('Int64')
+        unkeyed = df.loc[developer_ids.isna() & df['Developer Id'].notna(), ['Developer Id', 'App Id']]
+        for name, app_id in unkeyed.itertuples(index=False):
+            self.unkeyed.setdefault(name, set()).add(app_id)
+        df = df.assign(
+            DeveloperID=developer_ids,
+            **self._lookup_columns(df),
+            # DATE columns are bound as dates, not midnight timestamps
+            Released=df['Released'].dt.date,
+            **{'Last Updated': df['Last Updated'].dt.date},
+        )
+        self._stage('AppsStaging', [c for c, _, _ in APP_COLUMNS], records(df, [s for _, s, _ in APP_COLUMNS]))
+        columns = [c for c, _, _ in APP_COLUMNS]
+        if update:
+            self.cursor.execute(f"""
+                UPDATE Apps
+                SET {', '.join(f'{c} = s.{c}' for c in columns if c != 'AppID')}
+                FROM {self._table('AppsStaging')} s
+                WHERE Apps.AppID = s.AppID""")
+        self.cursor.execute(f"""
+            INSERT INTO Apps ({', '.join(columns)})
+            SELECT {', '.join('s.' + c for c in columns)}
+            FROM {self._table('AppsStaging')} s
+            WHERE NOT EXISTS (SELECT 1 FROM Apps a WHERE a.AppID = s.AppID)""")
+        return len(df)
+
+    def load_app_categories(self, df, replace=False):
+        links = df[['App Id', 'Category']].explode('Category').dropna()
+        links = links.assign(CategoryID=links['Category'].map(self.category_ids)).dropna(subset=['CategoryID'])
+        links = links[['App Id', 'CategoryID']].astype({'CategoryID': 'int64'}).drop_duplicates()
+        self._stage('AppCategoriesStaging', ['AppID', 'CategoryID'], records(links, ['App Id', 'CategoryID']))
+        if replace:
+            self.cursor.execute(f"""
+                DELETE FROM AppCategories
+                WHERE AppID IN (SELECT AppID FROM {self._table('AppCategoriesStaging')})""")
+        self.cursor.execute(f"""
+            INSERT INTO AppCategories (AppID, CategoryID)
+            SELECT s.AppID, s.CategoryID
+            FROM {self._table('AppCategoriesStaging')} s
+            WHERE NOT EXISTS (SELECT 1 FROM AppCategories ac WHERE ac.AppID = s.AppID AND ac.CategoryID = s.CategoryID)""")
+        return len(links)
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after they were written."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend:
+    """In-process LRU/TTL store; each API worker process keeps its own copy."""
+
+    def __init__(self, maxsize=2048, ttl=30):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries.set(key, value)
+
+    def versions(self, tags):
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Store shared by every API worker and host; needs the optional ``redis`` package."""
+
+    def __init__(self, url, ttl=30, namespace="playstore:"):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, key):
+        return self._redis.get(self.namespace + key)
+
+    def set(self, key, value):
+        self._redis.set(self.namespace + key, value, ex=self.ttl)
+
+    def versions(self, tags):
+        values = self._redis.mget([self.namespace + "tag:" + tag for tag in tags]) if tags else []
+        return [int(value or 0) for value in values]
+
+    def bump(self, tag):
+        self._redis.incr(self.namespace + "tag:" + tag)
+
+    def __len__(self):
+        return self._redis.dbsize()
+
+
+class SQLiteBackend:
+    """Local stand-in for the shared backend: a SQLite file that all worker processes on one host share."""
+
+    def __init__(self, path, maxsize=2048, ttl=30):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value FROM entries WHERE key = ? AND expires >= ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + self.ttl))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            # size bound: drop expired entries, then the ones closest to expiry
+            conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+            conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        rows = dict(self._conn().execute(
+            f"SELECT tag, version FROM tags WHERE tag IN ({', '.join('?' for _ in tags)})", list(tags)).fetchall())
+        return [rows.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        self._conn().execute("INSERT INTO tags (tag, version) VALUES (?, 1) ON CONFLICT(tag) DO UPDATE SET version = version + 1", (tag,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class ResponseCache:
+    """Serialized responses with their ETags, invalidated by tag.
+
+    Keys embed the current version of every tag the response depends on; invalidating a tag
+    bumps its version, so older entries can no longer be reached and age out of the backend.
+    Versions are read before the response is computed, so a write racing with a read can
+    never leave a stale entry behind under the new version."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, name, tags):
+        return name + "|" + ".".join(str(version) for version in self.backend.versions(tags))
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        etag, body = value.split(b"\n", 1)
+        return etag.decode(), body
+
+    def set(self, key, etag, body):
+        self.backend.set(key, etag.encode() + b"\n" + body)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+def make_response_cache(spec, maxsize=2048, ttl=30):
+    """Build a ResponseCache from ``memory``, ``redis://...`` or ``sqlite:///path``; ``off`` disables it."""
+    if not spec or spec == "off":
+        return None
+    if spec == "memory":
+        return ResponseCache(MemoryBackend(maxsize=maxsize, ttl=ttl))
+    if spec.startswith(("redis://", "rediss://")):
+        return ResponseCache(RedisBackend(spec, ttl=ttl))
+    if spec.startswith("sqlite:///"):
+        return ResponseCache(SQLiteBackend(spec[len("sqlite:///"):], maxsize=maxsize, ttl=ttl))
+    raise ValueError(f"Unknown response cache backend: {spec}")
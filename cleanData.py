@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Only the columns we load, with explicit types so pandas never has to infer them per chunk.
+USECOLS = [
+    'App Name', 'App Id', 'Category', 'Rating', 'Rating Count', 'Installs', 'Minimum Installs',
+    'Maximum Installs', 'Free', 'Price', 'Currency', 'Size', 'Minimum Android', 'Developer Id',
+    'Developer Website', 'Developer Email', 'Released', 'Last Updated', 'Content Rating',
+    'Privacy Policy', 'Ad Supported', 'In App Purchases', 'Editors Choice', 'Scraped Time',
+]
+DTYPES = {
+    'App Name': 'str', 'App Id': 'str', 'Category': 'str', 'Rating': 'float64', 'Rating Count': 'float64',
+    'Installs': 'str', 'Minimum Installs': 'float64', 'Maximum Installs': 'float64', 'Free': 'boolean',
+    'Price': 'float64', 'Currency': 'str', 'Size': 'str', 'Minimum Android': 'str', 'Developer Id': 'str',
+    'Developer Website': 'str', 'Developer Email': 'str', 'Released': 'str', 'Last Updated': 'str',
+    'Content Rating': 'str', 'Privacy Policy': 'str', 'Ad Supported': 'boolean', 'In App Purchases': 'boolean',
+    'Editors Choice': 'boolean', 'Scraped Time': 'str',
+}
+
+COUNT_COLUMNS = ['Rating Count', 'Minimum Installs', 'Maximum Installs']
+FLAG_COLUMNS = ['Free', 'Ad Supported', 'In App Purchases', 'Editors Choice']
+DATE_COLUMNS = ['Released', 'Last Updated']
+# a handful of distinct values over 2M rows, so they are held as pandas categoricals
+CATEGORICAL_COLUMNS = ['Currency', 'Content Rating', 'Minimum Android', 'Size']
+TEXT_COLUMNS = ['Privacy Policy', 'Developer Website']
+# rows missing any of these are dropped
+REQUIRED_COLUMNS = ['App Name', 'App Id', 'Category', 'Developer Id']
+
+
+def profile_dtypes(report):
+    """DTYPES refined by a details.py report: low-cardinality text is parsed straight into
+    categoricals, and count columns without gaps straight into integers."""
+    dtypes = dict(DTYPES)
+    for column, stats in report['columns'].items():
+        if dtypes.get(column) == 'str' and stats['dtype'] == 'category':
+            dtypes[column] = 'category'
+        elif dtypes.get(column) == 'float64' and stats['dtype'] == 'int64':
+            dtypes[column] = 'int64'
+    return dtypes
+
+
+def read_chunks(path, size, skip_chunks=0, dtypes=None):
+    # skipped rows are only tokenised, never parsed into frames
+    skiprows = range(1, skip_chunks * size + 1) if skip_chunks else None
+    return pd.read_csv(path, usecols=USECOLS, dtype=dtypes or DTYPES, chunksize=size, skiprows=skiprows)
+
+
+def drop_invalid(df):
+    # duplicate scrapes of an app are dropped before cleaning, across the whole file (dedup.py)
+    return df.dropna(subset=REQUIRED_COLUMNS)
+
+
+def strip_names(df):
+    for column in ['App Name', 'App Id', 'Developer Id']:
+        df[column] = df[column].str.strip()
+    return df
+
+
+def split_categories(df):
+    df['Category'] = df['Category'].str.strip().str.split(" & ")
+    return df
+
+
+def parse_numbers(df):
+    df['Price'] = df['Price'].fillna(0).round(2)
+    df['Rating'] = df['Rating'].fillna(0).round(2)
+    for column in COUNT_COLUMNS:
+        df[column] = df[column].fillna(0).astype('int64')
+    return df
+
+
+def parse_installs(df):
+    # "1,000,000+" -> 1000000; plain literal replaces are much cheaper than a regex
+    installs = df['Installs'].str.replace(',', '', regex=False).str.rstrip('+')
+    df['Installs'] = pd.to_numeric(installs, errors='coerce').fillna(0).astype('int64')
+    return df
+
+
+def parse_flags(df):
+    for column in FLAG_COLUMNS:
+        df[column] = df[column].fillna(False).astype(bool)
+    return df
+
+
+def to_datetime_unique(values, format):
+    # a few thousand distinct dates repeat across 2M rows, so each one is parsed only once
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(uniques, format=format, errors='coerce').to_numpy()
+    # factorize codes missing values as -1, which picks the trailing NaT
+    lookup = np.append(parsed, np.datetime64('NaT', 'ns').astype(parsed.dtype))
+    return pd.Series(lookup[codes], index=values.index)
+
+
+def parse_dates(df):
+    for column in DATE_COLUMNS:
+        df[column] = to_datetime_unique(df[column], '%b %d, %Y')
+    df['Scraped Time'] = pd.to_datetime(df['Scraped Time'], format='ISO8601', errors='coerce')
+    return df
+
+
+def fill_blank(values):
+    # columns read as categoricals only accept "" once it is one of their categories
+    if isinstance(values.dtype, pd.CategoricalDtype) and "" not in values.cat.categories:
+        values = values.cat.add_categories("")
+    return values.fillna("")
+
+
+def encode_text(df):
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = fill_blank(df[column]).astype('category')
+    for column in TEXT_COLUMNS:
+        df[column] = fill_blank(df[column])
+    return df
+
+
+# Applied in order by clean_frame; benchCleaning.py times each one separately.
+TRANSFORMS = [
+    drop_invalid,
+    strip_names,
+    split_categories,
+    parse_numbers,
+    parse_installs,
+    parse_flags,
+    parse_dates,
+    encode_text,
+]
+
+
+def clean_frame(df):
+    for transform in TRANSFORMS:
+        df = transform(df)
+    return df
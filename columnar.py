@@ -0,0 +1,343 @@
+import datetime
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from bitmaps import Bitmap
+
+# In-memory column store behind /apps/ (COLUMNAR_ENGINE=on in api.py). The filterable columns
+# of Apps live in NumPy arrays indexed by row number, so a filter is a few vectorized compares
+# and an exact count is one popcount. Rows are kept in a presorted LastUpdated DESC, AppID DESC
+# permutation, and a page is read off that permutation without sorting anything. Categories,
+# content ratings and the boolean flags are bitmap indexes (bitmaps.py), which also give the
+# facet counts of /apps/facets by intersection.
+
+# LastUpdated as a proleptic ordinal; NULL dates sort below every real one, as in ORDER BY ... DESC
+NO_DATE = np.iinfo(np.int32).min
+NO_KEY = -1
+# rows of the sort order scanned per step while collecting a page, growing while matches are sparse
+SCAN_BLOCK = 4096
+
+# one page entry; has the attributes api.encode_cursor reads
+Row = namedtuple("Row", "AppID AppName LastUpdated CategoryIDs")
+# boolean App columns with a bitmap per value
+FLAGS = ("Free", "AdSupported", "InAppPurchases", "EditorsChoice")
+# one app as loaded from the database
+App = namedtuple("App", ("AppID", "AppName", "LastUpdated", "Rating", "Price", "ContentRatingID") + FLAGS)
+
+
+def day(value):
+    return value.toordinal() if value is not None else NO_DATE
+
+
+class StringColumn:
+    """UTF-8 strings in one growing buffer, addressed by row through (start, length) pairs.
+
+    A replaced value is appended and the row repointed; its old bytes stay in the buffer
+    until the store is reloaded."""
+
+    def __init__(self, values=()):
+        encoded = [value.encode() for value in values]
+        self.data = bytearray(b"".join(encoded))
+        self.length = np.fromiter(map(len, encoded), dtype=np.int32, count=len(encoded))
+        self.start = np.zeros(len(encoded), dtype=np.int64)
+        np.cumsum(self.length[:-1], out=self.start[1:])
+
+    def __getitem__(self, row):
+        start = int(self.start[row])
+        return self.data[start:start + int(self.length[row])].decode()
+
+    def set(self, row, value):
+        encoded = value.encode()
+        self.start[row], self.length[row] = len(self.data), len(encoded)
+        self.data += encoded
+
+    def append(self, values):
+        encoded = [value.encode() for value in values]
+        start = len(self.data) + np.concatenate(([0], np.cumsum([len(value) for value in encoded])[:-1])).astype(np.int64)
+        self.data += b"".join(encoded)
+        self.start = np.concatenate((self.start, start))
+        self.length = np.concatenate((self.length, [len(value) for value in encoded])).astype(np.int32)
+
+    def nbytes(self):
+        return len(self.data) + self.start.nbytes + self.length.nbytes
+
+
+class ColumnarApps:
+    """The listing columns of every app, with filters evaluated as boolean masks over rows.
+
+    Row numbers are assigned in load and insert order and never reused; deleted apps are marked
+    dead and dropped from the bitmaps. ``order`` lists rows by LastUpdated DESC, AppID DESC and
+    ``by_id`` by AppID, both searched with a binary search on the row's own values."""
+
+    def __init__(self, apps, memberships, category_names):
+        apps = list(apps)
+        self.lock = threading.Lock()
+        self.app_ids = StringColumn([app.AppID for app in apps])
+        self.names = StringColumn([app.AppName for app in apps])
+        self.last_updated = np.fromiter((day(app.LastUpdated) for app in apps), dtype=np.int32, count=len(apps))
+        self.rating = np.fromiter((np.nan if app.Rating is None else app.Rating for app in apps), dtype=np.float64, count=len(apps))
+        self.price = np.fromiter((np.nan if app.Price is None else app.Price for app in apps), dtype=np.float64, count=len(apps))
+        self.alive = np.ones(len(apps), dtype=bool)
+        self.category_names = dict(category_names)
+
+        # AppIDs are ranked by Python's own string order, the one the binary searches compare with
+        self.by_id = np.argsort(np.array([app.AppID for app in apps], dtype=object), kind="stable").astype(np.int32)
+        rank = np.empty(len(apps), dtype=np.int64)
+        rank[self.by_id] = np.arange(len(apps))
+        self.order = np.lexsort((-rank, -self.last_updated.astype(np.int64))).astype(np.int32)
+
+        # the rows of every category, content rating and flag value
+        row_of = {app.AppID: row for row, app in enumerate(apps)}
+        members = {}
+        for app_id, category_id in memberships:
+            row = row_of.get(app_id)
+            if row is not None:
+                members.setdefault(category_id, []).append(row)
+        self.categories = {category_id: Bitmap.from_rows(rows) for category_id, rows in members.items()}
+        self.content_ratings = self._index(app.ContentRatingID for app in apps)
+        self.flags = {flag: self._index(getattr(app, flag) for app in apps) for flag in FLAGS}
+
+    @staticmethod
+    def _index(values):
+        rows = {}
+        for row, value in enumerate(values):
+            if value is not None:
+                rows.setdefault(value, []).append(row)
+        return {value: Bitmap.from_rows(rows) for value, rows in rows.items()}
+
+    def _indexes(self):
+        return [self.categories, self.content_ratings, *self.flags.values()]
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def nbytes(self):
+        arrays = [self.last_updated, self.rating, self.price, self.alive, self.by_id, self.order]
+        bitmaps = [bitmap for index in self._indexes() for bitmap in index.values()]
+        return (sum(array.nbytes for array in arrays) + sum(bitmap.nbytes() for bitmap in bitmaps)
+                + self.app_ids.nbytes() + self.names.nbytes())
+
+    # -- ordering
+
+    def _sort_key(self, row):
+        return int(self.last_updated[row]), self.app_ids[row]
+
+    def _position(self, key):
+        """First position in ``order`` whose row sorts after ``key`` in LastUpdated DESC, AppID DESC."""
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._sort_key(self.order[middle]) < key:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _find(self, app_id):
+        low, high = 0, len(self.by_id)
+        while low < high:
+            middle = (low + high) // 2
+            if self.app_ids[self.by_id[middle]] < app_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.by_id) and self.app_ids[self.by_id[low]] == app_id:
+            return low
+        return None
+
+    def row(self, app_id):
+        position = self._find(app_id)
+        return int(self.by_id[position]) if position is not None else None
+
+    # -- reads
+
+    def _filters(self, category_id, content_rating_id, flags):
+        """The bitmaps a filter combination selects, by facet; an unknown value selects an empty one."""
+        filters = {}
+        if category_id:
+            filters["categories"] = self.categories.get(category_id, Bitmap())
+        if content_rating_id is not None:
+            # NO_KEY is a value no app has; apps without a content rating are in no bitmap
+            filters["content_ratings"] = self.content_ratings.get(content_rating_id, Bitmap())
+        for flag, value in flags:
+            filters[flag] = self.flags[flag].get(value, Bitmap())
+        return filters
+
+    def _ranges(self, min_rating, max_price):
+        """The rows passing the range filters, or None when there are none."""
+        if not min_rating and not max_price:
+            return None
+        mask = self.alive.copy()
+        if min_rating:
+            mask &= self.rating >= min_rating
+        if max_price:
+            mask &= self.price <= max_price
+        return mask
+
+    def _mask(self, filters, ranges):
+        # deleted rows are in no bitmap, so only the unfiltered case needs the alive mask
+        mask = Bitmap.intersection(list(filters.values())).to_mask(len(self.alive)) if filters else self.alive.copy()
+        if ranges is not None:
+            mask &= ranges
+        return mask
+
+    def _scan(self, mask, start, skip, limit):
+        """Rows of ``order`` from position ``start`` on that pass ``mask``, after skipping ``skip`` of them."""
+        wanted, found, block = skip + limit, [], SCAN_BLOCK
+        position = start
+        while position < len(self.order) and wanted > 0:
+            rows = self.order[position:position + block]
+            hits = rows[mask[rows]]
+            found.append(hits)
+            wanted -= len(hits)
+            position += block
+            block = min(block * 4, 1 << 20)
+        hits = np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+        return hits[skip:skip + limit]
+
+    def _category_ids(self, rows):
+        ids = {row: [] for row in rows}
+        for category_id, members in sorted(self.categories.items()):
+            for row, member in zip(rows, members.contains(rows)):
+                if member:
+                    ids[row].append(category_id)
+        return ids
+
+    def query(self, category_id=None, min_rating=None, max_price=None, content_rating_id=None, flags=(),
+              after=None, offset=0, limit=10):
+        """``(exact total, page of Rows)`` for the filters, like ``/apps/`` on the database.
+
+        ``content_rating_id`` of NO_KEY matches nothing; ``flags`` are (flag, bool) pairs; ``after``
+        is the (LastUpdated, AppID) of a cursor, and the page starts right after it instead of at ``offset``."""
+        with self.lock:
+            mask = self._mask(self._filters(category_id, content_rating_id, flags), self._ranges(min_rating, max_price))
+            total = int(np.count_nonzero(mask))
+            start = self._position((day(after[0]), after[1])) if after else 0
+            rows = [int(row) for row in self._scan(mask, start, 0 if after else offset, limit)]
+            categories = self._category_ids(np.array(rows, dtype=np.int32)) if rows else {}
+            return total, [Row(self.app_ids[row], self.names[row], self._date(row), categories[row]) for row in rows]
+
+    def facets(self, category_id=None, min_rating=None, max_price=None, content_rating_id=None, flags=()):
+        """The total and the app count of every category, content rating and flag value for the filters.
+
+        Each facet is counted under every filter except its own, so picking a category still shows
+        the counts of the others. Counts are {value: count}, without the values no app matches."""
+        with self.lock:
+            filters = self._filters(category_id, content_rating_id, flags)
+            ranges = self._ranges(min_rating, max_price)
+            if ranges is not None:
+                filters["ranges"] = Bitmap.from_mask(ranges)
+            total = len(Bitmap.intersection(list(filters.values()))) if filters else len(self)
+
+            def counts(facet, index):
+                others = [bitmap for name, bitmap in filters.items() if name != facet]
+                base = Bitmap.intersection(others) if others else None
+                counted = {value: base.and_count(bitmap) if base is not None else len(bitmap) for value, bitmap in index.items()}
+                return {value: count for value, count in counted.items() if count}
+
+            return {
+                "total": total,
+                "categories": counts("categories", self.categories),
+                "content_ratings": counts("content_ratings", self.content_ratings),
+                "flags": {flag: counts(flag, self.flags[flag]) for flag in FLAGS},
+            }
+
+    def _date(self, row):
+        value = int(self.last_updated[row])
+        return datetime.date.fromordinal(value) if value != NO_DATE else None
+
+    # -- writes
+
+    def _unlink(self, row):
+        position = self._position(self._sort_key(row))
+        # rows with an equal key are adjacent; the row itself sits just before ``position``
+        while self.order[position - 1] != row:
+            position -= 1
+        self.order = np.delete(self.order, position - 1)
+
+    def _link(self, rows):
+        rows = sorted(rows, key=self._sort_key, reverse=True)
+        positions = [self._position(self._sort_key(row)) for row in rows]
+        self.order = np.insert(self.order, positions, rows).astype(np.int32)
+
+    @staticmethod
+    def _set_values(index, row, values):
+        """Put ``row`` in the bitmaps of ``values`` and take it out of all others in ``index``."""
+        for value, bitmap in list(index.items()):
+            if value in values:
+                bitmap.add(row)
+            else:
+                bitmap.remove(row)
+                if not bitmap.containers:
+                    del index[value]
+        for value in set(values) - index.keys():
+            index[value] = Bitmap.from_rows([row])
+
+    def _set_indexes(self, row, app, category_ids):
+        self._set_values(self.categories, row, category_ids)
+        self._set_values(self.content_ratings, row, {app.ContentRatingID} - {None})
+        for flag in FLAGS:
+            self._set_values(self.flags[flag], row, {getattr(app, flag)} - {None})
+
+    def upsert(self, apps, memberships):
+        """Apply apps as they are now in the database, with their ``(AppID, CategoryID)`` links."""
+        links = {}
+        for app_id, category_id in memberships:
+            links.setdefault(app_id, set()).add(category_id)
+        with self.lock:
+            added = []
+            for app in apps:
+                row = self.row(app.AppID)
+                if row is None:
+                    added.append(app)
+                    continue
+                if day(app.LastUpdated) != self.last_updated[row]:
+                    self._unlink(row)
+                    self.last_updated[row] = day(app.LastUpdated)
+                    self._link([row])
+                if self.names[row] != app.AppName:
+                    self.names.set(row, app.AppName)
+                self.rating[row] = np.nan if app.Rating is None else app.Rating
+                self.price[row] = np.nan if app.Price is None else app.Price
+                self.alive[row] = True
+                self._set_indexes(row, app, links.get(app.AppID, set()))
+            if added:
+                self._append(added, links)
+
+    def _append(self, apps, links):
+        first = len(self.alive)
+        rows = list(range(first, first + len(apps)))
+        self.app_ids.append([app.AppID for app in apps])
+        self.names.append([app.AppName for app in apps])
+        self.last_updated = np.append(self.last_updated, [day(app.LastUpdated) for app in apps]).astype(np.int32)
+        self.rating = np.append(self.rating, [np.nan if app.Rating is None else app.Rating for app in apps])
+        self.price = np.append(self.price, [np.nan if app.Price is None else app.Price for app in apps])
+        self.alive = np.append(self.alive, np.ones(len(apps), dtype=bool))
+        # every position is searched in the old order, so the whole batch is inserted with one copy
+        rows_by_id = sorted(rows, key=lambda row: self.app_ids[row])
+        positions = [self._find_insert(self.app_ids[row]) for row in rows_by_id]
+        self.by_id = np.insert(self.by_id, positions, rows_by_id).astype(np.int32)
+        self._link(rows)
+        for row, app in zip(rows, apps):
+            self._set_indexes(row, app, links.get(app.AppID, set()))
+
+    def _find_insert(self, app_id):
+        low, high = 0, len(self.by_id)
+        while low < high:
+            middle = (low + high) // 2
+            if self.app_ids[self.by_id[middle]] < app_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def remove(self, app_ids):
+        with self.lock:
+            for app_id in app_ids:
+                row = self.row(app_id)
+                if row is not None:
+                    self.alive[row] = False
+                    for index in self._indexes():
+                        self._set_values(index, row, ())
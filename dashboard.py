@@ -1,16 +1,64 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import streamlit as st
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
 
 BASE_URL = "http://127.0.0.1:8000"
+# seconds a fetched category list or page is reused across reruns
+CACHE_TTL = 60
+
+@st.cache_resource
+def client():
+    # kept across reruns and sessions: one keep-alive connection pool, the response cache and the prefetch thread
+    session = requests.Session()
+    session.trust_env = False  # same as the old proxies={"http": None, "https": None}
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session, TTLCache(maxsize=512, ttl=CACHE_TTL), ThreadPoolExecutor(max_workers=2)
+
+def fetch_json(path, params=None):
+    response = client()[0].get(f"{BASE_URL}{path}", params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+def cache_key(path, params):
+    return path, tuple(sorted((key, value) for key, value in (params or {}).items() if value is not None))
+
+def get_json(path, params=None):
+    """GET ``path``, reusing a response fetched (or being prefetched) with the same parameters in the last CACHE_TTL seconds."""
+    _, responses, _ = client()
+    key = cache_key(path, params)
+    entry = responses.get(key)
+    if isinstance(entry, Future):
+        try:
+            return entry.result()
+        except requests.exceptions.RequestException:
+            responses.pop(key)
+            entry = None
+    if entry is None:
+        entry = fetch_json(path, params)
+        responses.set(key, entry)
+    return entry
+
+def prefetch(path, params):
+    _, responses, prefetcher = client()
+    key = cache_key(path, params)
+    if responses.get(key) is None:
+        responses.set(key, prefetcher.submit(fetch_json, path, params))
+
+def clear_cache():
+    client()[1].clear()
 
 def get_categores(name):
     
     try:
-        response = requests.get(f"{BASE_URL}/categores/?name={name}", proxies= {"http": None,"https": None,})
-        response.raise_for_status() 
-        data = response.json() 
-        return data.get('categores', []) 
+        if name:
+            # served from the trigram search index instead of a LIKE '%name%' scan
+            return get_json("/apps/search", {"q": name, "kind": "categories", "limit": 50}).get('results', [])
+        return get_json("/categores/", {"name": name}).get('categores', [])
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching data: {e}")
         return []
@@ -40,9 +88,25 @@ def create_app():
             "Free": free,
             "DeveloperID": developer_id
         }
-        response = requests.post(f"{BASE_URL}/apps/", json=data, proxies= {"http": None,"https": None,})
+        response = client()[0].post(f"{BASE_URL}/apps/", json=data)
+        clear_cache()
         st.write(response.json())
 
+FLAG_FILTERS = {"free": "Free", "ad_supported": "Ad Supported", "in_app_purchases": "In-App Purchases", "editors_choice": "Editors' Choice"}
+FLAG_CHOICES = {"Any": None, "Yes": True, "No": False}
+
+def show_facets(filters):
+    # counts of every category, content rating and flag for the filters, from one call
+    try:
+        facets = get_json("/apps/facets", filters)
+    except requests.exceptions.RequestException:
+        return
+    with st.expander(f"{facets['total']:,} matching apps"):
+        left, right = st.columns(2)
+        left.dataframe(pd.DataFrame(facets["categories"], columns=["CategoryName", "count"]), hide_index=True)
+        right.dataframe(pd.DataFrame(facets["content_ratings"], columns=["ContentRating", "count"]), hide_index=True)
+        right.dataframe(pd.DataFrame.from_dict(facets["flags"], orient="index"))
+
 def list_apps():
     st.subheader("App List")
     category_query = st.text_input("Search for an category:")
@@ -54,43 +118,52 @@ def list_apps():
     rating = st.slider('Select Minimum Rating', 0, 5, 0)
     price = st.slider('Select Maximum Price', 0, 100, 0)
     content_rating = st.selectbox('Select Content Rating', options=['All', 'Everyone', 'Teen', 'Mature'])
+    flags = {}
+    for column, (param, label) in zip(st.columns(len(FLAG_FILTERS)), FLAG_FILTERS.items()):
+        flags[param] = FLAG_CHOICES[column.selectbox(label, options=list(FLAG_CHOICES))]
     items_per_page = 10
     list_page_number = st.session_state.page_number  if 'page_number' in st.session_state else 1
     
-    params = {
+    filters = {
         "category_id": category,
         "rating": rating if rating else None,
         "price": price if price else None,
         "content_rating": content_rating if content_rating != 'All' else None,
-        "page": list_page_number,
-        "limit": items_per_page
+        **flags,
     }
-    response = requests.get(f"{BASE_URL}/apps/",params=params, proxies= {"http": None,"https": None,})
-    if response.status_code == 200:
-        response_json = response.json()
-        apps = response_json.get("apps", [])
-        if apps:
-            df = pd.DataFrame(apps)
-            st.dataframe(df)
-
-            total_apps = response_json.get("total", 10)
-            total_pages = (total_apps // items_per_page) + (1 if total_apps % items_per_page > 0 else 0)
-            
-            pagination = [1] if list_page_number > 3 else []
-            pagination.extend([x for x in range(list_page_number-3, list_page_number+4) if 1 <= x <= total_pages])
-            pagination.append(total_pages)
-            st.radio('Select Page', options=pagination, key='page_number', index=pagination.index(list_page_number), horizontal=True)
-            
-        else:
-            st.write("No apps found.")
-    else:
+    params = {**filters, "page": list_page_number, "page_size": items_per_page}
+    show_facets(filters)
+    try:
+        response_json = get_json("/apps/", params)
+    except requests.exceptions.RequestException:
         st.error("Error retrieving data.")
+        return
+    apps = response_json.get("apps", [])
+    if apps:
+        df = pd.DataFrame(apps)
+        st.dataframe(df)
+
+        total_apps = response_json.get("total", 10)
+        total_pages = (total_apps // items_per_page) + (1 if total_apps % items_per_page > 0 else 0)
+        if list_page_number < total_pages:
+            # the likely next click is already on its way while this page is read
+            prefetch("/apps/", {**params, "page": list_page_number + 1})
+
+        pagination = [1] if list_page_number > 3 else []
+        pagination.extend([x for x in range(list_page_number-3, list_page_number+4) if 1 <= x <= total_pages])
+        pagination.append(total_pages)
+        pagination = sorted(set(pagination))
+        st.radio('Select Page', options=pagination, key='page_number', index=pagination.index(list_page_number), horizontal=True)
+
+    else:
+        st.write("No apps found.")
 
 def delete_app():
     st.subheader("Delete App")
     app_id = st.text_input("App ID to delete")
     if st.button("Delete App"):
-        response = requests.delete(f"{BASE_URL}/apps/{app_id}", proxies= {"http": None,"https": None,})
+        response = client()[0].delete(f"{BASE_URL}/apps/{app_id}")
+        clear_cache()
         st.write(response.json())
 
 def update_app():
@@ -116,7 +189,8 @@ def update_app():
             "Free": free,
             "DeveloperID": developer_id
         }
-        response = requests.put(f"{BASE_URL}/apps/{app_id}", json=data, proxies= {"http": None,"https": None,})
+        response = client()[0].put(f"{BASE_URL}/apps/{app_id}", json=data)
+        clear_cache()
         st.write(response.json())
 
 def main():
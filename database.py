@@ -0,0 +1,36 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+
+# تنظیمات اتصال به SQL Server
+server = 'localhost'
+db_name = 'GooglePlayStore'
+
+connection_string = f'DRIVER={{SQL Server}};SERVER={server};DATABASE={db_name};Integrated Security=True;Trusted_Connection=yes;'
+
+# sqlite3 has no adapter for pandas timestamps; store them the way SQL Server prints DATE and DATETIME.
+sqlite3.register_adapter(pd.Timestamp, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+
+
+def connect(sqlite_path=None):
+    """Return ``(connection, dialect)`` for SQL Server, or for a local SQLite file when a path is given."""
+    if sqlite_path:
+        # concurrent loaders wait for SQLite's single writer lock instead of failing straight away
+        conn = sqlite3.connect(sqlite_path, timeout=60)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn, 'sqlite'
+
+    import pyodbc
+    return pyodbc.connect(connection_string), 'mssql'
+
+
+def retryable_errors(dialect):
+    """Driver errors a concurrent loader can recover from by rolling back and retrying its batch."""
+    if dialect == 'sqlite':
+        return (sqlite3.IntegrityError, sqlite3.OperationalError)
+
+    import pyodbc
+    # deadlock victims (SQLSTATE 40001) surface as plain pyodbc.Error, not one of its subclasses
+    return (pyodbc.Error,)
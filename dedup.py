@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from cleanData import REQUIRED_COLUMNS
+from metrics import Stages
+
+# Latest-scrape-wins deduplication of a streamed CSV. The same app can be scraped several times,
+# with different values, and only its latest scrape may reach the Apps table. A first pass over
+# the key columns keeps, per App Id, a 64-bit hash, the latest Scraped Time and the row that
+# carries it: three sorted arrays, 24 bytes per app. The second pass, the one that is cleaned
+# and loaded, keeps a row only if it is its app's winning row, so every app is emitted exactly
+# once whatever the chunking, and chunks can be deduplicated out of order or skipped on resume.
+# Two App Ids sharing a 64-bit hash (about 1 in 10^7 for 2M apps) would be merged into one.
+KEY_COLUMNS = REQUIRED_COLUMNS + ['Scraped Time']
+
+
+def app_keys(df, first_row):
+    """The valid rows of a raw chunk whose first row is row ``first_row`` of the file, as
+    ``(positions in the chunk, App Id hashes, scrape times in ns, row numbers)``."""
+    positions = np.flatnonzero(df[REQUIRED_COLUMNS].notna().all(axis=1).to_numpy())
+    valid = df.iloc[positions]
+    hashes = pd.util.hash_pandas_object(valid['App Id'].str.strip(), index=False).to_numpy()
+    # unparseable times are NaT, the smallest int64, so any real scrape beats them
+    times = pd.to_datetime(valid['Scraped Time'], format='ISO8601', errors='coerce').astype('datetime64[ns]').to_numpy().view(np.int64)
+    return positions, hashes, times, first_row + positions
+
+
+def latest(hashes, times, rows):
+    """One entry per hash, sorted by hash: the latest time, and the first row that has it."""
+    # ~times reverses the order of the times without overflowing on NaT
+    order = np.lexsort((rows, ~times, hashes))
+    hashes, times, rows = hashes[order], times[order], rows[order]
+    first = np.ones(len(hashes), dtype=bool)
+    first[1:] = hashes[1:] != hashes[:-1]
+    return hashes[first], times[first], rows[first]
+
+
+class LatestScrape:
+    """The winning row of every app in a CSV; see the comment above."""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.times = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.scanned = False
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def nbytes(self):
+        return self.hashes.nbytes + self.times.nbytes + self.rows.nbytes
+
+    def scan(self, path, size, stages=None):
+        """Find the winning rows of the CSV at ``path``, reading only the key columns."""
+        stages = stages or Stages()
+        parts = []
+        with stages.timed('dedup'):
+            chunks = pd.read_csv(path, usecols=KEY_COLUMNS, dtype=str, chunksize=size)
+            for number, chunk in enumerate(chunks):
+                # reduced per chunk, so only the chunk's winners are held until the final merge
+                parts.append(latest(*app_keys(chunk, number * size)[1:]))
+            if parts:
+                self.hashes, self.times, self.rows = latest(*(np.concatenate(column) for column in zip(*parts)))
+        self.scanned = True
+        return self
+
+    def keep(self, df, first_row):
+        """The rows of a raw chunk, starting at row ``first_row`` of the file, that win for their app.
+
+        Invalid rows and every losing scrape are dropped; the losing scrapes are counted in ``dropped``."""
+        positions, hashes, _, rows = app_keys(df, first_row)
+        index = np.minimum(np.searchsorted(self.hashes, hashes), max(len(self.hashes) - 1, 0))
+        wins = (self.rows[index] == rows) & (self.hashes[index] == hashes) if len(self.hashes) else np.zeros(len(rows), dtype=bool)
+        self.dropped += len(rows) - int(np.count_nonzero(wins))
+        return df.iloc[positions[wins]]
@@ -1,28 +1,187 @@
+import argparse
+import json
+import os
+import time
+
 import pandas as pd
 
+from sketches import HyperLogLog, QuantileSketch, TopK, hash_values
+
 # مسیر فایل CSV (آن را به مسیر دیتاست خود تغییر دهید)
 file_path = 'Google-Playstore.csv'
+chunk_size = 100_000
+
+# Most specific first: a column gets the first type every non-null value parses as.
+TYPES = ['bool', 'int', 'float', 'date', 'datetime', 'string']
+DATE_FORMAT = '%b %d, %Y'
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+# text columns with at most this share of distinct values are read as pandas categoricals
+CATEGORY_RATIO = 0.05
+
+
+def profile_path(path):
+    return path + '.profile.json'
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'file': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+class ColumnProfile:
+    """Everything the report says about one column, updated one chunk at a time in bounded memory."""
+
+    def __init__(self, top_capacity=100):
+        self.count = 0
+        self.nulls = 0
+        self.types = set(TYPES)
+        self.numeric_min = self.numeric_max = None
+        self.date_min = self.date_max = None
+        self.text_min = self.text_max = None
+        self.min_length = self.max_length = None
+        self.distinct = HyperLogLog()
+        self.top = TopK(top_capacity)
+        self.quantiles = QuantileSketch()
+
+    def update(self, values):
+        present = values.dropna()
+        self.count += len(present)
+        self.nulls += len(values) - len(present)
+        if not len(present):
+            return
+        self.distinct.update(hash_values(present))
+        self.top.update(present)
+        lengths = present.str.len()
+        self.min_length = _smaller(self.min_length, int(lengths.min()))
+        self.max_length = _larger(self.max_length, int(lengths.max()))
+        self.text_min = _smaller(self.text_min, present.min())
+        self.text_max = _larger(self.text_max, present.max())
+        self._infer(present)
+
+    def _infer(self, present):
+        # a type is only tested while every earlier chunk parsed as it, so text columns drop out after one chunk
+        if 'bool' in self.types and not present.isin(['True', 'False']).all():
+            self.types.discard('bool')
+        if self.types & {'int', 'float'}:
+            numbers = pd.to_numeric(present, errors='coerce')
+            if numbers.isna().any():
+                self.types -= {'int', 'float'}
+            else:
+                if (numbers % 1 != 0).any():
+                    self.types.discard('int')
+                self.numeric_min = _smaller(self.numeric_min, float(numbers.min()))
+                self.numeric_max = _larger(self.numeric_max, float(numbers.max()))
+                self.quantiles.update(numbers.to_numpy())
+        for kind, format in (('date', DATE_FORMAT), ('datetime', 'ISO8601')):
+            if kind not in self.types:
+                continue
+            dates = pd.to_datetime(pd.Series(present.unique()), format=format, errors='coerce')
+            if dates.isna().any():
+                self.types.discard(kind)
+            else:
+                self.date_min = _smaller(self.date_min, dates.min())
+                self.date_max = _larger(self.date_max, dates.max())
+
+    def type(self):
+        return next((kind for kind in TYPES if kind in self.types), 'string') if self.count else 'string'
+
+    def dtype(self):
+        """The pandas dtype to read this column with."""
+        kind = self.type()
+        if kind == 'bool':
+            return 'boolean'
+        if kind == 'int':
+            return 'Int64' if self.nulls else 'int64'
+        if kind == 'float':
+            return 'float64'
+        if self.count and self.distinct.estimate() <= CATEGORY_RATIO * self.count:
+            return 'category'
+        return 'str'
+
+    def report(self, top=10):
+        kind = self.type()
+        if kind in ('int', 'float'):
+            low, high = self.numeric_min, self.numeric_max
+        elif kind in ('date', 'datetime'):
+            low, high = str(self.date_min), str(self.date_max)
+        else:
+            low, high = self.text_min, self.text_max
+        return {
+            'count': self.count,
+            'nulls': self.nulls,
+            'type': kind,
+            'dtype': self.dtype(),
+            'min': low,
+            'max': high,
+            'min_length': self.min_length,
+            'max_length': self.max_length,
+            # NVARCHAR width that fits every value seen
+            'width': self.max_length or 0,
+            'distinct': self.distinct.estimate(),
+            'top': self.top.top(top),
+            'top_error': self.top.error,
+            'quantiles': dict(zip((f"p{round(q * 100)}" for q in QUANTILES), self.quantiles.quantiles(QUANTILES)))
+            if kind in ('int', 'float') else None,
+        }
+
+
+def _smaller(current, value):
+    return value if current is None or value < current else current
+
+
+def _larger(current, value):
+    return value if current is None or value > current else current
+
+
+def profile(path, size=chunk_size, top=10):
+    """One streaming pass over the CSV; memory is bounded by ``size`` rows plus fixed-size sketches per column."""
+    columns = {}
+    rows = 0
+    for chunk in pd.read_csv(path, dtype='str', chunksize=size):
+        rows += len(chunk)
+        for name in chunk.columns:
+            columns.setdefault(name, ColumnProfile()).update(chunk[name])
+    return {
+        'source': source_signature(path),
+        'rows': rows,
+        'columns': {name: column.report(top) for name, column in columns.items()},
+    }
+
+
+def load_profile(path, report_path=None):
+    """The saved report for the CSV at ``path``, or None when it is missing or was made from a different file."""
+    try:
+        with open(report_path or profile_path(path)) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report if report.get('source') == source_signature(path) else None
+
 
-# خواندن دیتاست
-df = pd.read_csv(file_path)
+def main():
+    parser = argparse.ArgumentParser(description="Profile the dataset in one streaming pass with bounded memory.")
+    parser.add_argument('--file', default=file_path, help="path of the source CSV")
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help="rows read per chunk")
+    parser.add_argument('--top', type=int, default=10, help="most frequent values reported per column")
+    parser.add_argument('--json', metavar='PATH', help="where to write the report (default: next to the CSV)")
+    args = parser.parse_args()
 
-# تعداد کل رکوردها
-total_records = df.shape[0]
+    started = time.perf_counter()
+    report = profile(args.file, args.chunk_size, args.top)
+    elapsed = time.perf_counter() - started
 
-# نمایش نام ستون‌ها
-columns = df.columns.tolist()
+    # نمایش گزارش نهایی
+    print(f"total_records: {report['rows']:,} ({elapsed:.1f}s)\n")
+    print(f"{'column':<20}{'type':>10}{'dtype':>10}{'nulls':>12}{'distinct':>12}{'width':>8}  min .. max")
+    for name, column in report['columns'].items():
+        print(f"{name:<20}{column['type']:>10}{column['dtype']:>10}{column['nulls']:>12,}{column['distinct']:>12,}"
+              f"{column['width']:>8}  {column['min']} .. {column['max']}")
 
-# بررسی تعداد مقادیر NaN در هر ستون
-missing_values = df.isna().sum()
+    output = args.json or profile_path(args.file)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nreport written to {output}")
 
-# نمایش نوع داده هر ستون
-data_types = df.dtypes
 
-# نمایش گزارش نهایی
-print(f"total_records: {total_records}\n")
-print("columns:")
-print(columns, "\n")
-print("missing_values:")
-print(missing_values, "\n")
-print("data_types:")
-print(data_types, "\n")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleanData import USECOLS
+
+# Synthetic stand-in for Google-Playstore.csv with the same columns, formats and roughly the
+# same value distributions as the 2021 scrape, so benchmarks can run at any size without the
+# real file. The output depends only on --rows, --seed and --chunk-size.
+output_path = 'Google-Playstore.synthetic.csv'
+chunk_size = 100_000
+min_rows = 10_000
+max_rows = 5_000_000
+
+# (category, share of apps); Education and Music & Audio dominate, games trail off
+CATEGORIES = [
+    ('Education', 10.3), ('Music & Audio', 6.5), ('Tools', 6.2), ('Business', 6.2), ('Entertainment', 6.1),
+    ('Lifestyle', 5.2), ('Books & Reference', 5.0), ('Personalization', 3.8), ('Health & Fitness', 3.6),
+    ('Productivity', 3.4), ('Shopping', 3.2), ('Food & Drink', 3.2), ('Travel & Local', 2.9),
+    ('Finance', 2.8), ('Arcade', 2.3), ('Puzzle', 2.2), ('Casual', 2.2), ('Communication', 2.1),
+    ('Sports', 2.0), ('Social', 1.9), ('News & Magazines', 1.8), ('Photography', 1.7), ('Medical', 1.4),
+    ('Action', 1.2), ('Maps & Navigation', 1.1), ('Simulation', 1.0), ('Adventure', 1.0), ('Educational', 0.9),
+    ('Art & Design', 0.8), ('Auto & Vehicles', 0.8), ('House & Home', 0.6), ('Video Players & Editors', 0.6),
+    ('Events', 0.5), ('Trivia', 0.5), ('Beauty', 0.5), ('Board', 0.4), ('Racing', 0.4), ('Role Playing', 0.4),
+    ('Word', 0.4), ('Strategy', 0.3), ('Card', 0.3), ('Weather', 0.3), ('Dating', 0.3), ('Libraries & Demo', 0.2),
+    ('Casino', 0.2), ('Music', 0.1), ('Parenting', 0.1), ('Comics', 0.1),
+]
+# (label, share); the upper bound of each bucket is the next label
+INSTALLS = [
+    ('0+', 0.5), ('1+', 3.0), ('5+', 4.0), ('10+', 13.0), ('50+', 8.0), ('100+', 19.0), ('500+', 8.0),
+    ('1,000+', 17.0), ('5,000+', 6.0), ('10,000+', 9.5), ('50,000+', 3.0), ('100,000+', 4.5),
+    ('500,000+', 1.2), ('1,000,000+', 1.6), ('5,000,000+', 0.4), ('10,000,000+', 0.5),
+    ('50,000,000+', 0.1), ('100,000,000+', 0.08), ('500,000,000+', 0.01), ('1,000,000,000+', 0.008),
+    ('5,000,000,000+', 0.001), ('10,000,000,000+', 0.0005),
+]
+MIN_ANDROID = [
+    ('4.1 and up', 30.0), ('4.4 and up', 19.0), ('5.0 and up', 17.0), ('4.0.3 and up', 9.0), ('4.2 and up', 4.0),
+    ('4.0 and up', 3.0), ('2.3 and up', 2.0), ('2.3.3 and up', 1.5), ('6.0 and up', 2.5), ('5.1 and up', 2.0),
+    ('7.0 and up', 1.5), ('8.0 and up', 1.0), ('4.3 and up', 1.0), ('Varies with device', 2.5),
+    ('3.0 and up', 0.3), ('2.2 and up', 0.3), ('1.6 and up', 0.1), ('4.4W and up', 0.05), ('4.0.3 - 7.1.1', 0.05),
+]
+CONTENT_RATINGS = [
+    ('Everyone', 87.0), ('Teen', 8.5), ('Mature 17+', 2.9), ('Everyone 10+', 1.5),
+    ('Adults only 18+', 0.01), ('Unrated', 0.01),
+]
+CURRENCIES = [('USD', 99.9), ('EUR', 0.03), ('INR', 0.02), ('GBP', 0.02), ('BRL', 0.01), ('XXX', 0.02)]
+PRICES = np.array([0.99, 1.49, 1.99, 2.49, 2.99, 3.99, 4.99, 5.99, 7.99, 9.99, 14.99, 19.99, 29.99, 49.99, 99.99, 399.99])
+
+WORDS = """
+smart quick super pro simple easy my the daily best free photo video music radio quiz math kids learn
+english spanish word puzzle block ball run car race city farm food recipe fit yoga diet health doctor
+bible prayer quran wallpaper theme launcher keyboard camera editor scanner pdf note todo calendar clock
+alarm weather map gps bus train taxi hotel travel shop store market deal coupon bank money budget
+crypto stock chat messenger dating social news sport football soccer cricket tennis golf fishing
+hunting zombie dragon hero war battle tower defense craft block world island space star galaxy
+jewel candy bubble match pop dash jump fly piano guitar drum sound ringtone voice translator dictionary
+flashlight battery cleaner booster vpn browser file manager backup qr barcode school class exam test
+driving police fire rescue pet dog cat horse baby mom family love photo collage sticker emoji font
+""".split()
+SUFFIXES = ['', '', '', ' Pro', ' Lite', ' Free', ' 2021', ' HD', ' Plus', ' 3D', ' Simulator', ' for Kids']
+
+START = pd.Timestamp('2010-01-01')
+SCRAPE_START = pd.Timestamp('2021-06-14')
+
+
+def _pick(rng, choices, size):
+    labels = np.array([label for label, _ in choices], dtype=object)
+    weights = np.array([weight for _, weight in choices], dtype=float)
+    return labels[rng.choice(len(labels), size=size, p=weights / weights.sum())]
+
+
+def _install_bounds():
+    minimum = np.array([int(label.replace(',', '').rstrip('+')) for label, _ in INSTALLS], dtype='int64')
+    upper = np.append(minimum[1:], minimum[-1] * 5)
+    return minimum, np.maximum(upper, 1)
+
+
+def _blank(values, rng, share):
+    # a share of the values missing, written as empty CSV fields like in the real scrape
+    values = values.astype(object)
+    values[rng.random(len(values)) < share] = None
+    return values
+
+
+def _dates(days):
+    return pd.Series(START + pd.to_timedelta(days, unit='D')).dt.strftime('%b %d, %Y').to_numpy(dtype=object)
+
+
+def developer_weights(rows, seed):
+    """Cumulative share of apps per developer: about 3.6 apps each on average, but Pareto
+    distributed, so a few publish thousands of apps and most publish one or two."""
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(1.5, max(1, rows * 10 // 36)) + 1
+    return np.cumsum(weights) / weights.sum()
+
+
+def generate_chunk(rng, first, size, developers):
+    """``size`` rows numbered from ``first``; every column comes from vectorised draws on ``rng``.
+
+    ``developers`` is the cumulative share of apps per developer from developer_weights."""
+    numbers = np.arange(first, first + size)
+    words = np.array(WORDS, dtype=object)
+    name_words = rng.integers(0, len(words), size=(size, 3))
+    lengths = rng.choice([1, 2, 3], size=size, p=[0.2, 0.5, 0.3])
+    names = pd.Series(words[name_words[:, 0]]).str.title()
+    for column in (1, 2):
+        more = pd.Series(" " + pd.Series(words[name_words[:, column]]).str.title())
+        names = names + more.where(lengths > column, "")
+    names = (names + np.array(SUFFIXES, dtype=object)[rng.integers(0, len(SUFFIXES), size)]).to_numpy(dtype=object)
+
+    developer = np.minimum(np.searchsorted(developers, rng.random(size)), len(developers) - 1)
+    developer_ids = np.char.add('Developer ', developer.astype(str)).astype(object)
+    slugs = np.char.add('dev', developer.astype(str))
+    app_ids = np.char.add(np.char.add(np.char.add('com.', slugs), '.app'), numbers.astype(str)).astype(object)
+    websites = _blank(np.char.add(np.char.add('https://', slugs), '.example.com').astype(object), rng, 0.35)
+    emails = _blank(np.char.add(slugs, '@example.com').astype(object), rng, 0.001)
+    privacy = _blank(np.char.add(np.char.add('https://', slugs), '.example.com/privacy').astype(object), rng, 0.18)
+
+    category = _pick(rng, CATEGORIES, size)
+
+    # close to half of all apps have no ratings at all
+    rated = rng.random(size) > 0.47
+    rating = np.where(rated, np.clip(np.round(rng.normal(4.1, 0.65, size), 1), 1.0, 5.0), 0.0)
+    rating_count = np.where(rated, np.ceil(rng.lognormal(3.5, 2.0, size)), 0.0)
+
+    bucket = rng.choice(len(INSTALLS), size=size, p=np.array([w for _, w in INSTALLS]) / sum(w for _, w in INSTALLS))
+    minimum, upper = _install_bounds()
+    installs = np.array([label for label, _ in INSTALLS], dtype=object)[bucket]
+    min_installs = minimum[bucket]
+    max_installs = min_installs + (rng.random(size) * (upper[bucket] - min_installs)).astype('int64')
+
+    free = rng.random(size) > 0.02
+    price = np.where(free, 0.0, PRICES[rng.integers(0, len(PRICES), size)])
+    currency = _pick(rng, CURRENCIES, size)
+
+    megabytes = np.round(rng.lognormal(2.4, 1.0, size), 1)
+    size_text = np.where(megabytes >= 1, np.char.add(megabytes.astype(str), 'M'),
+                         np.char.add(np.round(megabytes * 1024).astype('int64').astype(str), 'k')).astype(object)
+    size_text[megabytes >= 1024] = np.char.add(np.round(megabytes[megabytes >= 1024] / 1024, 1).astype(str), 'G')
+    size_text[rng.random(size) < 0.03] = 'Varies with device'
+    min_android = _blank(_pick(rng, MIN_ANDROID, size), rng, 0.003)
+
+    # releases grow year over year up to the scrape; updates fall between release and scrape
+    span = (SCRAPE_START - START).days
+    released_days = (span * np.sqrt(rng.random(size))).astype('int64')
+    updated_days = released_days + (rng.random(size) ** 2 * (span - released_days)).astype('int64')
+    released = _blank(_dates(released_days), rng, 0.03)
+    updated = _dates(updated_days)
+
+    scraped = (SCRAPE_START + pd.to_timedelta(rng.integers(0, 7 * 86400, size), unit='s')).strftime('%Y-%m-%d %H:%M:%S')
+
+    return pd.DataFrame({
+        'App Name': names,
+        'App Id': app_ids,
+        'Category': category,
+        'Rating': np.where(rated | (rng.random(size) < 0.5), rating, np.nan),
+        'Rating Count': rating_count,
+        'Installs': installs,
+        'Minimum Installs': min_installs,
+        'Maximum Installs': max_installs,
+        'Free': free,
+        'Price': price,
+        'Currency': currency,
+        'Size': size_text,
+        'Minimum Android': min_android,
+        'Developer Id': developer_ids,
+        'Developer Website': websites,
+        'Developer Email': emails,
+        'Released': released,
+        'Last Updated': updated,
+        'Content Rating': _pick(rng, CONTENT_RATINGS, size),
+        'Privacy Policy': privacy,
+        'Ad Supported': rng.random(size) < 0.5,
+        'In App Purchases': rng.random(size) < 0.08,
+        'Editors Choice': rng.random(size) < 0.0004,
+        'Scraped Time': scraped,
+    }, columns=USECOLS)
+
+
+def rescrape(rng, df, share):
+    """Copies of ``share`` of the rows scraped again later, some of them with a newer update."""
+    picked = df[rng.random(len(df)) < share].copy()
+    if not len(picked):
+        return picked
+    later = pd.to_datetime(picked['Scraped Time']) + pd.to_timedelta(rng.integers(3600, 2 * 86400, len(picked)), unit='s')
+    picked['Scraped Time'] = later.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+    changed = rng.random(len(picked)) < 0.3
+    picked.loc[changed, 'Last Updated'] = SCRAPE_START.strftime('%b %d, %Y')
+    picked.loc[changed, 'Rating'] = np.clip(picked.loc[changed, 'Rating'].fillna(0) + 0.1, 0, 5).round(1)
+    return picked
+
+
+def generate(path, rows, seed=0, size=chunk_size, duplicates=0.0):
+    """Write ``rows`` synthetic apps to ``path`` one chunk at a time; memory stays bounded by ``size``.
+
+    With ``duplicates`` above 0, that share of every chunk is written again at the end of the
+    next chunk as a later re-scrape of the same App Id."""
+    developers = developer_weights(rows, seed)
+    written = 0
+    pending = None
+    for number, first in enumerate(range(0, rows, size)):
+        # one generator per chunk, so a chunk does not depend on how the previous ones were drawn
+        rng = np.random.default_rng([seed, number])
+        df = generate_chunk(rng, first, min(size, rows - first), developers)
+        if pending is not None:
+            df = pd.concat([df, pending], ignore_index=True)
+        pending = rescrape(rng, df.iloc[:min(size, rows - first)], duplicates) if duplicates else None
+        df.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        written += len(df)
+    if pending is not None and len(pending):
+        pending.to_csv(path, mode='a', header=False, index=False)
+        written += len(pending)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic Google-Playstore.csv.")
+    parser.add_argument('--rows', type=int, default=100_000, help=f"apps to generate ({min_rows:,} to {max_rows:,})")
+    parser.add_argument('--seed', type=int, default=0, help="same seed and rows, same file")
+    parser.add_argument('--output', default=output_path, help="path of the CSV to write")
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help="rows generated and written per chunk")
+    parser.add_argument('--duplicates', type=float, default=0.0, help="share of apps written again as a later re-scrape")
+    args = parser.parse_args()
+    if not min_rows <= args.rows <= max_rows:
+        parser.error(f"--rows must be between {min_rows:,} and {max_rows:,}")
+
+    started = time.perf_counter()
+    written = generate(args.output, args.rows, args.seed, args.chunk_size, args.duplicates)
+    elapsed = time.perf_counter() - started
+    print(f"✓ {written:,} rows written to {args.output} in {elapsed:,.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
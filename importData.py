@@ -1,101 +1,426 @@
-import pandas as pd
-import pyodbc
-import numpy as np
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
 
-# تنظیمات اتصال به SQL Server
-server = 'localhost'
-db_name = 'GooglePlayStore'
+import pandas as pd
 
-connection_string = f'DRIVER={{SQL Server}};SERVER={server};DATABASE={db_name};Integrated Security=True;Trusted_Connection=yes;'
-conn = pyodbc.connect(connection_string)
-cursor = conn.cursor()
+import metrics
+import rollups
+import search
+from bulkLoader import BulkLoader, oversized_columns
+from cleanData import clean_frame, profile_dtypes, read_chunks
+from database import connect, retryable_errors
+from dedup import LatestScrape
+from details import load_profile
+from snapshot import clean_chunks, iter_snapshot, snapshot_path
 
+try:
+    import resource
+except ImportError:
+    resource = None
 
 file_path = 'Google-Playstore.csv'
 # file_path = '1.csv'
-df = pd.read_csv(file_path)
-
-df = df.drop_duplicates()
-df = df.dropna(subset=['App Name', 'App Id', 'Category', 'Developer Id'])
-
-df['App Name'] = df['App Name'].astype(str).str.strip()
-df['App Id'] = df['App Id'].astype(str).str.strip()
-df['Category'] = df['Category'].astype(str).str.strip().str.split(" & ")
-df['Developer Id'] = df['Developer Id'].astype(str).str.strip()
-
-df['Price'] = df['Price'].astype(float).fillna(0).round(2)
-df['Rating'] = df['Rating'].astype(float).fillna(0).round(2)
-
-df['Rating Count'] = df['Rating Count'].replace(r'[\+,]', '', regex=True).fillna(0).astype(int)
-df['Installs'] = df['Installs'].astype(str).str.replace(r'[\+,]', '', regex=True).replace("nan", 0).fillna(0).astype(int)
-df['Minimum Installs'] = df['Minimum Installs'].replace(r'[\+,]', '', regex=True).fillna(0).astype(int)
-df['Maximum Installs'] = df['Maximum Installs'].replace(r'[\+,]', '', regex=True).fillna(0).astype(int)
-
-df['Free'] = df['Free'].astype(bool)
-df['Ad Supported'] = df['Ad Supported'].astype(bool)
-df['In App Purchases'] = df['In App Purchases'].astype(bool)
-df['Editors Choice'] = df['Editors Choice'].astype(bool)
-
-df['Released'] = pd.to_datetime(df['Released'], format='%b %d, %Y', errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if not pd.isna(x) else None)
-df['Last Updated'] = pd.to_datetime(df['Last Updated'], format='%b %d, %Y', errors='coerce').dt.strftime('%Y-%m-%d')
-df['Scraped Time'] = pd.to_datetime(df['Scraped Time'], errors='coerce')
-
-# df['Developer Website'] = df['Developer Website'].apply(lambda x: str(x) if pd.notna(x) else None)
-text_columns = ['Privacy Policy', 'Currency', 'Size', 'Minimum Android', 'Content Rating', 'Developer Website']
-df[text_columns] = df[text_columns].fillna("").astype(str)
-
-
-print("✓ Data cleared.")
-
-developers = df[['Developer Id', 'Developer Website', 'Developer Email']].dropna(subset=['Developer Id']).dropna(subset=['Developer Email']).drop_duplicates(subset=['Developer Id'])
-for index, row in developers.iterrows():
-    cursor.execute("""
-        IF NOT EXISTS (SELECT 1 FROM Developers WHERE DeveloperName = ?)
-        INSERT INTO Developers (DeveloperName, DeveloperWebsite, DeveloperEmail) 
-        VALUES (?, ?, ?)""",
-        row['Developer Id'], row['Developer Id'], row['Developer Website'], row['Developer Email'])
-
-conn.commit()
-print("   ✓ Developer imported.")
-
-categories = set(cat for sublist in df["Category"].dropna() for cat in sublist)
-for category in categories:
-    cursor.execute("""
-        IF NOT EXISTS (SELECT 1 FROM Categories WHERE CategoryName = ?)
-        INSERT INTO Categories (CategoryName) VALUES (?)""",
-        category, category)
-
-conn.commit()
-print("   ✓ Category imported.")
-
-for index, row in df.iterrows():
-    cursor.execute("""
-        INSERT INTO Apps (AppID, AppName, Rating, RatingCount, Installs, MinInstalls, MaxInstalls, Free, Price, Currency,
-                          Size, MinAndroid, DeveloperID, Released, LastUpdated, ContentRating, PrivacyPolicy, AdSupported, 
-                          InAppPurchases, EditorsChoice, ScrapedTime)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 
-                (SELECT DeveloperID FROM Developers WHERE DeveloperName = ?), ?, ?, ?, ?, ?, ?, ?, ?)
-""",
-    row['App Id'], row['App Name'], float(row['Rating']), row['Rating Count'], row['Installs'],
-    row['Minimum Installs'], row['Maximum Installs'], row['Free'], float(row['Price']), row['Currency'], row['Size'],
-    row['Minimum Android'], row['Developer Id'], row['Released'], row['Last Updated'], row['Content Rating'],
-    row['Privacy Policy'], row['Ad Supported'], row['In App Purchases'], row['Editors Choice'], row['Scraped Time'])
-
-    app_id = row["App Id"]
-    if isinstance(row["Category"], list):
-        for category in row["Category"]:
-            f2.write("({0},(SELECT CategoryID FROM Categories WHERE CategoryName = {1})),".format(app_id, category))
-            cursor.execute("""
-    MERGE INTO AppCategories AS target
-    USING (SELECT ?, CategoryID FROM Categories WHERE CategoryName = ?) AS source (AppID, CategoryID)
-    ON target.AppID = source.AppID AND target.CategoryID = source.CategoryID
-    WHEN NOT MATCHED THEN
-        INSERT (AppID, CategoryID) VALUES (source.AppID, source.CategoryID);
-            """, (app_id, category))
-
-    if index % 1000 == 0:
+chunk_size = 100_000
+batch_size = 10_000
+# partitions buffered per queue before the previous stage blocks
+queue_depth = 4
+
+# written with --metrics in the Prometheus text format, e.g. for node_exporter's textfile collector
+stage_seconds = metrics.registry.counter('import_stage_seconds_total', "Seconds per import stage, summed over processes", ['stage'])
+imported_rows = metrics.registry.counter('import_rows_total', "Rows loaded by the last import")
+import_peak_memory = metrics.registry.gauge('import_peak_memory_bytes', "Peak resident memory of the importer")
+dropped_duplicates = metrics.registry.counter('import_duplicates_dropped_total', "Earlier scrapes of an app dropped by the last import")
+
+
+def peak_memory_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+def format_memory(mb):
+    return f"{mb:,.0f} MB" if mb is not None else "n/a"
+
+
+def checkpoint_path(path):
+    return path + '.checkpoint.json'
+
+
+def chunk_source(path, use_snapshot):
+    """What the chunks of a sequential run are cut from: the cleaned snapshot when it exists, else 'csv'.
+
+    The two are chunked differently (the snapshot holds only the rows that survive cleaning and
+    deduplication), so a chunk count is only meaningful for the source it was counted on."""
+    snapshot = snapshot_path(path) if use_snapshot else None
+    return os.path.abspath(snapshot) if snapshot and os.path.exists(snapshot) else 'csv'
+
+
+def file_signature(path, size, source):
+    stat = os.stat(path)
+    return {'file': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime, 'chunk_size': size, 'source': source}
+
+
+def load_checkpoint(path, size, source):
+    """Number of chunks already committed by an earlier run over the same, unchanged file and source."""
+    try:
+        with open(checkpoint_path(path)) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get('signature') != file_signature(path, size, source):
+        return 0
+    return checkpoint.get('chunks', 0)
+
+
+def save_checkpoint(path, size, source, chunks):
+    temp = checkpoint_path(path) + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump({'signature': file_signature(path, size, source), 'chunks': chunks}, f)
+    os.replace(temp, checkpoint_path(path))
+
+
+def update_rollups(cursor, loaded, stored):
+    """Apply an incremental chunk to the rollups in place of a rebuild: the replaced copies of its
+    apps are subtracted and the loaded ones added (BulkLoader.stored/loaded)."""
+    def execute(sql, params):
+        cursor.execute(sql, params)
+        return cursor.rowcount
+    changes = [(app, list(app_categories), -1) for app, app_categories in stored.values()]
+    changes += [(app, list(app_categories), 1) for app, app_categories in loaded.values()]
+    rollups.apply_apps(execute, changes)
+
+
+def update_search(cursor, loaded, stored, developers, categories, backfilled=None):
+    """Apply an incremental chunk to the search index in place of a rebuild: ``loaded`` and ``stored``
+    are the new and the replaced copies of its apps (BulkLoader.loaded/stored), ``developers`` and
+    ``categories`` the ones it inserted, ``backfilled`` earlier apps it keyed to their developer."""
+    executemany = cursor.executemany
+    renamed = [app_id for app_id, (app, _) in loaded.items()
+               if app_id not in stored or (app.AppName, app.Installs) != (stored[app_id][0].AppName, stored[app_id][0].Installs)]
+    search.unindex(executemany, 'apps', [(app_id, stored[app_id][0].AppName) for app_id in renamed if app_id in stored])
+    search.index(executemany, 'apps', [(app_id, loaded[app_id][0].AppName, loaded[app_id][0].Installs or 0) for app_id in renamed])
+    search.index(executemany, 'developers', [(developer_id, name, 0) for developer_id, name in developers.items()])
+    search.index(executemany, 'categories', [(category_id, name, 0) for category_id, name in categories.items()])
+
+    names = {'developers': {}, 'categories': {}}
+    changes = []
+    for apps, sign in ((stored, -1), (loaded, 1)):
+        for app, app_categories in apps.values():
+            names['developers'][app.DeveloperID] = app.DeveloperName
+            names['categories'].update(app_categories)
+            changes.append((app.DeveloperID, list(app_categories), sign))
+    for app_id, (developer_id, name) in (backfilled or {}).items():
+        if app_id not in loaded:
+            names['developers'][developer_id] = name
+            changes.append((developer_id, [], 1))
+    for kind, deltas in search.weight_deltas(changes).items():
+        search.reweight(executemany, kind, [(entity_id, names[kind][entity_id], delta) for entity_id, delta in deltas.items()
+                                             if names[kind].get(entity_id)])
+
+
+def load_chunk(conn, loader, df, errors=(), attempts=3, incremental=False, stages=None):
+    stages = stages or metrics.Stages()
+    if incremental:
+        with stages.timed('delta'):
+            loader.begin()
+            new, changed = loader.delta(df)
+            df = pd.concat([new, changed])
+    for attempt in range(attempts):
+        try:
+            loader.begin()
+            if incremental:
+                with stages.timed('delta'):
+                    stored = loader.stored(changed['App Id'].tolist())
+            with stages.timed('dimensions'):
+                developers = loader.load_developers(df)
+                categories = loader.load_categories(df)
+                loader.load_lookups(df)
+            with stages.timed('facts'):
+                loader.load_apps(df, update=incremental)
+            with stages.timed('links'):
+                loader.load_app_categories(df, replace=incremental)
+            if incremental:
+                # rollups and index follow the chunk in its own transaction; a full import rebuilds them once at the end
+                loaded = loader.loaded(df)
+                with stages.timed('rollups'):
+                    update_rollups(loader.cursor, loaded, stored)
+                with stages.timed('search'):
+                    update_search(loader.cursor, loaded, stored, developers, categories, loader.backfilled)
+            with stages.timed('commit'):
+                conn.commit()
+            return (len(new), len(changed)) if incremental else (len(df), 0)
+        except errors:
+            conn.rollback()
+            loader.forget()
+            if attempt == attempts - 1:
+                raise
+            # back off, so loaders that collided do not collide again straight away
+            time.sleep(0.1 * 2 ** attempt)
+
+
+def clean_worker(work_queue, loader_queues, result_queue):
+    error = None
+    stages = metrics.Stages()
+    try:
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            if error:
+                # keep draining so the reader never blocks on a dead worker
+                continue
+            number, df, cleaned = item
+            try:
+                if not cleaned:
+                    with stages.timed('clean'):
+                        df = clean_frame(df)
+                # the same App Id always lands on the same loader, so PK conflicts never race
+                partitions = pd.util.hash_pandas_object(df['App Id'], index=False).to_numpy() % len(loader_queues)
+                for index, loader_queue in enumerate(loader_queues):
+                    part = df[partitions == index]
+                    if len(part):
+                        loader_queue.put((number, part))
+            except Exception:
+                error = traceback.format_exc()
+    except BaseException:
+        error = error or traceback.format_exc()
+        raise
+    finally:
+        # the loaders wait for a sentinel from every worker, and run_parallel for a result
+        for loader_queue in loader_queues:
+            loader_queue.put(None)
+        result_queue.put((0, peak_memory_mb(), error, dict(stages.seconds), {}))
+
+
+def load_worker(number, loader_queue, result_queue, workers, sqlite_path, batch_size, widths=None):
+    rows, error, conn, loader = 0, None, None, None
+    stages = metrics.Stages()
+    try:
+        try:
+            conn, dialect = connect(sqlite_path)
+            loader = BulkLoader(conn, dialect, batch_size, widths)
+            errors = retryable_errors(dialect)
+        except Exception:
+            error = traceback.format_exc()
+
+        finished = 0
+        while finished < workers:
+            item = loader_queue.get()
+            if item is None:
+                finished += 1
+                continue
+            if error:
+                # keep draining so the cleaning workers never block on a dead loader
+                continue
+            chunk, df = item
+            try:
+                load_chunk(conn, loader, df, errors, stages=stages)
+            except Exception:
+                error = traceback.format_exc()
+                continue
+            rows += len(df)
+            print(f"   ✓ Loader {number}: chunk {chunk}, {len(df):,} rows")
+    finally:
+        # closing without a commit also rolls back the transaction of a failed chunk
+        if conn is not None:
+            conn.close()
+        # apps whose developer may have been stored by another loader, keyed once every loader is done
+        unkeyed = loader.unkeyed if loader is not None and error is None else {}
+        result_queue.put((rows, peak_memory_mb(), error, dict(stages.seconds), unkeyed))
+
+
+def run_sequential(args, stages, latest):
+    conn, dialect = connect(args.sqlite)
+    loader = BulkLoader(conn, dialect, args.batch_size, args.widths)
+
+    # a checkpoint left by a run over the other source is ignored, and the import starts over
+    source = chunk_source(args.file, not args.no_snapshot)
+    skip = load_checkpoint(args.file, args.chunk_size, source)
+    if skip:
+        print(f"   ↻ Resuming after chunk {skip} from {checkpoint_path(args.file)}")
+
+    total_rows = 0
+    chunk_started = time.perf_counter()
+    chunks = clean_chunks(args.file, args.chunk_size, skip, not args.no_snapshot, args.dtypes, stages, latest)
+    for number, df in enumerate(chunks, skip + 1):
+        inserted, updated = load_chunk(conn, loader, df, incremental=args.incremental, stages=stages)
+        save_checkpoint(args.file, args.chunk_size, source, number)
+
+        total_rows += len(df)
+        elapsed = time.perf_counter() - chunk_started
+        delta = f" ({inserted:,} new, {updated:,} changed)" if args.incremental else ""
+        print(f"   ✓ Chunk {number}: {len(df):,} rows{delta}, {len(df) / elapsed:,.0f} rows/sec, peak memory {format_memory(peak_memory_mb())}")
+        chunk_started = time.perf_counter()
+
+    conn.close()
+    if os.path.exists(checkpoint_path(args.file)):
+        os.remove(checkpoint_path(args.file))
+    return total_rows, peak_memory_mb()
+
+
+def run_parallel(args, stages, latest):
+    work_queue = mp.Queue(maxsize=args.workers * queue_depth)
+    loader_queues = [mp.Queue(maxsize=queue_depth) for _ in range(args.loaders)]
+    result_queue = mp.Queue()
+
+    workers = [mp.Process(target=clean_worker, args=(work_queue, loader_queues, result_queue)) for _ in range(args.workers)]
+    loaders = [mp.Process(target=load_worker, args=(number, loader_queue, result_queue, args.workers, args.sqlite, args.batch_size, args.widths))
+               for number, loader_queue in enumerate(loader_queues, 1)]
+    for process in workers + loaders:
+        process.start()
+
+    # a cleaned snapshot lets the workers skip straight to partitioning
+    snapshot = None if args.no_snapshot else snapshot_path(args.file)
+    if snapshot and os.path.exists(snapshot):
+        chunks = ((number, df, True) for number, df in enumerate(iter_snapshot(snapshot, args.chunk_size), 1))
+    else:
+        # duplicates are dropped here, since every App Id has to be seen by the same process
+        latest.scan(args.file, args.chunk_size, stages)
+        chunks = ((number, chunk, False) for number, chunk in enumerate(read_chunks(args.file, args.chunk_size, dtypes=args.dtypes), 1))
+    try:
+        for number, df, cleaned in stages.iterate('read', chunks):
+            if not cleaned:
+                with stages.timed('dedup'):
+                    df = latest.keep(df, (number - 1) * args.chunk_size)
+            work_queue.put((number, df, cleaned))
+    except BaseException:
+        # the children would wait for sentinels forever; half-loaded chunks roll back with their connections
+        for process in workers + loaders:
+            process.terminate()
+        for process in workers + loaders:
+            process.join()
+        # nobody reads the chunks still buffered for the workers, so exiting must not wait to flush them
+        work_queue.cancel_join_thread()
+        raise
+    for _ in workers:
+        work_queue.put(None)
+
+    # one result per cleaning worker and per loader, each with the stage timings of its process
+    results = [result_queue.get() for _ in workers + loaders]
+    for process in workers + loaders:
+        process.join()
+
+    errors = [error for _, _, error, _, _ in results if error]
+    if errors:
+        raise RuntimeError("import process failed:\n" + errors[0])
+    for _, _, _, seconds, _ in results:
+        stages.merge(seconds)
+    backfill_developers(args, stages, [unkeyed for _, _, _, _, unkeyed in results])
+    peaks = [peak for _, peak, _, _, _ in results if peak is not None] + [peak_memory_mb() or 0]
+    return sum(rows for rows, _, _, _, _ in results), max(peaks)
+
+
+def backfill_developers(args, stages, unkeyed):
+    """Key the apps the loaders left without a developer to the developers other loaders stored."""
+    with stages.timed('developers'):
+        conn, dialect = connect(args.sqlite)
+        loader = BulkLoader(conn, dialect, args.batch_size, args.widths)
+        for apps in unkeyed:
+            for name, app_ids in apps.items():
+                loader.unkeyed.setdefault(name, set()).update(app_ids)
+        loader.begin()
+        keyed = loader.backfill_stored()
         conn.commit()
-    
+        conn.close()
+    if keyed:
+        print(f"   ✓ {keyed:,} apps keyed to developers stored by other loaders")
+
+
+def apply_profile(args):
+    """Read dtypes and staging column widths from a details.py report of the CSV being loaded."""
+    args.dtypes = args.widths = None
+    if not args.profile:
+        return
+    report = load_profile(args.file, args.profile)
+    if report is None:
+        print(f"   ! {args.profile} does not describe {args.file} as it is now; run details.py again")
+        return
+    args.dtypes = profile_dtypes(report)
+    args.widths = {column: stats['width'] for column, stats in report['columns'].items()}
+    for column, width, declared in oversized_columns(args.widths):
+        print(f"   ! {column}: longest value has {width:,} characters, column holds {declared:,}")
+
+
+def rebuild_rollups(args, stages):
+    with stages.timed('rollups'):
+        conn, dialect = connect(args.sqlite)
+        rollups.rebuild(conn.cursor(), dialect)
+        conn.commit()
+        conn.close()
+    print(f"   ✓ Rollups rebuilt in {stages.seconds['rollups']:,.1f}s")
+
+
+def rebuild_search(args, stages):
+    with stages.timed('search'):
+        conn, dialect = connect(args.sqlite)
+        search.rebuild(conn, dialect, args.batch_size)
+        conn.commit()
+        conn.close()
+    print(f"   ✓ Search index rebuilt in {stages.seconds['search']:,.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream the Google Play Store CSV into SQL Server.")
+    parser.add_argument('--file', default=file_path, help="path of the source CSV")
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help="rows read and cleaned per chunk")
+    parser.add_argument('--batch-size', type=int, default=batch_size, help="rows sent per executemany round trip")
+    parser.add_argument('--sqlite', metavar='PATH', help="load into a local SQLite stand-in instead of SQL Server")
+    parser.add_argument('--workers', type=int, default=0, help="cleaning processes; 0 cleans and loads in this process")
+    parser.add_argument('--loaders', type=int, default=1, help="concurrent loader connections when --workers is set")
+    parser.add_argument('--no-snapshot', action='store_true', help="always parse and clean the CSV instead of using its cleaned Parquet snapshot")
+    parser.add_argument('--profile', metavar='PATH', help="details.py report of the CSV, used to pick read dtypes and staging column widths")
+    parser.add_argument('--incremental', action='store_true', help="only upsert apps that are new or changed since the stored scrape")
+    parser.add_argument('--metrics', metavar='PATH', help="write stage timings, rows and peak memory in the Prometheus text format")
+    args = parser.parse_args()
+    if args.incremental and args.workers > 0:
+        parser.error("--incremental runs in a single process; drop --workers")
+
+    apply_profile(args)
+
+    started = time.perf_counter()
+    stages = metrics.Stages()
+    latest = LatestScrape()
+    if args.workers > 0:
+        total_rows, peak = run_parallel(args, stages, latest)
+    else:
+        total_rows, peak = run_sequential(args, stages, latest)
+    if latest.scanned:
+        print(f"   ✓ Dropped {latest.dropped:,} earlier scrapes; kept the latest of {len(latest):,} apps"
+              f" ({latest.nbytes() / len(latest) if len(latest) else 0:.0f} bytes per app)")
+    if args.incremental:
+        print(f"   ✓ Rollups and search index updated for the loaded apps in"
+              f" {stages.seconds.get('rollups', 0) + stages.seconds.get('search', 0):,.1f}s")
+    else:
+        rebuild_rollups(args, stages)
+        rebuild_search(args, stages)
+
+    elapsed = time.perf_counter() - started
+    print("✓ Data imported successfully.")
+    print(f"   {total_rows:,} rows in {elapsed:,.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec), peak memory {format_memory(peak)}")
+    summed = " summed over processes" if args.workers > 0 else ""
+    print(f"   stages{summed}: {stages.summary()}")
+
+    if args.metrics:
+        for stage, seconds in stages.seconds.items():
+            stage_seconds.inc(seconds, stage=stage)
+        imported_rows.inc(total_rows)
+        dropped_duplicates.inc(latest.dropped)
+        if peak is not None:
+            import_peak_memory.set(int(peak * 1024 * 1024))
+        metrics.registry.write(args.metrics)
+
 
-print("   ✓ App imported.")
-print("✓ Data imported successfully.")
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,27 @@
-import pandas as pd
-import pyodbc
+import argparse
+import sqlite3
+
+import migrate
+import rollups
+import search
 
 # تنظیمات اتصال به SQL Server
 server = 'localhost'
 db_name = 'GooglePlayStore'
 
-connection_string = f'DRIVER={{SQL Server}};SERVER={server};Integrated Security=TrueTrusted_Connection=yes;'
-
-conn = pyodbc.connect(connection_string, autocommit=True)
-cursor = conn.cursor()
-
-cursor.execute(f"IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = '{db_name}') CREATE DATABASE {db_name};")
-print("✔ Database created.")
-conn.close()
-
-connection_string = f'DRIVER={{SQL Server}};SERVER={server};DATABASE={db_name};Integrated Security=True;Trusted_Connection=yes;'
-conn = pyodbc.connect(connection_string)
-cursor = conn.cursor()
-
-# cursor.execute("DROP TABLE IF EXISTS AppCategories;")
-# cursor.execute("DROP TABLE IF EXISTS Apps;")
-# cursor.execute("DROP TABLE IF EXISTS Categories;")
-# cursor.execute("DROP TABLE IF EXISTS Developers;")
-
-# ایجاد جداول
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Developers')
-CREATE TABLE Developers (
-    DeveloperID INT IDENTITY(1,1) PRIMARY KEY,
+# SQLite stand-in for SQL Server, used to run the importer and API locally.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Developers (
+    DeveloperID INTEGER PRIMARY KEY AUTOINCREMENT,
     DeveloperName NVARCHAR(255) UNIQUE,
     DeveloperEmail NVARCHAR(255),
     DeveloperWebsite NVARCHAR(500)
 );
-""")
-
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Categories')
-CREATE TABLE Categories (
-    CategoryID INT IDENTITY(1,1) PRIMARY KEY,
+CREATE TABLE IF NOT EXISTS Categories (
+    CategoryID INTEGER PRIMARY KEY AUTOINCREMENT,
     CategoryName NVARCHAR(100) UNIQUE NOT NULL
 );
-""")
-
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Apps') BEGIN
-CREATE TABLE Apps (
+CREATE TABLE IF NOT EXISTS Apps (
     AppID NVARCHAR(255) PRIMARY KEY,
     AppName NVARCHAR(255) NOT NULL,
     Rating FLOAT CHECK (Rating BETWEEN 0 AND 5),
@@ -56,7 +33,7 @@ CREATE TABLE Apps (
     Currency NVARCHAR(10),
     Size NVARCHAR(50),
     MinAndroid NVARCHAR(50),
-    DeveloperID INT,
+    DeveloperID INT REFERENCES Developers(DeveloperID),
     ContentRating NVARCHAR(50),
     PrivacyPolicy NVARCHAR(500),
     Released DATE,
@@ -65,28 +42,135 @@ CREATE TABLE Apps (
     Free BIT,
     AdSupported BIT,
     InAppPurchases BIT,
-    EditorsChoice BIT,
-    FOREIGN KEY (DeveloperID) REFERENCES Developers(DeveloperID),
+    EditorsChoice BIT
 );
-CREATE INDEX idx_rating ON Apps(Rating);
-CREATE INDEX idx_price ON Apps(Price);
-CREATE INDEX idx_content_rating ON Apps(ContentRating);
-CREATE INDEX idx_installs ON Apps(Installs);
-CREATE INDEX idx_last_updated ON Apps(LastUpdated);
-END
-""")
-
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'AppCategories')
-CREATE TABLE AppCategories (
-    AppID NVARCHAR(255),
-    CategoryID INT,
-    PRIMARY KEY (AppID, CategoryID),
-    FOREIGN KEY (CategoryID) REFERENCES Categories(CategoryID),
-    FOREIGN KEY (AppID) REFERENCES Apps(AppID)
+CREATE INDEX IF NOT EXISTS idx_rating ON Apps(Rating);
+CREATE INDEX IF NOT EXISTS idx_price ON Apps(Price);
+CREATE INDEX IF NOT EXISTS idx_content_rating ON Apps(ContentRating);
+CREATE INDEX IF NOT EXISTS idx_installs ON Apps(Installs);
+CREATE INDEX IF NOT EXISTS idx_last_updated ON Apps(LastUpdated);
+CREATE TABLE IF NOT EXISTS AppCategories (
+    AppID NVARCHAR(255) REFERENCES Apps(AppID),
+    CategoryID INT REFERENCES Categories(CategoryID),
+    PRIMARY KEY (AppID, CategoryID)
 );
-""")
+"""
+
+
+def create_sqlite(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    rollups.create_tables(conn.cursor(), 'sqlite')
+    search.create_tables(conn.cursor(), 'sqlite')
+    conn.commit()
+    migrate.migrate(conn, 'sqlite')
+    conn.close()
+    print(f"✔ SQLite database {path} created.")
+
+
+def create_mssql():
+    import pyodbc
+
+    connection_string = f'DRIVER={{SQL Server}};SERVER={server};Integrated Security=TrueTrusted_Connection=yes;'
+
+    conn = pyodbc.connect(connection_string, autocommit=True)
+    cursor = conn.cursor()
+
+    cursor.execute(f"IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = '{db_name}') CREATE DATABASE {db_name};")
+    print("✔ Database created.")
+    conn.close()
+
+    connection_string = f'DRIVER={{SQL Server}};SERVER={server};DATABASE={db_name};Integrated Security=True;Trusted_Connection=yes;'
+    conn = pyodbc.connect(connection_string)
+    cursor = conn.cursor()
+
+    # cursor.execute("DROP TABLE IF EXISTS AppCategories;")
+    # cursor.execute("DROP TABLE IF EXISTS Apps;")
+    # cursor.execute("DROP TABLE IF EXISTS Categories;")
+    # cursor.execute("DROP TABLE IF EXISTS Developers;")
+
+    # ایجاد جداول
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Developers')
+    CREATE TABLE Developers (
+        DeveloperID INT IDENTITY(1,1) PRIMARY KEY,
+        DeveloperName NVARCHAR(255) UNIQUE,
+        DeveloperEmail NVARCHAR(255),
+        DeveloperWebsite NVARCHAR(500)
+    );
+    """)
+
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Categories')
+    CREATE TABLE Categories (
+        CategoryID INT IDENTITY(1,1) PRIMARY KEY,
+        CategoryName NVARCHAR(100) UNIQUE NOT NULL
+    );
+    """)
+
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'Apps') BEGIN
+    CREATE TABLE Apps (
+        AppID NVARCHAR(255) PRIMARY KEY,
+        AppName NVARCHAR(255) NOT NULL,
+        Rating FLOAT CHECK (Rating BETWEEN 0 AND 5),
+        RatingCount BIGINT CHECK (RatingCount >= 0),
+        Installs BIGINT CHECK (Installs >= 0),
+        MinInstalls BIGINT CHECK (MinInstalls >= 0),
+        MaxInstalls BIGINT CHECK (MaxInstalls >= 0),
+        Price DECIMAL(10,2) CHECK (Price >= 0),
+        Currency NVARCHAR(10),
+        Size NVARCHAR(50),
+        MinAndroid NVARCHAR(50),
+        DeveloperID INT,
+        ContentRating NVARCHAR(50),
+        PrivacyPolicy NVARCHAR(500),
+        Released DATE,
+        LastUpdated DATE,
+        ScrapedTime DATETIME,
+        Free BIT,
+        AdSupported BIT,
+        InAppPurchases BIT,
+        EditorsChoice BIT,
+        FOREIGN KEY (DeveloperID) REFERENCES Developers(DeveloperID),
+    );
+    CREATE INDEX idx_rating ON Apps(Rating);
+    CREATE INDEX idx_price ON Apps(Price);
+    CREATE INDEX idx_content_rating ON Apps(ContentRating);
+    CREATE INDEX idx_installs ON Apps(Installs);
+    CREATE INDEX idx_last_updated ON Apps(LastUpdated);
+    END
+    """)
+
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'AppCategories')
+    CREATE TABLE AppCategories (
+        AppID NVARCHAR(255),
+        CategoryID INT,
+        PRIMARY KEY (AppID, CategoryID),
+        FOREIGN KEY (CategoryID) REFERENCES Categories(CategoryID),
+        FOREIGN KEY (AppID) REFERENCES Apps(AppID)
+    );
+    """)
+
+    rollups.create_tables(cursor, 'mssql')
+    search.create_tables(cursor, 'mssql')
+
+    conn.commit()
+    migrate.migrate(conn, 'mssql')
+    print("✔ Tables and indexes were created successfully.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the Google Play Store database.")
+    parser.add_argument('--sqlite', metavar='PATH', help="create a local SQLite stand-in instead of the SQL Server database")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        create_sqlite(args.sqlite)
+    else:
+        create_mssql()
 
 
-conn.commit()
-print("✔ Tables and indexes were created successfully.")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://127.0.0.1:8000"
+ENDPOINTS = [
+    "/apps/?page_size=10",
+    "/apps/?page_size=100&rating=4",
+    "/apps/?page_size=10&category_id=1",
+    "/categores/",
+    "/apps/search?q=ga",
+]
+
+_local = threading.local()
+
+
+def session():
+    # one pooled keep-alive connection per client thread
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.trust_env = False
+    return _local.session
+
+
+def timed_request(method, url, body=None):
+    # the whole body is read, so streamed responses are timed to their last byte
+    started = time.perf_counter()
+    try:
+        ok = session().request(method, url, json=body, timeout=60).status_code < 400
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def timed_get(url):
+    return timed_request("GET", url)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else None,
+    }
+
+
+def run(base_url, endpoints, concurrency, total):
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for endpoint in endpoints:
+            url = base_url + endpoint
+            started = time.perf_counter()
+            outcomes = list(pool.map(timed_get, [url] * total))
+            elapsed = time.perf_counter() - started
+            latencies = [latency for latency, ok in outcomes if ok]
+            results[endpoint] = summarize(latencies, sum(1 for _, ok in outcomes if not ok), elapsed)
+    return results
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            session().get(base_url + "/categores/", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"API at {base_url} did not come up within {timeout}s")
+
+
+def serve(sqlite_path, workers, port):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath(sqlite_path)}")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the API endpoints.")
+    parser.add_argument("--url", default=BASE_URL, help="base URL of a running API")
+    parser.add_argument("--serve", metavar="SQLITE_PATH", help="start the API against this SQLite stand-in first")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes when using --serve")
+    parser.add_argument("--port", type=int, default=8765, help="port used with --serve")
+    parser.add_argument("--endpoint", action="append", help="path to hit (repeatable); defaults to the dashboard's hot reads")
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if args.serve:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = serve(args.serve, args.server_workers, args.port)
+    try:
+        wait_until_up(base_url)
+        endpoints = args.endpoint or ENDPOINTS
+        results = run(base_url, endpoints, args.concurrency, args.requests)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"{'endpoint':<40}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for endpoint, result in results.items():
+        print(f"{endpoint:<40}{result['requests_per_sec']:>10,.0f}{result['p50_ms'] or 0:>10.1f}"
+              f"{result['p95_ms'] or 0:>10.1f}{result['p99_ms'] or 0:>10.1f}{result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "server_workers": args.server_workers, "endpoints": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
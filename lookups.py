@@ -0,0 +1,114 @@
+import re
+
+# Compact storage for the low-cardinality text columns of Apps. Each one is stored as a small
+# integer key into a lookup table holding every distinct value once, so an Apps row carries a
+# few bytes instead of repeated NVARCHAR strings and filters compare integers. Size and
+# MinAndroid are also parsed into numbers (SizeBytes, MinApiLevel) kept on Apps for range filters.
+LOOKUPS = {
+    # Apps text column: (lookup table, key column, key type, text width, number parsed from the text)
+    'Currency': ('Currencies', 'CurrencyID', 'SMALLINT', 10, None),
+    'Size': ('Sizes', 'SizeID', 'INT', 50, 'SizeBytes'),
+    'MinAndroid': ('AndroidVersions', 'MinAndroidID', 'SMALLINT', 50, 'MinApiLevel'),
+    'ContentRating': ('ContentRatings', 'ContentRatingID', 'SMALLINT', 50, None),
+    'PrivacyPolicy': ('PrivacyPolicies', 'PrivacyPolicyID', 'INT', 500, None),
+}
+
+SIZE_UNITS = {'k': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+# first Android release of each API level
+API_LEVELS = [
+    ((1, 0), 1), ((1, 1), 2), ((1, 5), 3), ((1, 6), 4), ((2, 0), 5), ((2, 0, 1), 6), ((2, 1), 7),
+    ((2, 2), 8), ((2, 3), 9), ((2, 3, 3), 10), ((3, 0), 11), ((3, 1), 12), ((3, 2), 13), ((4, 0), 14),
+    ((4, 0, 3), 15), ((4, 1), 16), ((4, 2), 17), ((4, 3), 18), ((4, 4), 19), ((5, 0), 21), ((5, 1), 22),
+    ((6, 0), 23), ((7, 0), 24), ((7, 1), 25), ((8, 0), 26), ((8, 1), 27), ((9,), 28), ((10,), 29),
+    ((11,), 30), ((12,), 31), ((13,), 33), ((14,), 34),
+]
+
+
+def size_bytes(size):
+    """'10M' -> 10485760, '1,018k' -> 1042432; None for 'Varies with device'."""
+    match = re.fullmatch(r'([\d.,]+)\s*([kMG])', (size or '').strip())
+    if not match:
+        return None
+    return int(float(match.group(1).replace(',', '')) * SIZE_UNITS[match.group(2)])
+
+
+def api_level(min_android):
+    """'4.1 and up' -> 16, '4.0.3 - 7.1.1' -> 15, '4.4W and up' -> 20; None for 'Varies with device'."""
+    match = re.match(r'\s*(\d+(?:\.\d+)*)(W?)', min_android or '')
+    if not match:
+        return None
+    if match.group(2):
+        return 20  # Android 4.4W, the wearables release
+    version = tuple(int(part) for part in match.group(1).split('.'))
+    levels = [level for release, level in API_LEVELS if release <= version]
+    return levels[-1] if levels else None
+
+
+PARSERS = {'SizeBytes': size_bytes, 'MinApiLevel': api_level}
+NUMBER_TYPES = {'SizeBytes': 'BIGINT', 'MinApiLevel': 'SMALLINT'}
+
+
+def parse(column, value):
+    """The number stored next to the key of ``value`` in Apps, or None for columns without one."""
+    number = LOOKUPS[column][4]
+    return PARSERS[number](value) if number else None
+
+
+def create_tables(cursor, dialect):
+    for column, (table, key, key_type, width, number) in LOOKUPS.items():
+        extra = f", {number} {NUMBER_TYPES[number]}" if number else ""
+        if dialect == 'mssql':
+            cursor.execute(f"""
+                IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table}')
+                CREATE TABLE {table} ({key} {key_type} IDENTITY(1,1) PRIMARY KEY, {column} NVARCHAR({width}) NOT NULL{extra})""")
+            cursor.execute(f"""
+                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_{table.lower()}_value')
+                CREATE UNIQUE INDEX idx_{table.lower()}_value ON {table}({column})""")
+        else:
+            # INTEGER PRIMARY KEY is SQLite's rowid alias, stored in as few bytes as the value needs
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({key} INTEGER PRIMARY KEY, {column} NVARCHAR({width}) NOT NULL{extra})")
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table.lower()}_value ON {table}({column})")
+
+
+def _fill_numbers(cursor, table, key, column, number):
+    # parsed once per distinct value in Python, instead of per row in SQL
+    cursor.execute(f"SELECT {key}, {column} FROM {table}")
+    rows = [(PARSERS[number](value), entry) for entry, value in cursor.fetchall()]
+    if rows:
+        cursor.executemany(f"UPDATE {table} SET {number} = ? WHERE {key} = ?", rows)
+
+
+def encode_apps(cursor, dialect):
+    """Move the text columns of a populated Apps table into the lookup tables (schema version 4)."""
+    create_tables(cursor, dialect)
+    for column, (table, key, key_type, width, number) in LOOKUPS.items():
+        cursor.execute(f"""
+            INSERT INTO {table} ({column})
+            SELECT DISTINCT a.{column} FROM Apps a
+            WHERE a.{column} IS NOT NULL AND a.{column} <> ''
+              AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{column} = a.{column})""")
+        if number:
+            _fill_numbers(cursor, table, key, column, number)
+        foreign_key = f"CONSTRAINT fk_apps_{key.lower()} " if dialect == 'mssql' else ""
+        cursor.execute(f"ALTER TABLE Apps ADD {key} {key_type} {foreign_key}REFERENCES {table}({key})")
+        if number:
+            cursor.execute(f"ALTER TABLE Apps ADD {number} {NUMBER_TYPES[number]}")
+        copied = f"{key} = t.{key}" + (f", {number} = t.{number}" if number else "")
+        cursor.execute(f"UPDATE Apps SET {copied} FROM {table} t WHERE t.{column} = Apps.{column}")
+        cursor.execute(f"ALTER TABLE Apps DROP COLUMN {column}")
+    if dialect == 'mssql':
+        # dropped columns keep their space in every row until the table is rebuilt
+        cursor.execute("ALTER TABLE Apps REBUILD")
+
+
+def decode_apps(cursor, dialect):
+    """Undo encode_apps: put the text back on Apps and drop the keys and lookup tables."""
+    for column, (table, key, _, width, number) in LOOKUPS.items():
+        cursor.execute(f"ALTER TABLE Apps ADD {column} NVARCHAR({width})")
+        cursor.execute(f"UPDATE Apps SET {column} = t.{column} FROM {table} t WHERE t.{key} = Apps.{key}")
+        if dialect == 'mssql':
+            cursor.execute(f"ALTER TABLE Apps DROP CONSTRAINT fk_apps_{key.lower()}")
+        cursor.execute(f"ALTER TABLE Apps DROP COLUMN {key}")
+        if number:
+            cursor.execute(f"ALTER TABLE Apps DROP COLUMN {number}")
+        cursor.execute(f"DROP TABLE {table}")
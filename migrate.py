@@ -0,0 +1,278 @@
+import argparse
+import statistics
+import time
+
+import lookups
+import search
+from database import connect
+
+# Versioned schema changes for databases created by initDatabase.py. Each migration records its
+# version in SchemaMigrations once applied, so running this script against a populated database
+# only applies what it is missing; initDatabase.py runs it too, so new databases start current.
+VERSION_TABLE = {
+    'mssql': """
+        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'SchemaMigrations')
+        CREATE TABLE SchemaMigrations (
+            Version INT PRIMARY KEY,
+            Name NVARCHAR(100) NOT NULL,
+            AppliedAt DATETIME NOT NULL DEFAULT GETDATE()
+        )""",
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            Version INT PRIMARY KEY,
+            Name NVARCHAR(100) NOT NULL,
+            AppliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+}
+
+# Released years get one partition each; later years share the last one until it is split
+# (ALTER PARTITION FUNCTION pf_released_year() SPLIT RANGE ('2023-01-01')).
+PARTITION_YEARS = range(2010, 2023)
+
+
+def _index(dialect, name, table, keys, include=(), placement=""):
+    if dialect == 'mssql':
+        included = f" INCLUDE ({', '.join(include)})" if include else ""
+        return (f"IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}') "
+                f"CREATE INDEX {name} ON {table}({', '.join(keys)}){included}{placement}")
+    # SQLite has no INCLUDE; trailing key columns cover the same reads
+    return f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join([*keys, *include])})"
+
+
+def _drop_index(dialect, name, table):
+    if dialect == 'mssql':
+        return f"IF EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}') DROP INDEX {name} ON {table}"
+    return f"DROP INDEX IF EXISTS {name}"
+
+
+def _content_rating_indexes(content_rating):
+    """(name, keys, included columns, SQL Server placement) of every Apps index that holds the content
+    rating, written for the text column or, once it is dictionary-encoded (004), for its key."""
+    return {
+        'idx_content_rating': ([content_rating], [], ""),
+        # every /apps/ page is ORDER BY LastUpdated DESC, AppID DESC; with the key in the index the first
+        # rows come off it already sorted, and the listed and filtered columns are read from the index
+        # pages instead of a row lookup per candidate
+        'idx_apps_listing': (['LastUpdated DESC', 'AppID DESC'], ['AppName', 'Rating', 'Price', content_rating], ""),
+        'idx_apps_content_rating_listing': ([content_rating, 'LastUpdated DESC', 'AppID DESC'], ['AppName', 'Rating', 'Price'], ""),
+        # Apps stays clustered on AppID (the foreign keys point at it); the index the time-based queries
+        # read is partitioned by Released year instead, so a year range only touches its own partitions
+        'idx_apps_released': (['Released'], ['Rating', 'Installs', 'Price', 'Free', content_rating], " ON ps_released_year(Released)"),
+    }
+
+
+def _create(dialect, names, content_rating='ContentRating'):
+    indexes = _content_rating_indexes(content_rating)
+    return [_index(dialect, name, 'Apps', *indexes[name]) for name in names]
+
+
+def _drop(dialect, names):
+    return [_drop_index(dialect, name, 'Apps') for name in names]
+
+
+_boundaries = ", ".join(f"'{year}-01-01'" for year in PARTITION_YEARS)
+LISTING = ['idx_apps_listing', 'idx_apps_content_rating_listing']
+CONTENT_RATING_INDEXES = ['idx_content_rating', *LISTING, 'idx_apps_released']
+
+
+def _category_membership(dialect):
+    # /apps/?category_id= filters on AppID IN (SELECT AppID FROM AppCategories WHERE CategoryID = ?);
+    # the primary key (AppID, CategoryID) can't find one category's apps without a full scan
+    return ([_index(dialect, 'idx_app_categories_category', 'AppCategories', ['CategoryID', 'AppID'])],
+            [_drop_index(dialect, 'idx_app_categories_category', 'AppCategories')])
+
+
+def _listing_order(dialect):
+    # the covering listing indexes replace the single-column idx_last_updated
+    analyze = ["ANALYZE"] if dialect == 'sqlite' else []
+    return ([*_create(dialect, LISTING), _drop_index(dialect, 'idx_last_updated', 'Apps'), *analyze],
+            [_index(dialect, 'idx_last_updated', 'Apps', ['LastUpdated']), *_drop(dialect, LISTING)])
+
+
+def _released_year_partitions(dialect):
+    if dialect != 'mssql':
+        # no partitioning in SQLite: a year range is a seek on the same covering index instead
+        return _create(dialect, ['idx_apps_released']), _drop(dialect, ['idx_apps_released'])
+    return ([f"IF NOT EXISTS (SELECT * FROM sys.partition_functions WHERE name = 'pf_released_year') "
+             f"CREATE PARTITION FUNCTION pf_released_year (DATE) AS RANGE RIGHT FOR VALUES ({_boundaries})",
+             "IF NOT EXISTS (SELECT * FROM sys.partition_schemes WHERE name = 'ps_released_year') "
+             "CREATE PARTITION SCHEME ps_released_year AS PARTITION pf_released_year ALL TO ([PRIMARY])",
+             *_create(dialect, ['idx_apps_released'])],
+            [*_drop(dialect, ['idx_apps_released']),
+             "IF EXISTS (SELECT * FROM sys.partition_schemes WHERE name = 'ps_released_year') DROP PARTITION SCHEME ps_released_year",
+             "IF EXISTS (SELECT * FROM sys.partition_functions WHERE name = 'pf_released_year') DROP PARTITION FUNCTION pf_released_year"])
+
+
+def _compact_storage(dialect):
+    # the indexes on ContentRating move to ContentRatingID around the column being replaced
+    return ([*_drop(dialect, CONTENT_RATING_INDEXES), lookups.encode_apps, *_create(dialect, CONTENT_RATING_INDEXES, 'ContentRatingID')],
+            [*_drop(dialect, CONTENT_RATING_INDEXES), lookups.decode_apps, *_create(dialect, CONTENT_RATING_INDEXES)])
+
+
+def _search_prefixes(dialect):
+    # exact and prefix matches of /apps/search are read from name prefixes in weight order
+    return ([search.create_prefixes],
+            [search.PREFIX_WEIGHT_INDEX[dialect][0], "DROP TABLE SearchPrefixes"])
+
+
+# (version, name, steps): steps(dialect) gives the upgrade and downgrade steps, each a SQL
+# statement or a function called with (cursor, dialect)
+MIGRATIONS = [
+    (1, 'category_membership', _category_membership),
+    (2, 'listing_order', _listing_order),
+    (3, 'released_year_partitions', _released_year_partitions),
+    (4, 'compact_storage', _compact_storage),
+    (5, 'search_prefixes', _search_prefixes),
+]
+LATEST = MIGRATIONS[-1][0]
+
+# The statement shapes the API and the rollup rebuild send, written out as plain SQL.
+# {page} becomes LIMIT or OFFSET ... FETCH for the dialect, and {content_rating} the content
+# rating filter on the text column or, after 004, on its lookup key.
+BENCHMARK_QUERIES = [
+    ('list', "SELECT AppID, AppName, LastUpdated FROM Apps ORDER BY LastUpdated DESC, AppID DESC {page}", ()),
+    ('list_category',
+     "SELECT AppID, AppName, LastUpdated FROM Apps WHERE AppID IN (SELECT AppID FROM AppCategories "
+     "WHERE CategoryID = ?) ORDER BY LastUpdated DESC, AppID DESC {page}", ('category',)),
+    ('count_category',
+     "SELECT COUNT(*) FROM Apps WHERE AppID IN (SELECT AppID FROM AppCategories WHERE CategoryID = ?)", ('category',)),
+    ('list_content_rating',
+     "SELECT AppID, AppName, LastUpdated FROM Apps WHERE {content_rating} AND Rating >= ? "
+     "ORDER BY LastUpdated DESC, AppID DESC {page}", ('content_rating', 'rating')),
+    ('list_rating_price',
+     "SELECT AppID, AppName, LastUpdated FROM Apps WHERE Rating >= ? AND Price <= ? "
+     "ORDER BY LastUpdated DESC, AppID DESC {page}", ('rating', 'price')),
+    ('released_year',
+     "SELECT COUNT(*), AVG(Rating), SUM(Installs) FROM Apps WHERE Released >= ? AND Released < ?",
+     ('year_start', 'year_end')),
+]
+
+
+def _statements(cursor, dialect, statements):
+    for statement in statements:
+        if callable(statement):
+            statement(cursor, dialect)
+        else:
+            cursor.execute(statement)
+
+
+def current_version(cursor, dialect):
+    cursor.execute(VERSION_TABLE[dialect])
+    cursor.execute("SELECT MAX(Version) FROM SchemaMigrations")
+    return cursor.fetchone()[0] or 0
+
+
+def migrate(conn, dialect, target=LATEST):
+    """Apply (or, for a lower ``target``, revert) migrations one version per transaction; returns the versions run."""
+    cursor = conn.cursor()
+    version = current_version(cursor, dialect)
+    conn.commit()
+    done = []
+    for number, name, steps in (MIGRATIONS if target >= version else reversed(MIGRATIONS)):
+        upgrade, downgrade = steps(dialect)
+        if version < number <= target:
+            _statements(cursor, dialect, upgrade)
+            cursor.execute("INSERT INTO SchemaMigrations (Version, Name) VALUES (?, ?)", (number, name))
+        elif target < number <= version:
+            _statements(cursor, dialect, downgrade)
+            cursor.execute("DELETE FROM SchemaMigrations WHERE Version = ?", (number,))
+        else:
+            continue
+        conn.commit()
+        done.append(number)
+        print(f"✔ {'applied' if target >= version else 'reverted'} {number:03d} {name}")
+    return done
+
+
+def _benchmark_params(cursor, compact):
+    # the most populated category and content rating, so the filters are not trivially selective
+    cursor.execute("SELECT CategoryID, COUNT(*) FROM AppCategories GROUP BY CategoryID ORDER BY COUNT(*) DESC")
+    category = (cursor.fetchone() or (1,))[0]
+    if compact:
+        cursor.execute("""
+            SELECT r.ContentRating, COUNT(*) FROM Apps a JOIN ContentRatings r ON r.ContentRatingID = a.ContentRatingID
+            GROUP BY r.ContentRating ORDER BY COUNT(*) DESC""")
+    else:
+        cursor.execute("SELECT ContentRating, COUNT(*) FROM Apps GROUP BY ContentRating ORDER BY COUNT(*) DESC")
+    content_rating = (cursor.fetchone() or ('Everyone',))[0]
+    cursor.execute("SELECT MAX(Released) FROM Apps")
+    year = int(str(cursor.fetchone()[0] or '2020')[:4])
+    return {'category': category, 'content_rating': content_rating, 'rating': 4.0, 'price': 0,
+            'year_start': f"{year}-01-01", 'year_end': f"{year + 1}-01-01"}
+
+
+def _plan(cursor, dialect, sql, params):
+    if dialect == 'sqlite':
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+    cursor.execute("SET SHOWPLAN_TEXT ON")
+    try:
+        cursor.execute(sql, params)
+        plan = []
+        while True:
+            plan.extend(row[0].strip() for row in cursor.fetchall())
+            if not cursor.nextset():
+                break
+    finally:
+        cursor.execute("SET SHOWPLAN_TEXT OFF")
+    return plan
+
+
+def benchmark(conn, dialect, repeat=5):
+    """Query plan and median latency (ms) of each BENCHMARK_QUERIES shape on the schema as it is now."""
+    cursor = conn.cursor()
+    compact = current_version(cursor, dialect) >= 4
+    values = _benchmark_params(cursor, compact)
+    page = "LIMIT 10" if dialect == 'sqlite' else "OFFSET 0 ROWS FETCH NEXT 10 ROWS ONLY"
+    # the API resolves the key in process; the uncorrelated subquery stands in for that here
+    content_rating = ("ContentRatingID = (SELECT ContentRatingID FROM ContentRatings WHERE ContentRating = ?)"
+                      if compact else "ContentRating = ?")
+    results = {}
+    for name, sql, names in BENCHMARK_QUERIES:
+        sql = sql.format(page=page, content_rating=content_rating)
+        params = tuple(values[key] for key in names)
+        plan = _plan(cursor, dialect, sql, params)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {'plan': plan, 'ms': statistics.median(timings)}
+    return results
+
+
+def print_comparison(before, after):
+    print(f"\n{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        old, new = before[name]['ms'], after[name]['ms']
+        print(f"{name:<22}{old:>12.2f}{new:>12.2f}{old / max(new, 1e-6):>9.1f}x")
+    for name in before:
+        print(f"\n{name}\n  before: " + "\n          ".join(before[name]['plan'])
+              + "\n  after:  " + "\n          ".join(after[name]['plan']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations to an existing database.")
+    parser.add_argument('--sqlite', metavar='PATH', help="migrate a local SQLite stand-in instead of SQL Server")
+    parser.add_argument('--target', type=int, default=LATEST, help="version to migrate up or down to (default: latest)")
+    parser.add_argument('--benchmark', action='store_true', help="compare query plans and timings before and after migrating")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per query when benchmarking")
+    args = parser.parse_args()
+
+    conn, dialect = connect(args.sqlite)
+    try:
+        version = current_version(conn.cursor(), dialect)
+        conn.commit()
+        print(f"schema version {version}, target {args.target}")
+        before = benchmark(conn, dialect, args.repeat) if args.benchmark else None
+        if not migrate(conn, dialect, args.target):
+            print("nothing to do")
+        if args.benchmark:
+            print_comparison(before, benchmark(conn, dialect, args.repeat))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
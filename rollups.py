@@ -0,0 +1,184 @@
+import math
+from collections import defaultdict
+from types import SimpleNamespace
+
+# Precomputed app counts behind the /stats/ endpoints. Every app is counted once under
+# CategoryID 0 ("all categories") and once under each of its own categories, so a chart
+# over the whole store or over one category is a scan of a few hundred rollup rows.
+INSTALL_THRESHOLDS = [10 ** power for power in range(11)]  # 1, 10, ..., 10B
+
+ROLLUP_TABLES = {
+    'RatingRollup': ['RatingBucket'],
+    'InstallsRollup': ['InstallsBucket'],
+    'PricingRollup': ['Free', 'AdSupported'],
+}
+DIMENSIONS = ['CategoryID', 'ContentRating', 'ReleasedYear']
+# the App attributes the rollups are computed from
+APP_FIELDS = ['ContentRating', 'Released', 'Rating', 'Installs', 'Free', 'AdSupported', 'Price']
+
+MSSQL_SCHEMA = """
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'RatingRollup')
+CREATE TABLE RatingRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    RatingBucket INT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, RatingBucket)
+);
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'InstallsRollup')
+CREATE TABLE InstallsRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    InstallsBucket INT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, InstallsBucket)
+);
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'PricingRollup')
+CREATE TABLE PricingRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    Free BIT NOT NULL,
+    AdSupported BIT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PriceSum DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, Free, AdSupported)
+);
+"""
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS RatingRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    RatingBucket INT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, RatingBucket)
+);
+CREATE TABLE IF NOT EXISTS InstallsRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    InstallsBucket INT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, InstallsBucket)
+);
+CREATE TABLE IF NOT EXISTS PricingRollup (
+    CategoryID INT NOT NULL,
+    ContentRating NVARCHAR(50) NOT NULL,
+    ReleasedYear INT NOT NULL,
+    Free BIT NOT NULL,
+    AdSupported BIT NOT NULL,
+    AppCount BIGINT NOT NULL,
+    PriceSum DECIMAL(18,2) NOT NULL,
+    PRIMARY KEY (CategoryID, ContentRating, ReleasedYear, Free, AdSupported)
+);
+"""
+
+
+def rating_bucket(rating):
+    # half-star buckets: 0 -> [0, 0.5), ..., 10 -> exactly 5
+    return int((rating or 0) * 2)
+
+
+def installs_bucket(installs):
+    # 0 for no installs, then one bucket per power of ten: 1 -> 1+, 2 -> 10+, ...
+    installs = installs or 0
+    return 0 if installs < 1 else min(int(math.log10(installs)) + 1, len(INSTALL_THRESHOLDS))
+
+
+def installs_label(bucket):
+    return "0" if bucket == 0 else f"{INSTALL_THRESHOLDS[bucket - 1]:,}+"
+
+
+def _installs_bucket_sql():
+    cases = " ".join(f"WHEN a.Installs < {threshold} THEN {bucket}" for bucket, threshold in enumerate(INSTALL_THRESHOLDS))
+    return f"CASE WHEN a.Installs IS NULL THEN 0 {cases} ELSE {len(INSTALL_THRESHOLDS)} END"
+
+
+def _year_sql(dialect):
+    year = "YEAR(a.Released)" if dialect == 'mssql' else "CAST(strftime('%Y', a.Released) AS INTEGER)"
+    return f"COALESCE({year}, 0)"
+
+
+def _facts_sql(dialect):
+    """One row per (app, rollup category): the app itself under 0 plus one row per AppCategories link."""
+    columns = f"""a.AppID, COALESCE(r.ContentRating, '') AS ContentRating, {_year_sql(dialect)} AS ReleasedYear,
+        CAST(COALESCE(a.Rating, 0) * 2 AS INT) AS RatingBucket, {_installs_bucket_sql()} AS InstallsBucket,
+        COALESCE(a.Free, 0) AS Free, COALESCE(a.AdSupported, 0) AS AdSupported, COALESCE(a.Price, 0) AS Price"""
+    # rollup rows keep the content rating as text; Apps only holds its lookup key
+    apps = "Apps a LEFT JOIN ContentRatings r ON r.ContentRatingID = a.ContentRatingID"
+    return f"""
+        SELECT 0 AS CategoryID, {columns} FROM {apps}
+        UNION ALL
+        SELECT ac.CategoryID, {columns} FROM {apps} JOIN AppCategories ac ON ac.AppID = a.AppID"""
+
+
+def create_tables(cursor, dialect):
+    if dialect == 'mssql':
+        cursor.execute(MSSQL_SCHEMA)
+    else:
+        for statement in SQLITE_SCHEMA.split(";"):
+            if statement.strip():
+                cursor.execute(statement)
+
+
+def rebuild(cursor, dialect):
+    """Recompute every rollup from Apps and AppCategories with one set-based GROUP BY per table."""
+    facts = _facts_sql(dialect)
+    for table, keys in ROLLUP_TABLES.items():
+        group = ", ".join(DIMENSIONS + keys)
+        measures = "COUNT(*), SUM(Price)" if table == 'PricingRollup' else "COUNT(*)"
+        target = group + (", AppCount, PriceSum" if table == 'PricingRollup' else ", AppCount")
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({target}) SELECT {group}, {measures} FROM ({facts}) f GROUP BY {group}")
+
+
+def _bump(execute, table, key, count, price=None):
+    names = list(key)
+    where = " AND ".join(f"{name} = ?" for name in names)
+    if price is None:
+        updated = execute(f"UPDATE {table} SET AppCount = AppCount + ? WHERE {where}", (count, *key.values()))
+    else:
+        updated = execute(f"UPDATE {table} SET AppCount = AppCount + ?, PriceSum = PriceSum + ? WHERE {where}",
+                          (count, price, *key.values()))
+    if updated == 0 and count > 0:
+        columns = names + ["AppCount"] + (["PriceSum"] if price is not None else [])
+        values = (*key.values(), count) + ((price,) if price is not None else ())
+        execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", values)
+
+
+def snapshot(app):
+    """The rollup-relevant attributes of ``app`` as they are now, to remove it again after it was changed."""
+    return SimpleNamespace(**{field: getattr(app, field) for field in APP_FIELDS})
+
+
+def apply_apps(execute, changes):
+    """Add (``sign=1``) or remove (``sign=-1``) apps from every rollup, for ``(app, category_ids, sign)`` changes.
+
+    Deltas are summed per rollup row first, so a batch costs one statement per rollup row it
+    touches and an update given as (old, -1) plus (new, +1) only touches rows that changed.
+    ``execute(sql, params)`` runs a qmark-style statement and returns its rowcount."""
+    deltas = defaultdict(lambda: [0, 0.0])
+    for app, category_ids, sign in changes:
+        year = app.Released.year if app.Released else 0
+        price = float(app.Price or 0)
+        for category_id in [0, *category_ids]:
+            base = (category_id, app.ContentRating or '', year)
+            deltas['RatingRollup', base + (rating_bucket(app.Rating),)][0] += sign
+            deltas['InstallsRollup', base + (installs_bucket(app.Installs),)][0] += sign
+            pricing = deltas['PricingRollup', base + (int(bool(app.Free)), int(bool(app.AdSupported)))]
+            pricing[0] += sign
+            pricing[1] += sign * price
+    for (table, key), (count, price) in deltas.items():
+        if count == 0 and price == 0:
+            continue
+        key = dict(zip(DIMENSIONS + ROLLUP_TABLES[table], key))
+        _bump(execute, table, key, count, price if table == 'PricingRollup' else None)
+
+
+def apply_app(execute, app, category_ids, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) one app from every rollup."""
+    apply_apps(execute, [(app, category_ids, sign)])
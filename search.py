@@ -0,0 +1,291 @@
+import re
+from collections import Counter
+
+# Trigram index behind /apps/search. Every word of an indexed name is padded as "  word " and
+# cut into trigrams, so "  a" and " an" mark word starts and "ry " a word end; a query only
+# has to look up the postings of its own few trigrams instead of scanning every name.
+# Exact and prefix matches, which rank first, come from a second index of name prefixes
+# (SearchPrefixes), read in weight order like the trigram postings.
+KINDS = {
+    # kind: (code, table, key column, name column)
+    'apps': ('A', 'Apps', 'AppID', 'AppName'),
+    'categories': ('C', 'Categories', 'CategoryID', 'CategoryName'),
+    'developers': ('D', 'Developers', 'DeveloperID', 'DeveloperName'),
+}
+
+MSSQL_SCHEMA = """
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'SearchGrams') BEGIN
+CREATE TABLE SearchGrams (
+    Kind CHAR(1) NOT NULL,
+    Gram NVARCHAR(3) NOT NULL,
+    EntityID NVARCHAR(255) NOT NULL,
+    Weight BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Gram, EntityID)
+);
+CREATE INDEX idx_search_weight ON SearchGrams(Kind, Gram, Weight DESC);
+END
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'SearchGramCounts')
+CREATE TABLE SearchGramCounts (
+    Kind CHAR(1) NOT NULL,
+    Gram NVARCHAR(3) NOT NULL,
+    Entries BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Gram)
+);
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'SearchPrefixes') BEGIN
+CREATE TABLE SearchPrefixes (
+    Kind CHAR(1) NOT NULL,
+    Prefix NVARCHAR(260) NOT NULL,
+    EntityID NVARCHAR(255) NOT NULL,
+    Weight BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Prefix, EntityID)
+);
+CREATE INDEX idx_search_prefix_weight ON SearchPrefixes(Kind, Prefix, Weight DESC, EntityID);
+END
+"""
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SearchGrams (
+    Kind CHAR(1) NOT NULL,
+    Gram NVARCHAR(3) NOT NULL,
+    EntityID NVARCHAR(255) NOT NULL,
+    Weight BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Gram, EntityID)
+);
+CREATE INDEX IF NOT EXISTS idx_search_weight ON SearchGrams(Kind, Gram, Weight DESC, EntityID);
+CREATE TABLE IF NOT EXISTS SearchGramCounts (
+    Kind CHAR(1) NOT NULL,
+    Gram NVARCHAR(3) NOT NULL,
+    Entries BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Gram)
+);
+CREATE TABLE IF NOT EXISTS SearchPrefixes (
+    Kind CHAR(1) NOT NULL,
+    Prefix NVARCHAR(260) NOT NULL,
+    EntityID NVARCHAR(255) NOT NULL,
+    Weight BIGINT NOT NULL,
+    PRIMARY KEY (Kind, Prefix, EntityID)
+);
+CREATE INDEX IF NOT EXISTS idx_search_prefix_weight ON SearchPrefixes(Kind, Prefix, Weight DESC, EntityID);
+"""
+
+# Names are indexed under each of their first PREFIX_LENGTH prefixes, and under the whole name
+# followed by END, which normalize() never leaves in a name, for exact matches of any length
+PREFIX_LENGTH = 10
+END = "$"
+
+
+# postings in weight order per trigram and per prefix; dropped while the index is rebuilt and created again afterwards
+WEIGHT_INDEX = {
+    'mssql': ("DROP INDEX idx_search_weight ON SearchGrams", "CREATE INDEX idx_search_weight ON SearchGrams(Kind, Gram, Weight DESC)"),
+    'sqlite': ("DROP INDEX IF EXISTS idx_search_weight", "CREATE INDEX idx_search_weight ON SearchGrams(Kind, Gram, Weight DESC, EntityID)"),
+}
+PREFIX_WEIGHT_INDEX = {
+    'mssql': ("DROP INDEX idx_search_prefix_weight ON SearchPrefixes",
+              "CREATE INDEX idx_search_prefix_weight ON SearchPrefixes(Kind, Prefix, Weight DESC, EntityID)"),
+    'sqlite': ("DROP INDEX IF EXISTS idx_search_prefix_weight",
+               "CREATE INDEX idx_search_prefix_weight ON SearchPrefixes(Kind, Prefix, Weight DESC, EntityID)"),
+}
+
+
+def normalize(name):
+    # case-insensitive, and punctuation only separates words
+    return " ".join(re.sub(r"[\W_]+", " ", (name or "").casefold()).split())
+
+
+def trigrams(padded):
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_grams(name):
+    grams = set()
+    for word in normalize(name).split():
+        grams |= trigrams(f"  {word} ")
+    return grams
+
+
+def name_prefixes(name):
+    """The keys a name is found under in SearchPrefixes."""
+    name = normalize(name)
+    if not name:
+        return set()
+    return {name[:length] for length in range(1, min(len(name), PREFIX_LENGTH) + 1)} | {name + END}
+
+
+def query_grams(query, anchored=False):
+    """Trigrams every match must contain.
+
+    Words the user has already finished are anchored at the word boundaries the query shows;
+    the first word may start mid-word, unless ``anchored`` asks for word-prefix matches only,
+    and the last one is still being typed, so both stay open.
+    A lone one- or two-letter query becomes a word-prefix search."""
+    words = normalize(query).split()
+    grams = set()
+    for number, word in enumerate(words):
+        padded = ("  " if number or anchored else "") + word + (" " if number < len(words) - 1 else "")
+        if len(padded) < 3:
+            padded = "  " + padded
+        grams |= trigrams(padded)
+    return grams
+
+
+def score(query, name):
+    """How well ``name`` matches: 3 exact, 2 prefix, 1 word prefix, 0 substring, None no match."""
+    query, name = normalize(query), normalize(name)
+    if not query or query not in name:
+        return None
+    if name == query:
+        return 3
+    if name.startswith(query):
+        return 2
+    return 1 if f" {query}" in f" {name}" else 0
+
+
+def create_tables(cursor, dialect):
+    if dialect == 'mssql':
+        cursor.execute(MSSQL_SCHEMA)
+    else:
+        for statement in SQLITE_SCHEMA.split(";"):
+            if statement.strip():
+                cursor.execute(statement)
+
+
+def _weights(cursor, kind):
+    # apps rank by installs; categories and developers by how many apps they have
+    if kind == 'categories':
+        cursor.execute("SELECT CategoryID, COUNT(*) FROM AppCategories GROUP BY CategoryID")
+    elif kind == 'developers':
+        cursor.execute("SELECT DeveloperID, COUNT(*) FROM Apps WHERE DeveloperID IS NOT NULL GROUP BY DeveloperID")
+    else:
+        return None
+    return dict(cursor.fetchall())
+
+
+def _pages(cursor, dialect, kind, size):
+    # keyset pages, each fetched completely before the next statement runs on the connection
+    _, table, key, name = KINDS[kind]
+    weight = "COALESCE(Installs, 0)" if kind == 'apps' else "0"
+    top, limit = (f"TOP {size} ", "") if dialect == 'mssql' else ("", f" LIMIT {size}")
+    last = None
+    while True:
+        where = f" WHERE {key} > ?" if last is not None else ""
+        cursor.execute(f"SELECT {top}{key}, {name}, {weight} FROM {table}{where} ORDER BY {key}{limit}",
+                       (last,) if last is not None else ())
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def rebuild(conn, dialect, batch_size=10_000):
+    """Re-index every app, category and developer name.
+
+    Postings and prefixes go to unindexed staging tables first and are then moved in primary-key
+    order, with the weight indexes built once at the end, instead of updating B-trees at random."""
+    cursor = conn.cursor()
+    if dialect == 'mssql':
+        cursor.fast_executemany = True
+    staging, prefix_staging = (("#SearchGramsStaging", "#SearchPrefixesStaging") if dialect == 'mssql'
+                               else ("temp.SearchGramsStaging", "temp.SearchPrefixesStaging"))
+    cursor.execute(f"CREATE TABLE {staging} (Kind CHAR(1), Gram NVARCHAR(3), EntityID NVARCHAR(255), Weight BIGINT)")
+    cursor.execute(f"CREATE TABLE {prefix_staging} (Kind CHAR(1), Prefix NVARCHAR(260), EntityID NVARCHAR(255), Weight BIGINT)")
+    for kind, (code, _, _, _) in KINDS.items():
+        weights = _weights(cursor, kind)
+        for rows in _pages(cursor, dialect, kind, batch_size):
+            postings, prefixes = [], []
+            for entity_id, name, weight in rows:
+                weight = weights.get(entity_id, 0) if weights is not None else weight
+                postings.extend((code, gram, str(entity_id), weight) for gram in name_grams(name))
+                prefixes.extend((code, prefix, str(entity_id), weight) for prefix in name_prefixes(name))
+            if postings:
+                cursor.executemany(f"INSERT INTO {staging} (Kind, Gram, EntityID, Weight) VALUES (?, ?, ?, ?)", postings)
+            if prefixes:
+                cursor.executemany(f"INSERT INTO {prefix_staging} (Kind, Prefix, EntityID, Weight) VALUES (?, ?, ?, ?)", prefixes)
+
+    for (drop_index, create_index), table, key, source in ((WEIGHT_INDEX[dialect], 'SearchGrams', 'Gram', staging),
+                                                           (PREFIX_WEIGHT_INDEX[dialect], 'SearchPrefixes', 'Prefix', prefix_staging)):
+        cursor.execute(drop_index)
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"""
+            INSERT INTO {table} (Kind, {key}, EntityID, Weight)
+            SELECT Kind, {key}, EntityID, Weight FROM {source}
+            ORDER BY Kind, {key}, EntityID""")
+        cursor.execute(create_index)
+    cursor.execute("DELETE FROM SearchGramCounts")
+    cursor.execute(f"INSERT INTO SearchGramCounts (Kind, Gram, Entries) SELECT Kind, Gram, COUNT(*) FROM {staging} GROUP BY Kind, Gram")
+    cursor.execute(f"DROP TABLE {staging}")
+    cursor.execute(f"DROP TABLE {prefix_staging}")
+
+
+def create_prefixes(cursor, dialect, batch_size=10_000):
+    """Add and fill SearchPrefixes in a database whose trigram index predates it (migrate.py)."""
+    create_tables(cursor, dialect)
+    for kind, (code, _, _, _) in KINDS.items():
+        weights = _weights(cursor, kind)
+        for rows in _pages(cursor, dialect, kind, batch_size):
+            prefixes = [(code, prefix, str(entity_id), weights.get(entity_id, 0) if weights is not None else weight)
+                        for entity_id, name, weight in rows for prefix in name_prefixes(name)]
+            if prefixes:
+                cursor.executemany("INSERT INTO SearchPrefixes (Kind, Prefix, EntityID, Weight) VALUES (?, ?, ?, ?)", prefixes)
+
+
+def _count(executemany, code, deltas):
+    added = [(code, gram, code, gram) for gram, delta in deltas.items() if delta > 0]
+    if added:
+        executemany("""
+            INSERT INTO SearchGramCounts (Kind, Gram, Entries)
+            SELECT ?, ?, 0 WHERE NOT EXISTS (SELECT 1 FROM SearchGramCounts WHERE Kind = ? AND Gram = ?)""", added)
+    changed = [(delta, code, gram) for gram, delta in deltas.items() if delta]
+    if changed:
+        executemany("UPDATE SearchGramCounts SET Entries = Entries + ? WHERE Kind = ? AND Gram = ?", changed)
+
+
+def index(executemany, kind, entries):
+    """Add ``(entity_id, name, weight)`` entries to the index.
+
+    ``executemany(sql, rows)`` runs a qmark-style statement once per row, in one round trip
+    where the driver supports it; trigram counts are summed first and written once per trigram."""
+    code = KINDS[kind][0]
+    postings = [(code, gram, str(entity_id), weight or 0) for entity_id, name, weight in entries for gram in name_grams(name)]
+    if postings:
+        executemany("INSERT INTO SearchGrams (Kind, Gram, EntityID, Weight) VALUES (?, ?, ?, ?)", postings)
+    _count(executemany, code, Counter(gram for _, gram, _, _ in postings))
+    prefixes = [(code, prefix, str(entity_id), weight or 0) for entity_id, name, weight in entries for prefix in name_prefixes(name)]
+    if prefixes:
+        executemany("INSERT INTO SearchPrefixes (Kind, Prefix, EntityID, Weight) VALUES (?, ?, ?, ?)", prefixes)
+
+
+def reweight(executemany, kind, entries):
+    """Add ``(entity_id, name, delta)`` to the weights of indexed entries, with the name they were indexed under."""
+    code = KINDS[kind][0]
+    postings = [(delta, code, gram, str(entity_id)) for entity_id, name, delta in entries if delta for gram in name_grams(name)]
+    if postings:
+        executemany("UPDATE SearchGrams SET Weight = Weight + ? WHERE Kind = ? AND Gram = ? AND EntityID = ?", postings)
+    prefixes = [(delta, code, prefix, str(entity_id)) for entity_id, name, delta in entries if delta for prefix in name_prefixes(name)]
+    if prefixes:
+        executemany("UPDATE SearchPrefixes SET Weight = Weight + ? WHERE Kind = ? AND Prefix = ? AND EntityID = ?", prefixes)
+
+
+def weight_deltas(changes):
+    """{kind: {entity_id: delta}} of the category and developer weights (their app counts, as in
+    rebuild) for ``(developer_id, category_ids, sign)`` apps added (1) or removed (-1)."""
+    deltas = {'categories': Counter(), 'developers': Counter()}
+    for developer_id, category_ids, sign in changes:
+        if developer_id is not None:
+            deltas['developers'][developer_id] += sign
+        for category_id in category_ids:
+            deltas['categories'][category_id] += sign
+    return {kind: {entity_id: delta for entity_id, delta in counts.items() if delta} for kind, counts in deltas.items()}
+
+
+def unindex(executemany, kind, entries):
+    """Remove ``(entity_id, name)`` entries, with the name they were indexed under."""
+    # one primary-key delete per trigram of the name; there is no index on EntityID alone
+    code = KINDS[kind][0]
+    postings = [(code, gram, str(entity_id)) for entity_id, name in entries for gram in name_grams(name)]
+    if postings:
+        executemany("DELETE FROM SearchGrams WHERE Kind = ? AND Gram = ? AND EntityID = ?", postings)
+    _count(executemany, code, {gram: -count for gram, count in Counter(gram for _, gram, _ in postings).items()})
+    prefixes = [(code, prefix, str(entity_id)) for entity_id, name in entries for prefix in name_prefixes(name)]
+    if prefixes:
+        executemany("DELETE FROM SearchPrefixes WHERE Kind = ? AND Prefix = ? AND EntityID = ?", prefixes)
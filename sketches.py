@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Fixed-size summaries used by the streaming profiler (details.py). Each one is updated a
+# whole chunk at a time with vectorized numpy/pandas operations, and its memory does not
+# grow with the number of rows seen.
+
+
+def hash_values(values):
+    """64-bit hashes of a Series' values, stable across chunks and runs."""
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+class HyperLogLog:
+    """Approximate distinct count; ``2 ** precision`` one-byte registers, ~1.04 / sqrt(2 ** precision) error."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        if not len(hashes):
+            return
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.int64)
+        # the remaining bits fit a float64 mantissa exactly, so frexp gives their bit length
+        rest = (hashes & np.uint64((1 << bits) - 1)).astype(np.float64)
+        rank = (bits + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # linear counting is more accurate while many registers are still empty
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+class TopK:
+    """Misra-Gries heavy hitters: keeps ``capacity`` counters and undercounts any value by at most ``error``."""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.error = 0
+
+    def update(self, values):
+        counts = values.value_counts()
+        if not len(counts):
+            return
+        self.counts = self.counts.add(counts, fill_value=0).astype('int64')
+        if len(self.counts) > self.capacity:
+            # subtract the (capacity + 1)-th largest count from every counter and drop those left at zero
+            cut = int(self.counts.nlargest(self.capacity + 1).iloc[-1])
+            self.counts = self.counts[self.counts > cut] - cut
+            self.error += cut
+
+    def top(self, k=10):
+        return [(value, int(count)) for value, count in self.counts.nlargest(k).items()]
+
+
+class QuantileSketch:
+    """Compacting quantile sketch (KLL-style with equal level capacities).
+
+    Each level holds at most ``k`` values of weight ``2 ** level``; a full level is sorted and
+    every other value, from a random offset, moves up a level with twice the weight."""
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self._random = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        for level in range(64):
+            if len(self.levels[level]) <= self.k:
+                break
+            items = np.sort(self.levels[level])
+            # an odd item out stays behind so the total weight is preserved exactly
+            kept, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = kept
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self._random.integers(2)::2]])
+
+    def quantiles(self, qs):
+        if not self.count:
+            return [None for _ in qs]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, ranks = values[order], np.cumsum(weights[order])
+        positions = np.searchsorted(ranks, np.asarray(qs) * ranks[-1], side='left')
+        return [float(values[min(position, len(values) - 1)]) for position in positions]
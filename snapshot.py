@@ -0,0 +1,112 @@
+import functools
+import hashlib
+import inspect
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cleanData
+import dedup
+from cleanData import CATEGORICAL_COLUMNS, clean_frame, read_chunks
+from dedup import LatestScrape
+from metrics import Stages
+
+# Cleaned copies of the source CSV, stored as Parquet next to the project
+snapshot_dir = '.snapshots'
+
+
+@functools.lru_cache(maxsize=16)
+def _content_hash(path, size, mtime, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    # hashed once per process for as long as the file's size and mtime stay the same
+    stat = os.stat(path)
+    return _content_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def cleaning_version():
+    # any edit to the cleaning code yields a new snapshot name, so stale snapshots are never read
+    return hashlib.sha256((inspect.getsource(cleanData) + inspect.getsource(dedup)).encode()).hexdigest()
+
+
+def snapshot_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(snapshot_dir, f"{name}-{file_hash(path)[:16]}-{cleaning_version()[:8]}.parquet")
+
+
+def iter_snapshot(path, size, skip_chunks=0):
+    # memory-mapped, so batches are decoded straight from the page cache
+    parquet = pq.ParquetFile(path, memory_map=True, read_dictionary=CATEGORICAL_COLUMNS)
+    for number, batch in enumerate(parquet.iter_batches(batch_size=size)):
+        if number >= skip_chunks:
+            yield batch.to_pandas()
+
+
+def _cleaned(chunks, stages, latest, size, skip_chunks=0):
+    for number, chunk in enumerate(stages.iterate('read', chunks), skip_chunks):
+        with stages.timed('dedup'):
+            chunk = latest.keep(chunk, number * size)
+        with stages.timed('clean'):
+            df = clean_frame(chunk)
+        yield df
+
+
+def _write_through(path, target, size, dtypes, stages, latest):
+    """Clean the CSV chunk by chunk, yielding each chunk and appending it to ``target``.
+
+    The snapshot is only published once the whole file was written, so an interrupted run
+    never leaves a partial snapshot behind."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    temp = target + '.tmp'
+    writer = schema = None
+    try:
+        for df in _cleaned(read_chunks(path, size, dtypes=dtypes), stages, latest, size):
+            with stages.timed('snapshot'):
+                # chunks have different category sets, so categoricals are stored as plain strings
+                categoricals = df.select_dtypes('category').columns
+                table = pa.Table.from_pandas(df.astype({column: 'str' for column in categoricals}), schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(temp, schema)
+                writer.write_table(table)
+            yield df
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(temp, target)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def clean_chunks(path, size, skip_chunks=0, use_snapshot=True, dtypes=None, stages=None, latest=None):
+    """Cleaned chunks of the CSV at ``path``, with one row per app, read from its snapshot when one exists.
+
+    Without a snapshot, a full pass (``skip_chunks == 0``) parses and cleans the CSV and writes
+    the snapshot on the way; later runs skip parsing and cleaning entirely. Parsing the CSV
+    first scans it for the latest scrape of every app into ``latest`` (a dedup.LatestScrape),
+    which then counts the duplicates dropped. Time spent reading, deduplicating, cleaning and
+    writing the snapshot is added to ``stages``."""
+    stages = stages or Stages()
+    target = snapshot_path(path) if use_snapshot else None
+    if target and os.path.exists(target):
+        return stages.iterate('read', iter_snapshot(target, size, skip_chunks))
+    latest = (latest if latest is not None else LatestScrape()).scan(path, size, stages)
+    if not target or skip_chunks:
+        return _cleaned(read_chunks(path, size, skip_chunks, dtypes), stages, latest, size, skip_chunks)
+    return _write_through(path, target, size, dtypes, stages, latest)
+
+
+def load_frame(path, size=100_000):
+    """The whole cleaned dataset as one frame."""
+    return pd.concat(clean_chunks(path, size), ignore_index=True)
@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# the scripts live in the project root and are imported as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# api.py binds its engine when it is imported, so its database has to be chosen first
+API_DB = os.path.join(tempfile.mkdtemp(prefix="playstore-tests-"), "api.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{API_DB}")
+os.environ.setdefault("RESPONSE_CACHE", "off")
+
+import initDatabase  # noqa: E402
+
+initDatabase.create_sqlite(API_DB)
+
+
+@pytest.fixture(scope="session")
+def apps_csv(tmp_path_factory):
+    """A generated CSV of 2,000 apps."""
+    import generateData
+
+    path = tmp_path_factory.mktemp("data") / "apps.csv"
+    generateData.generate(path, 2_000, size=1_000)
+    return path
+
+
+@pytest.fixture(scope="session")
+def loaded(apps_csv):
+    """The API's database with the generated apps, rollups and search index, as a full import leaves it."""
+    import importData
+    import rollups
+    import search
+    from bulkLoader import BulkLoader
+    from cleanData import clean_frame, read_chunks
+    from database import connect
+
+    conn, dialect = connect(API_DB)
+    loader = BulkLoader(conn, dialect)
+    for df in read_chunks(apps_csv, 1_000):
+        importData.load_chunk(conn, loader, clean_frame(df))
+    rollups.rebuild(conn.cursor(), dialect)
+    search.rebuild(conn, dialect)
+    conn.commit()
+    conn.close()
+    return API_DB
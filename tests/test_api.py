@@ -0,0 +1,126 @@
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from cache import make_response_cache
+
+
+@pytest.fixture
+def client(loaded):
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def developer_id(loaded):
+    return sqlite3.connect(loaded).execute("SELECT MIN(DeveloperID) FROM Developers").fetchone()[0]
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    # the suite runs with RESPONSE_CACHE=off; these tests get their own in-memory cache
+    cache = make_response_cache("memory")
+    monkeypatch.setattr(api, "response_cache", cache)
+    return cache
+
+
+def new_app(app_id, developer_id, **values):
+    return {"AppID": app_id, "AppName": f"Test {app_id}", "Rating": 4.5, "RatingCount": 10, "Installs": 100,
+            "Price": 0, "Currency": "USD", "Free": True, "DeveloperID": developer_id, **values}
+
+
+def test_counts_follow_writes_and_estimates_use_cached_stats(client, developer_id):
+    exact = client.get("/apps/?rating=4").json()["total"]
+    estimated = client.get("/apps/?rating=4&estimate=true").json()
+    assert estimated["total_is_estimate"]
+    assert abs(estimated["total"] - exact) <= exact * 0.1
+
+    stats = api.stats_cache.get("apps")
+    assert client.post("/apps/", json=new_app("test.counts", developer_id)).status_code == 200
+    # the exact total is counted again, the statistics behind estimates are kept
+    assert client.get("/apps/?rating=4").json()["total"] == exact + 1
+    assert api.stats_cache.get("apps") is stats
+    assert client.delete("/apps/test.counts").status_code == 200
+    assert client.get("/apps/?rating=4").json()["total"] == exact
+
+
+def test_cursor_pages_follow_the_offset_order(client):
+    params = {"rating": 4, "page_size": 50}
+    total = client.get("/apps/", params=params).json()["total"]
+    by_offset = []
+    for page in range(1, total // 50 + 2):
+        by_offset += [app["AppID"] for app in client.get("/apps/", params={**params, "page": page}).json()["apps"]]
+
+    by_cursor, cursor = [], None
+    while True:
+        body = client.get("/apps/", params={**params, "cursor": cursor} if cursor else params).json()
+        by_cursor += [app["AppID"] for app in body["apps"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert len(by_cursor) == total
+    assert by_cursor == by_offset
+
+
+def test_cached_responses_revalidate_and_follow_writes(client, developer_id, response_cache):
+    assert client.post("/apps/", json=new_app("test.cache", developer_id, Rating=4.0)).status_code == 200
+    first = client.get("/apps/test.cache")
+    assert first.json()["Rating"] == 4.0
+    etag = first.headers["ETag"]
+    assert client.get("/apps/test.cache").content == first.content
+    assert response_cache.hits == 1
+
+    not_modified = client.get("/apps/test.cache", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+    # a write invalidates the app's entry, so the old ETag no longer matches
+    assert client.put("/apps/test.cache", json={"Rating": 2.0}).status_code == 200
+    changed = client.get("/apps/test.cache", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["Rating"] == 2.0
+    assert changed.headers["ETag"] != etag
+
+    listed = client.get("/apps/", params={"rating": 2}).json()["total"]
+    assert client.get("/apps/", params={"rating": 2}).json()["total"] == listed
+    assert client.delete("/apps/test.cache").status_code == 200
+    assert client.get("/apps/test.cache").status_code == 404
+    assert client.get("/apps/", params={"rating": 2}).json()["total"] == listed - 1
+
+
+def ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def test_bulk_writes_fail_only_the_bad_lines(client, developer_id):
+    body = ndjson(new_app("test.bulk1", developer_id),
+                  "{not json",
+                  {"AppID": "test.bulk2"},
+                  new_app("test.bulk1", developer_id),
+                  new_app("test.bulk3", developer_id + 10**9),
+                  # passes validation but breaks the table's CHECK, so the batch is retried row by row
+                  new_app("test.bulk4", developer_id, Rating=7),
+                  new_app("test.bulk5", developer_id))
+    result = client.post("/apps/bulk", content=body).json()
+    assert (result["rows"], result["succeeded"], result["failed"]) == (7, 2, 5)
+    statuses = [(row["line"], row["status"]) for row in result["results"]]
+    assert statuses == [(1, "created"), (2, "failed"), (3, "failed"), (4, "failed"), (5, "failed"), (6, "failed"), (7, "created")]
+    assert result["results"][3]["error"] == "App already exists"
+    assert result["results"][4]["error"] == "Developer not found"
+    assert client.get("/apps/test.bulk4").status_code == 404
+
+    patch = ndjson({"AppID": "test.bulk1", "Rating": 3.0},
+                   {"AppID": "test.missing", "Rating": 3.0},
+                   {"AppID": "test.bulk5", "Rating": 9.0},
+                   {"AppID": "test.bulk1", "Installs": 500})
+    result = client.patch("/apps/bulk", content=patch).json()
+    assert [row["status"] for row in result["results"]] == ["updated", "failed", "failed", "updated"]
+    updated = client.get("/apps/test.bulk1").json()
+    # both lines for test.bulk1 are applied
+    assert (updated["Rating"], updated["Installs"]) == (3.0, 500)
+    assert client.get("/apps/test.bulk5").json()["Rating"] == 4.5
+
+    for app_id in ("test.bulk1", "test.bulk5"):
+        assert client.delete(f"/apps/{app_id}").status_code == 200
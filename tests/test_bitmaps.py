@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from bitmaps import ARRAY_MAX, CHUNK, Bitmap
+
+
+def random_rows(rng, size):
+    # a dense chunk, a sparse one and a few rows further out, so both container kinds meet
+    return np.concatenate([rng.choice(CHUNK, size, replace=False), CHUNK + rng.choice(CHUNK, size // 20, replace=False),
+                           rng.integers(5 * CHUNK, 6 * CHUNK, 50)])
+
+
+def test_bitmaps_match_sets():
+    rng = np.random.default_rng(4)
+    a, b = random_rows(rng, 20_000), random_rows(rng, 3 * ARRAY_MAX)
+    left, right = Bitmap.from_rows(a), Bitmap.from_rows(b)
+    a_rows, b_rows = set(a.tolist()), set(b.tolist())
+    expected = a_rows & b_rows
+
+    assert len(left) == len(a_rows)
+    assert set(np.flatnonzero((left & right).to_mask(6 * CHUNK)).tolist()) == expected
+    assert left.and_count(right) == len(expected)
+    assert len(Bitmap.intersection([left, right, Bitmap.from_rows(list(expected))])) == len(expected)
+    assert Bitmap.from_mask(left.to_mask(6 * CHUNK)).and_count(left) == len(left)
+
+    probe = rng.integers(0, 6 * CHUNK, 10_000)
+    assert left.contains(probe).tolist() == [row in a_rows for row in probe.tolist()]
+    assert [row in right for row in probe[:500].tolist()] == [row in b_rows for row in probe[:500].tolist()]
+
+
+def test_add_and_remove_cross_the_container_limit():
+    rows = list(range(0, 2 * ARRAY_MAX, 2))
+    bitmap = Bitmap.from_rows(rows[:ARRAY_MAX])
+    for row in rows[ARRAY_MAX:]:
+        bitmap.add(row)
+    assert len(bitmap) == len(rows)
+    for row in rows[10:]:
+        bitmap.remove(row)
+    bitmap.remove(1)
+    assert np.flatnonzero(bitmap.to_mask(CHUNK)).tolist() == rows[:10]
+    for row in rows[:10]:
+        bitmap.remove(row)
+    assert not bitmap.containers
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"rating": 4},
+    {"price": 0, "free": True},
+    {"category_id": 3, "ad_supported": False},
+    {"content_rating": "Everyone", "rating": 3.5, "editors_choice": False},
+    {"content_rating": "No such rating"},
+])
+def test_facets_from_bitmaps_match_sql(loaded, monkeypatch, params):
+    client = TestClient(api.app)
+    by_sql = client.get("/apps/facets", params=params).json()
+    monkeypatch.setattr(api, "columnar_apps", api.call_with_session(api.load_columnar))
+    by_bitmaps = client.get("/apps/facets", params=params).json()
+    assert by_bitmaps == by_sql
+    assert client.get("/apps/", params=params).json()["total"] == by_sql["total"]
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pandas as pd
+
+import generateData
+import importData
+import initDatabase
+from bulkLoader import BulkLoader
+from cleanData import clean_frame, read_chunks
+
+
+def load(path, df):
+    # a fresh connection and loader per chunk, like a resumed or a second parallel loader
+    conn = sqlite3.connect(path)
+    loader = BulkLoader(conn, 'sqlite')
+    loader.begin()
+    loader.load_developers(df)
+    loader.load_categories(df)
+    loader.load_lookups(df)
+    loader.load_apps(df)
+    loader.load_app_categories(df)
+    conn.commit()
+    conn.close()
+
+
+def test_developers_without_email_resolve_across_loaders(tmp_path):
+    csv, db = tmp_path / "apps.csv", str(tmp_path / "apps.db")
+    generateData.generate(csv, 2_000, size=1_000)
+    initDatabase.create_sqlite(db)
+    first, second = [clean_frame(chunk) for chunk in read_chunks(csv, 1_000)]
+    # the second chunk only names its developers; the ones the first chunk stored must still be keyed
+    second['Developer Email'] = None
+    shared = set(first['Developer Id'].dropna()) & set(second['Developer Id'])
+    assert shared
+
+    load(db, first)
+    load(db, second)
+
+    conn = sqlite3.connect(db)
+    unkeyed = {app_id for (app_id,) in conn.execute("SELECT AppID FROM Apps WHERE DeveloperID IS NULL")}
+    conn.close()
+    assert not unkeyed & set(second.loc[second['Developer Id'].isin(shared), 'App Id'])
+
+
+def test_developer_is_inserted_when_a_later_row_has_the_email(tmp_path):
+    csv, db = tmp_path / "apps.csv", str(tmp_path / "apps.db")
+    generateData.generate(csv, 1_000, size=1_000)
+    initDatabase.create_sqlite(db)
+    df = clean_frame(next(read_chunks(csv, 2)))
+    # the developer's first row in the chunk has no email, the second one does
+    df['Developer Id'] = 'Dev X'
+    df['Developer Email'] = [None, 'x@example.com']
+
+    load(db, df)
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT DeveloperEmail FROM Developers WHERE DeveloperName = 'Dev X'").fetchall() == [('x@example.com',)]
+    assert conn.execute("SELECT COUNT(*) FROM Apps WHERE DeveloperID IS NULL").fetchone() == (0,)
+    conn.close()
+
+
+def test_apps_are_keyed_when_their_developer_is_stored_later(tmp_path):
+    csv, db = tmp_path / "apps.csv", str(tmp_path / "apps.db")
+    generateData.generate(csv, 2_000, size=1_000)
+    initDatabase.create_sqlite(db)
+    first, second = [clean_frame(chunk) for chunk in read_chunks(csv, 1_000)]
+    # Dev X has no email until the second chunk, after its first app was loaded
+    first.loc[first.index[0], ['Developer Id', 'Developer Email']] = ['Dev X', None]
+    second.loc[second.index[0], ['Developer Id', 'Developer Email']] = ['Dev X', 'x@example.com']
+
+    conn = sqlite3.connect(db)
+    loader = BulkLoader(conn, 'sqlite')
+    importData.load_chunk(conn, loader, first)
+    importData.load_chunk(conn, loader, second)
+
+    app_ids = (first['App Id'].iloc[0], second['App Id'].iloc[0])
+    keyed = conn.execute("""
+        SELECT COUNT(*) FROM Apps a JOIN Developers d ON d.DeveloperID = a.DeveloperID
+        WHERE d.DeveloperName = 'Dev X' AND a.AppID IN (?, ?)""", app_ids).fetchone()
+    conn.close()
+    assert keyed == (2,)
+
+
+def test_incremental_applies_a_later_scrape_with_the_same_update(tmp_path):
+    csv, db = tmp_path / "apps.csv", str(tmp_path / "apps.db")
+    generateData.generate(csv, 1_000, size=1_000)
+    initDatabase.create_sqlite(db)
+    df = clean_frame(next(read_chunks(csv, 1_000)))
+    load(db, df)
+
+    rescraped = df.iloc[:1].copy()
+    rescraped['Scraped Time'] = pd.Timestamp('2022-01-01')
+    rescraped['Rating'] = 1.0
+    conn = sqlite3.connect(db)
+    loader = BulkLoader(conn, 'sqlite')
+    assert importData.load_chunk(conn, loader, rescraped, incremental=True) == (0, 1)
+    # loading the same scrape again is a no-op
+    assert importData.load_chunk(conn, loader, rescraped, incremental=True) == (0, 0)
+    stored = conn.execute("SELECT Rating, ScrapedTime FROM Apps WHERE AppID = ?", (rescraped['App Id'].iloc[0],)).fetchone()
+    conn.close()
+    assert stored == (1.0, '2022-01-01 00:00:00')
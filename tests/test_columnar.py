@@ -0,0 +1,38 @@
+import datetime
+import time
+
+from fastapi.testclient import TestClient
+
+import api
+import columnar
+
+
+def settle():
+    # wait out any reload the requests scheduled on the DB executor
+    while api.columnar_state["reloading"]:
+        time.sleep(0.01)
+
+
+def test_engine_stays_unloaded_when_off():
+    assert not api.COLUMNAR_ENGINE
+    client = TestClient(api.app)
+    for url in ["/apps/", "/apps/facets", "/apps/?page=2"]:
+        assert client.get(url).status_code == 200
+    settle()
+    assert api.columnar_apps is None
+    assert client.get("/cache/stats").json()["columnar"] is None
+
+
+def test_upsert_inserts_new_apps_in_id_order():
+    def app(number):
+        return columnar.App(f"app{number:04d}", f"App {number}", datetime.date(2021, 1, 1 + number % 28), 4.0, 0.0, 1,
+                            True, False, False, False)
+
+    store = columnar.ColumnarApps([app(number) for number in range(0, 1000, 2)], [], {})
+    # new ids land before, between and after the stored ones, in any order
+    added = [app(number) for number in [1001, 7, 3, 999, 501, 1003, 1]]
+    store.upsert(added, [])
+    ids = [store.app_ids[row] for row in store.by_id]
+    assert ids == sorted(ids) and len(ids) == 507
+    for number in [0, 1, 3, 7, 500, 501, 999, 1001, 1003]:
+        assert store.app_ids[store.row(f"app{number:04d}")] == f"app{number:04d}"
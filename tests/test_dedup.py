@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import generateData
+from dedup import LatestScrape
+
+
+@pytest.fixture(scope="module")
+def rescraped(tmp_path_factory):
+    """A CSV of 1,000 apps where a third of them were scraped again, some more than once, out of order."""
+    path = tmp_path_factory.mktemp("dedup") / "apps.csv"
+    generateData.generate(path, 1_000, size=1_000)
+    apps = pd.read_csv(path, dtype=str)
+    rng = np.random.default_rng(5)
+    again = apps.sample(frac=1 / 3, random_state=5)
+    later = again.assign(**{'Scraped Time': '2022-02-01 00:00:00', 'Rating': '1.0'})
+    earlier = again.sample(frac=0.5, random_state=6).assign(**{'Scraped Time': '2020-01-01 00:00:00', 'Rating': '0.5'})
+    # a repeat of the winning time loses to the first row that has it, and padded ids are the same app
+    tied = later.head(20).assign(**{'Rating': '2.0', 'App Id': lambda df: " " + df['App Id'] + " "})
+    broken = apps.head(10).assign(**{'Scraped Time': 'not a time', 'Rating': '0.0'})
+    rows = pd.concat([apps, later, earlier, tied, broken, apps.head(5).assign(**{'App Id': None})])
+    rows = rows.iloc[rng.permutation(len(rows))]
+    rows.to_csv(path, index=False)
+    return path
+
+
+def expected_winners(path):
+    rows = pd.read_csv(path, dtype=str).reset_index(names='row')
+    rows = rows[rows[['App Name', 'App Id', 'Category', 'Developer Id']].notna().all(axis=1)]
+    rows['key'] = rows['App Id'].str.strip()
+    rows['time'] = pd.to_datetime(rows['Scraped Time'], format='ISO8601', errors='coerce')
+    rows = rows.sort_values(['key', 'time', 'row'], ascending=[True, False, True], na_position='last')
+    return rows.drop_duplicates('key')['row']
+
+
+@pytest.mark.parametrize("size", [1_000, 97])
+def test_each_app_keeps_its_latest_scrape(rescraped, size):
+    latest = LatestScrape().scan(rescraped, size)
+    assert len(latest) == 1_000
+
+    chunks = list(enumerate(pd.read_csv(rescraped, dtype=str, chunksize=size)))
+    # chunks can be filtered in any order, with the same result
+    kept = pd.concat([latest.keep(chunk, number * size) for number, chunk in reversed(chunks)])
+    assert sorted(kept.index) == sorted(expected_winners(rescraped))
+    assert kept['App Id'].str.strip().is_unique
+    rescrapes = kept['Scraped Time'] == '2022-02-01 00:00:00'
+    assert rescrapes.sum() == 333
+    # the later scrape, or its tied repeat where that one comes first in the file
+    assert set(kept.loc[rescrapes, 'Rating']) == {'1.0', '2.0'}
+    assert latest.dropped == sum(len(chunk) for _, chunk in chunks) - 5 - 1_000
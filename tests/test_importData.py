@@ -0,0 +1,49 @@
+import multiprocessing as mp
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+import generateData
+import importData
+import initDatabase
+import metrics
+from dedup import LatestScrape
+
+
+@pytest.fixture
+def args(tmp_path):
+    csv, db = tmp_path / "apps.csv", str(tmp_path / "apps.db")
+    generateData.generate(csv, 2_000, size=1_000)
+    initDatabase.create_sqlite(db)
+    # a hung pipeline fails the test instead of the whole run
+    signal.alarm(60)
+    yield SimpleNamespace(file=str(csv), chunk_size=500, batch_size=1_000, sqlite=db, workers=1, loaders=2,
+                          no_snapshot=True, dtypes=None, widths=None)
+    signal.alarm(0)
+
+
+def failing_clean(df):
+    raise ValueError("bad chunk")
+
+
+def test_worker_failure_ends_the_run(args, monkeypatch):
+    # the children are forked, so they clean with the patched function
+    monkeypatch.setattr(importData, 'clean_frame', failing_clean)
+    with pytest.raises(RuntimeError, match="bad chunk"):
+        importData.run_parallel(args, metrics.Stages(), LatestScrape())
+    assert not mp.active_children()
+
+
+def test_reader_failure_stops_the_children(args, monkeypatch):
+    read_chunks = importData.read_chunks
+
+    def failing_read(*read_args, **kwargs):
+        chunks = read_chunks(*read_args, **kwargs)
+        yield next(chunks)
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(importData, 'read_chunks', failing_read)
+    with pytest.raises(OSError, match="disk gone"):
+        importData.run_parallel(args, metrics.Stages(), LatestScrape())
+    assert not mp.active_children()
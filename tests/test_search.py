@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import search
+
+QUERIES = ["kids", "free", "photo", "music player", "pro", "a", "qu", "ed", "block puzzle", "tor", "zombie war", "x"]
+
+
+def brute_force(db_path, query, limit):
+    conn = sqlite3.connect(db_path)
+    apps = conn.execute("SELECT AppID, AppName, COALESCE(Installs, 0) FROM Apps").fetchall()
+    conn.close()
+    # a one- or two-letter query is a word-prefix search (search.query_grams)
+    lowest = 1 if len(search.normalize(query)) < 3 else 0
+    scored = [(search.score(query, name), installs, app_id) for app_id, name, installs in apps]
+    ranked = sorted((-score, -installs, app_id) for score, installs, app_id in scored if score is not None and score >= lowest)
+    return [app_id for _, _, app_id in ranked[:limit]]
+
+
+@pytest.fixture
+def db(loaded):
+    session = api.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_ranking_matches_a_full_scan(loaded, db, query):
+    results = api.search_names(db, "apps", query, 10)["results"]
+    assert [app["AppID"] for app in results] == brute_force(loaded, query, 10)
+
+
+def test_writes_keep_the_index_current(loaded, db):
+    conn = sqlite3.connect(loaded)
+    app_id, name = conn.execute("SELECT AppID, AppName FROM Apps ORDER BY Installs, AppID LIMIT 1").fetchone()
+    conn.close()
+    client = TestClient(api.app)
+    # renamed through the API, the least installed app is found under its new name only
+    assert client.put(f"/apps/{app_id}", json={"AppName": "Kids"}).status_code == 200
+    try:
+        results = api.search_names(db, "apps", "kids", 50)["results"]
+        ids = [app["AppID"] for app in results]
+        # behind the heavier exact matches, but ahead of every prefix and substring match
+        assert app_id in ids
+        assert all(app["AppName"] == "Kids" for app in results[:ids.index(app_id) + 1])
+        assert app_id not in [app["AppID"] for app in api.search_names(db, "apps", name, 50)["results"]]
+    finally:
+        assert client.put(f"/apps/{app_id}", json={"AppName": name}).status_code == 200
+    assert app_id in [app["AppID"] for app in api.search_names(db, "apps", name, 50)["results"]]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, QuantileSketch, TopK, hash_values
+
+
+def chunks(values, size=50_000):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+@pytest.mark.parametrize("distinct", [1_000, 300_000])
+def test_distinct_count_is_within_the_error_bound(distinct):
+    rng = np.random.default_rng(1)
+    values = pd.Series(rng.integers(distinct, size=distinct * 3)).map("app.{}".format)
+    hll = HyperLogLog()
+    for chunk in chunks(values):
+        hll.update(hash_values(chunk))
+    exact = values.nunique()
+    # three standard errors of 1.04 / sqrt(2 ** 14)
+    assert abs(hll.estimate() - exact) <= 3 * 1.04 / 128 * exact
+
+
+def test_top_values_undercount_by_at_most_the_error():
+    rng = np.random.default_rng(2)
+    values = pd.Series(rng.zipf(1.5, size=500_000) % 10_000)
+    top = TopK(capacity=100)
+    for chunk in chunks(values):
+        top.update(chunk)
+    exact = values.value_counts()
+    for value, count in top.top(10):
+        assert exact[value] - top.error <= count <= exact[value]
+    # every value more frequent than the error is still counted
+    assert set(exact.index[exact > top.error]) <= set(top.counts.index)
+    assert [value for value, _ in top.top(5)] == list(exact.index[:5])
+
+
+def test_quantiles_are_within_the_rank_error():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(8, 2, size=1_000_000)
+    sketch = QuantileSketch()
+    for chunk in chunks(values):
+        sketch.update(np.append(chunk, np.nan))
+    assert sketch.count == len(values)
+    assert sum(len(level) for level in sketch.levels) < 20 * sketch.k
+
+    qs = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+    ordered = np.sort(values)
+    for q, estimate in zip(qs, sketch.quantiles(qs)):
+        rank = np.searchsorted(ordered, estimate) / len(values)
+        assert abs(rank - q) <= 0.002
+
+
+def test_empty_sketches():
+    assert HyperLogLog().estimate() == 0
+    assert QuantileSketch().quantiles([0.5]) == [None]
+    assert TopK().top() == []